@@ -40,15 +40,15 @@ class Payment(models.Model):
         """Mark payment as completed and process the purchase"""
         self.status = 'completed'
         self.completed_at = timezone.now()
-        self.save()
+        self.save(update_fields=['status', 'completed_at'])
         
         # Process what they bought
         if self.service_type == 'premium' and self.property:
             self.property.is_premium = True
-            self.property.save()
+            self.property.save(update_fields=['is_premium', 'updated_at'])
         elif self.service_type == 'top_up':
             self.user.balance += self.amount
-            self.user.save()
+            self.user.save(update_fields=['balance', 'updated_at'])
     
     class Meta:
         ordering = ['-created_at']
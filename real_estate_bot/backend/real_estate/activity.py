@@ -0,0 +1,137 @@
+"""In-process buffer for analytics writes (UserActivity, SearchQuery)
+
+Request handlers call record_activity()/record_search(), which only append
+an unsaved instance to a bounded deque. A background thread writes the
+buffer with bulk_create every ACTIVITY_FLUSH_INTERVAL seconds, or as soon
+as ACTIVITY_BATCH_SIZE events are waiting. When ACTIVITY_BUFFER_SIZE events
+are already queued new ones are dropped and counted instead of growing
+memory. created_at is stamped when the batch is written, so it can lag the
+actual event by up to one flush interval.
+
+stats() (shown by health_check) reports queued/written/dropped/failed
+counts.
+"""
+import atexit
+import logging
+import threading
+from collections import deque
+from itertools import groupby
+
+from django.conf import settings
+from django.db import connection
+
+from .models import UserActivity, SearchQuery
+
+logger = logging.getLogger('real_estate')
+
+
+class ActivityBuffer:
+    def __init__(self, flush_interval=2.0, batch_size=500, max_size=10000, autostart=True):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_size = max_size
+        self.autostart = autostart
+        self._events = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def enqueue(self, instance):
+        """Queue an unsaved model instance, False if the buffer is full"""
+        with self._lock:
+            if len(self._events) >= self.max_size:
+                self.dropped += 1
+                return False
+            self._events.append(instance)
+            self.enqueued += 1
+            queued = len(self._events)
+            if self._thread is None and self.autostart:
+                self._start()
+        if queued >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def flush(self):
+        """Write everything queued so far, return the number of rows written"""
+        with self._lock:
+            events, self._events = list(self._events), deque()
+        if not events:
+            return 0
+
+        written = 0
+        # Keep arrival order within each model
+        events.sort(key=lambda instance: type(instance).__name__)
+        for model, instances in groupby(events, key=type):
+            written += self._write(model, list(instances))
+        return written
+
+    def _write(self, model, instances):
+        try:
+            model.objects.bulk_create(instances, batch_size=self.batch_size)
+            self.written += len(instances)
+            return len(instances)
+        except Exception as e:
+            logger.error(f"Error writing {len(instances)} {model.__name__} rows in bulk: {e}")
+
+        # A single bad row (e.g. its listing was deleted meanwhile) shouldn't lose the batch
+        written = 0
+        for instance in instances:
+            try:
+                instance.save(force_insert=True)
+                written += 1
+            except Exception:
+                self.failed += 1
+        self.written += written
+        return written
+
+    def stats(self):
+        with self._lock:
+            queued = len(self._events)
+        return {
+            'queued': queued,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+        }
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name='activity-buffer', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                # Don't keep this thread's connection open between flushes
+                connection.close()
+
+
+activity_buffer = ActivityBuffer(
+    flush_interval=getattr(settings, 'ACTIVITY_FLUSH_INTERVAL', 2.0),
+    batch_size=getattr(settings, 'ACTIVITY_BATCH_SIZE', 500),
+    max_size=getattr(settings, 'ACTIVITY_BUFFER_SIZE', 10000),
+)
+
+
+def record_activity(user, action, property=None, details=None):
+    """Queue a UserActivity row"""
+    return activity_buffer.enqueue(UserActivity(
+        user=user, action=action, property=property, details=details
+    ))
+
+
+def record_search(user, query, search_type, results_count, filters_used=None):
+    """Queue a SearchQuery row"""
+    return activity_buffer.enqueue(SearchQuery(
+        user=user, query=query, search_type=search_type,
+        results_count=results_count, filters_used=filters_used or {}
+    ))
@@ -12,6 +12,9 @@ from .models import (
     TelegramUser, Region, District, Property, Favorite, 
     UserActivity, PropertyImage, SearchQuery
 )
+from .gazetteer import get_gazetteer
+from .rollups import listing_counts, listing_summary
+from .similar_listings import bucket_keys, drop_buckets
 
 # Custom admin site configuration
 admin.site.site_header = "Real Estate Bot Administration"
@@ -64,20 +67,22 @@ class TelegramUserAdmin(admin.ModelAdmin):
     get_full_name.short_description = "Full Name"
     
     def properties_count(self, obj):
-        count = obj.properties.count()
+        count = obj.properties_count
         if count > 0:
             url = reverse('admin:real_estate_property_changelist') + f'?user__id__exact={obj.id}'
             return format_html('<a href="{}">{} properties</a>', url, count)
         return '0'
     properties_count.short_description = "Properties"
+    properties_count.admin_order_field = 'properties_count'
     
     def favorites_count(self, obj):
-        count = obj.favorites.count()
+        count = obj.favorites_count
         if count > 0:
             url = reverse('admin:real_estate_favorite_changelist') + f'?user__id__exact={obj.id}'
             return format_html('<a href="{}">{} favorites</a>', url, count)
         return '0'
     favorites_count.short_description = "Favorites"
+    favorites_count.admin_order_field = 'favorites_count'
     
     def block_users(self, request, queryset):
         updated = queryset.update(is_blocked=True)
@@ -117,7 +122,7 @@ class RegionAdmin(admin.ModelAdmin):
     districts_count.short_description = "Districts"
     
     def properties_count(self, obj):
-        count = Property.objects.filter(region=obj.key).count()
+        count = listing_counts(region=obj.key)
         if count > 0:
             url = reverse('admin:real_estate_property_changelist') + f'?region__exact={obj.key}'
             return format_html('<a href="{}">{} properties</a>', url, count)
@@ -133,7 +138,7 @@ class DistrictAdmin(admin.ModelAdmin):
     ordering = ['region__order', 'order', 'name_uz']
     
     def properties_count(self, obj):
-        count = Property.objects.filter(region=obj.region.key, district=obj.key).count()
+        count = listing_counts(region=obj.region.key, district=obj.key)
         if count > 0:
             url = reverse('admin:real_estate_property_changelist') + f'?region__exact={obj.region.key}&district__exact={obj.key}'
             return format_html('<a href="{}">{} properties</a>', url, count)
@@ -255,32 +260,47 @@ class PropertyAdmin(admin.ModelAdmin):
     get_photos_preview.short_description = "Photos"
     
     def approve_properties(self, request, queryset):
-        updated = queryset.update(approval_status='approved', is_approved=True, published_at=timezone.now())
+        keys = bucket_keys(queryset)
+        updated = queryset.update(
+            approval_status='approved', is_approved=True,
+            published_at=timezone.now(), updated_at=timezone.now()
+        )
+        drop_buckets(keys)
         messages.success(request, f'{updated} properties approved.')
     approve_properties.short_description = "Approve selected properties"
     
     def reject_properties(self, request, queryset):
-        updated = queryset.update(approval_status='rejected', is_approved=False)
+        keys = bucket_keys(queryset)
+        updated = queryset.update(approval_status='rejected', is_approved=False, updated_at=timezone.now())
+        drop_buckets(keys)
         messages.success(request, f'{updated} properties rejected.')
     reject_properties.short_description = "Reject selected properties"
     
     def make_premium(self, request, queryset):
-        updated = queryset.update(is_premium=True)
+        keys = bucket_keys(queryset)
+        updated = queryset.update(is_premium=True, updated_at=timezone.now())
+        drop_buckets(keys)
         messages.success(request, f'{updated} properties made premium.')
     make_premium.short_description = "Make premium"
     
     def make_regular(self, request, queryset):
-        updated = queryset.update(is_premium=False)
+        keys = bucket_keys(queryset)
+        updated = queryset.update(is_premium=False, updated_at=timezone.now())
+        drop_buckets(keys)
         messages.success(request, f'{updated} properties made regular.')
     make_regular.short_description = "Make regular"
     
     def activate_properties(self, request, queryset):
-        updated = queryset.update(is_active=True)
+        keys = bucket_keys(queryset)
+        updated = queryset.update(is_active=True, updated_at=timezone.now())
+        drop_buckets(keys)
         messages.success(request, f'{updated} properties activated.')
     activate_properties.short_description = "Activate properties"
     
     def deactivate_properties(self, request, queryset):
-        updated = queryset.update(is_active=False)
+        keys = bucket_keys(queryset)
+        updated = queryset.update(is_active=False, updated_at=timezone.now())
+        drop_buckets(keys)
         messages.success(request, f'{updated} properties deactivated.')
     deactivate_properties.short_description = "Deactivate properties"
 
@@ -387,15 +407,16 @@ class RealEstateAdminSite(admin.AdminSite):
         week_ago = today - timedelta(days=7)
         month_ago = today - timedelta(days=30)
         
+        summary = listing_summary()
         stats = {
             'total_users': TelegramUser.objects.count(),
             'active_users_week': TelegramUser.objects.filter(
                 activities__created_at__gte=week_ago
             ).distinct().count(),
-            'total_properties': Property.objects.count(),
-            'pending_properties': Property.objects.filter(approval_status='pending').count(),
-            'approved_properties': Property.objects.filter(approval_status='approved').count(),
-            'premium_properties': Property.objects.filter(is_premium=True).count(),
+            'total_properties': summary['total'],
+            'pending_properties': summary['status_pending'],
+            'approved_properties': summary['status_approved'],
+            'premium_properties': summary['premium'],
             'total_favorites': Favorite.objects.count(),
             'properties_this_month': Property.objects.filter(created_at__gte=month_ago).count(),
             'users_this_month': TelegramUser.objects.filter(created_at__gte=month_ago).count(),
@@ -405,9 +426,10 @@ class RealEstateAdminSite(admin.AdminSite):
         recent_activities = UserActivity.objects.select_related('user', 'property')[:10]
         
         # Top regions by property count
+        region_counts = listing_counts('region', is_approved=True)
         region_stats = []
-        for region in Region.objects.all():
-            count = Property.objects.filter(region=region.key, is_approved=True).count()
+        for region in get_gazetteer().regions.values():
+            count = region_counts.get(region.key, 0)
             if count > 0:
                 region_stats.append({
                     'name': region.name_uz,
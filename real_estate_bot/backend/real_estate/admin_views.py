@@ -4,7 +4,10 @@ from django.contrib import messages
 from django.db.models import Count, Sum, Q
 from django.utils import timezone
 from datetime import timedelta
-from .models import TelegramUser, Property, UserActivity
+from .models import TelegramUser, Property, UserActivity, SearchQuery
+from .rollups import listing_counts
+from .partitions import purge_before
+from .similar_listings import bucket_keys, drop_buckets
 from payments.models import Payment
 import json
 
@@ -76,26 +79,35 @@ def bulk_operations(request):
         operation = request.POST.get('operation')
         
         if operation == 'approve_all_pending':
-            count = Property.objects.filter(is_approved=False).update(is_approved=True)
+            pending = Property.objects.filter(is_approved=False)
+            keys = bucket_keys(pending)
+            count = pending.update(is_approved=True, updated_at=timezone.now())
+            drop_buckets(keys)
             messages.success(request, f'Approved {count} pending properties')
         
         elif operation == 'deactivate_expired':
-            count = Property.objects.filter(
+            expired = Property.objects.filter(
                 expires_at__lt=timezone.now(),
                 is_active=True
-            ).update(is_active=False)
+            )
+            keys = bucket_keys(expired)
+            count = expired.update(is_active=False, updated_at=timezone.now())
+            drop_buckets(keys)
             messages.success(request, f'Deactivated {count} expired properties')
         
         elif operation == 'cleanup_old_activities':
             cutoff = timezone.now() - timedelta(days=90)
-            count = UserActivity.objects.filter(created_at__lt=cutoff).count()
-            UserActivity.objects.filter(created_at__lt=cutoff).delete()
-            messages.success(request, f'Deleted {count} old activities')
+            activity_count = UserActivity.objects.filter(created_at__lt=cutoff).count()
+            search_count = SearchQuery.objects.filter(created_at__lt=cutoff).count()
+            purge_before(cutoff)
+            messages.success(
+                request, f'Deleted {activity_count} old activities and {search_count} old search queries'
+            )
         
         return redirect('admin:bulk_operations')
     
     # Get counts for display
-    pending_properties = Property.objects.filter(is_approved=False).count()
+    pending_properties = listing_counts(is_approved=False)
     expired_properties = Property.objects.filter(
         expires_at__lt=timezone.now(),
         is_active=True
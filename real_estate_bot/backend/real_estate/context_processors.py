@@ -1,6 +1,7 @@
 # backend/real_estate/context_processors.py
 from django.conf import settings
-from .models import TelegramUser, Property
+from .models import TelegramUser
+from .rollups import listing_summary
 from payments.models import Payment
 
 def admin_stats(request):
@@ -9,12 +10,13 @@ def admin_stats(request):
         return {}
     
     try:
+        listings = listing_summary()
         stats = {
             'total_users': TelegramUser.objects.count(),
-            'total_properties': Property.objects.count(),
-            'active_properties': Property.objects.filter(is_approved=True, is_active=True).count(),
-            'premium_properties': Property.objects.filter(is_premium=True).count(),
-            'pending_count': Property.objects.filter(is_approved=False).count(),
+            'total_properties': listings['total'],
+            'active_properties': listings['active'],
+            'premium_properties': listings['premium'],
+            'pending_count': listings['pending'],
             'total_payments': Payment.objects.count(),
             'completed_payments': Payment.objects.filter(status='completed').count(),
         }
@@ -0,0 +1,131 @@
+"""Process-wide cache of regions and districts
+
+Regions and districts are reference data that change only through the admin
+or populate_regions, yet nearly every listing response needs their names.
+get_gazetteer() returns an in-memory snapshot with O(1) lookups keyed by
+(region_key, district_key, lang). The snapshot carries the version stored in
+ReferenceDataVersion('gazetteer'); Region/District signals bump that version,
+and each process re-checks it at most every GAZETTEER_CHECK_INTERVAL seconds.
+The bot keeps its own copy from the same tables and version row
+(bot/utils/gazetteer.py).
+
+Snapshot objects are real Region/District instances shared between threads
+and must be treated as read-only.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Region, District, ReferenceDataVersion
+
+VERSION_NAME = 'gazetteer'
+LANGUAGES = ('uz', 'ru', 'en')
+
+
+class Gazetteer:
+    """Immutable snapshot of all regions and districts"""
+
+    def __init__(self, regions, districts, version):
+        self.version = version
+        self.regions = {region.key: region for region in regions}
+        self.regions_by_id = {region.pk: region for region in regions}
+        self.districts = {}
+        self.districts_by_id = {}
+        self.districts_by_region = {key: [] for key in self.regions}
+        self.names = {}
+
+        for region in regions:
+            for lang in LANGUAGES:
+                self.names[(region.key, None, lang)] = region.get_name(lang)
+
+        for district in districts:
+            region = self.regions_by_id[district.region_id]
+            # Share the cached region instead of a per-district copy
+            district.region = region
+            self.districts[(region.key, district.key)] = district
+            self.districts_by_id[district.pk] = district
+            self.districts_by_region[region.key].append(district)
+            for lang in LANGUAGES:
+                self.names[(region.key, district.key, lang)] = district.get_name(lang)
+
+    def region(self, region_key, active_only=False):
+        region = self.regions.get(region_key)
+        if region is None or (active_only and not region.is_active):
+            return None
+        return region
+
+    def district(self, region_key, district_key, active_only=False):
+        district = self.districts.get((region_key, district_key))
+        if district is None or (active_only and not (district.is_active and district.region.is_active)):
+            return None
+        return district
+
+    def name(self, region_key, district_key=None, lang='uz'):
+        return self.names.get((region_key, district_key, lang))
+
+    def location_display(self, region_key, district_key, lang='uz'):
+        """'District, Region' or None when the pair is unknown"""
+        district_name = self.name(region_key, district_key, lang)
+        if not district_name:
+            return None
+        return f"{district_name}, {self.name(region_key, None, lang)}"
+
+    def active_regions(self):
+        return [region for region in self.regions.values() if region.is_active]
+
+    def active_districts(self, region_key=None):
+        if region_key is not None:
+            region = self.region(region_key, active_only=True)
+            districts = self.districts_by_region.get(region_key, []) if region else []
+        else:
+            districts = self.districts.values()
+        return [district for district in districts if district.is_active and district.region.is_active]
+
+
+_snapshot = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def current_version():
+    version = ReferenceDataVersion.objects.filter(name=VERSION_NAME).values_list('version', flat=True).first()
+    return version or 0
+
+
+def load_gazetteer(version):
+    regions = list(Region.objects.order_by('order', 'name_uz'))
+    districts = list(District.objects.order_by('region__order', 'order', 'name_uz'))
+    return Gazetteer(regions, districts, version)
+
+
+def get_gazetteer():
+    """Current snapshot, reloaded when another process bumped the version"""
+    global _snapshot, _checked_at
+
+    snapshot = _snapshot
+    check_interval = getattr(settings, 'GAZETTEER_CHECK_INTERVAL', 30)
+    if snapshot is not None and time.monotonic() - _checked_at < check_interval:
+        return snapshot
+
+    with _lock:
+        # Read the version before the data so a concurrent bump is never missed
+        version = current_version()
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = load_gazetteer(version)
+        _checked_at = time.monotonic()
+        return _snapshot
+
+
+def invalidate_gazetteer():
+    """Drop this process' snapshot and make other processes reload theirs"""
+    global _snapshot
+
+    updated = ReferenceDataVersion.objects.filter(name=VERSION_NAME).update(
+        version=F('version') + 1, updated_at=timezone.now()
+    )
+    if not updated:
+        ReferenceDataVersion.objects.get_or_create(name=VERSION_NAME, defaults={'version': 1})
+    _snapshot = None
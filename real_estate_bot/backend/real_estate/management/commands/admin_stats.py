@@ -3,6 +3,7 @@ from django.db.models import Count, Sum, Avg
 from django.utils import timezone
 from datetime import timedelta
 from real_estate.models import TelegramUser, Property, Favorite, UserActivity
+from real_estate.rollups import listing_summary
 from payments.models import Payment
 
 class Command(BaseCommand):
@@ -48,13 +49,12 @@ class Command(BaseCommand):
         ).distinct().count()
         blocked_users = TelegramUser.objects.filter(is_blocked=True).count()
         
-        # Property statistics
-        total_properties = Property.objects.count()
-        active_properties = Property.objects.filter(
-            is_approved=True, is_active=True
-        ).count()
-        premium_properties = Property.objects.filter(is_premium=True).count()
-        pending_properties = Property.objects.filter(is_approved=False).count()
+        # Property statistics (from the rollup table)
+        listings = listing_summary()
+        total_properties = listings['total']
+        active_properties = listings['active']
+        premium_properties = listings['premium']
+        pending_properties = listings['pending']
         
         # Recent activity
         new_users = TelegramUser.objects.filter(
@@ -1,7 +1,9 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import timedelta
-from real_estate.models import Property, UserActivity
+from real_estate.models import Property, UserActivity, SearchQuery
+from real_estate.partitions import purge_before
+from real_estate.similar_listings import bucket_keys, drop_buckets
 from payments.models import Payment
 
 class Command(BaseCommand):
@@ -26,9 +28,9 @@ class Command(BaseCommand):
         
         cutoff_date = timezone.now() - timedelta(days=days)
         
-        # Clean up old user activities
-        old_activities = UserActivity.objects.filter(created_at__lt=cutoff_date)
-        activity_count = old_activities.count()
+        # Clean up old user activities and search queries (only scans the expired partitions)
+        activity_count = UserActivity.objects.filter(created_at__lt=cutoff_date).count()
+        search_count = SearchQuery.objects.filter(created_at__lt=cutoff_date).count()
         
         # Clean up expired properties
         expired_properties = Property.objects.filter(
@@ -49,19 +51,28 @@ class Command(BaseCommand):
                 self.style.WARNING('DRY RUN - No data will be deleted\n')
             )
             self.stdout.write(f"Would delete {activity_count} old activities")
+            self.stdout.write(f"Would delete {search_count} old search queries")
+            for table, names in purge_before(cutoff_date, dry_run=True).items():
+                for name in names:
+                    self.stdout.write(f"Would drop partition {name}")
             self.stdout.write(f"Would deactivate {expired_count} expired properties")
             self.stdout.write(f"Would delete {payment_count} old failed payments")
         else:
-            # Delete old activities
-            if activity_count > 0:
-                old_activities.delete()
+            # Delete old activities and searches, mostly by dropping whole month partitions
+            if activity_count > 0 or search_count > 0:
+                purge_before(cutoff_date)
                 self.stdout.write(
                     self.style.SUCCESS(f'Deleted {activity_count} old activities')
                 )
+                self.stdout.write(
+                    self.style.SUCCESS(f'Deleted {search_count} old search queries')
+                )
             
             # Deactivate expired properties
             if expired_count > 0:
-                expired_properties.update(is_active=False)
+                keys = bucket_keys(expired_properties)
+                expired_properties.update(is_active=False, updated_at=timezone.now())
+                drop_buckets(keys)
                 self.stdout.write(
                     self.style.SUCCESS(f'Deactivated {expired_count} expired properties')
                 )
@@ -73,7 +84,7 @@ class Command(BaseCommand):
                     self.style.SUCCESS(f'Deleted {payment_count} old failed payments')
                 )
             
-            if activity_count == 0 and expired_count == 0 and payment_count == 0:
+            if activity_count == 0 and search_count == 0 and expired_count == 0 and payment_count == 0:
                 self.stdout.write(
                     self.style.SUCCESS('No data to clean up')
                 )
\ No newline at end of file
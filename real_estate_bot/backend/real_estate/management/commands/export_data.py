@@ -1,12 +1,112 @@
 import csv
+import gzip
 import json
-from django.core.management.base import BaseCommand
-from django.http import HttpResponse
+from datetime import datetime, time
+from decimal import Decimal
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from real_estate.models import TelegramUser, Property
 from payments.models import Payment
 
+# name -> (model, [(column, ORM lookup)], fields compared with --since)
+# Rows are read with values_list() through a server-side cursor, so memory
+# stays bounded by --chunk-size whatever the table size
+EXPORTS = {
+    'users': (TelegramUser, [
+        ('id', 'id'),
+        ('telegram_id', 'telegram_id'),
+        ('username', 'username'),
+        ('first_name', 'first_name'),
+        ('last_name', 'last_name'),
+        ('language', 'language'),
+        ('is_blocked', 'is_blocked'),
+        ('balance', 'balance'),
+        ('properties_count', 'properties_count'),
+        ('favorites_count', 'favorites_count'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    ], ['updated_at']),
+    'properties': (Property, [
+        ('id', 'id'),
+        ('user_telegram_id', 'user__telegram_id'),
+        ('user_name', 'user__first_name'),
+        ('title', 'title'),
+        ('description', 'description'),
+        ('property_type', 'property_type'),
+        ('region', 'region'),
+        ('district', 'district'),
+        ('address', 'address'),
+        ('full_address', 'full_address'),
+        ('price', 'price'),
+        ('area', 'area'),
+        ('rooms', 'rooms'),
+        ('condition', 'condition'),
+        ('status', 'status'),
+        ('contact_info', 'contact_info'),
+        ('is_premium', 'is_premium'),
+        ('is_approved', 'is_approved'),
+        ('is_active', 'is_active'),
+        ('views_count', 'views_count'),
+        ('favorites_count', 'favorites_count'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+        ('expires_at', 'expires_at'),
+    ], ['updated_at']),
+    # Payments have no updated_at, a payment changes when it is created or completed
+    'payments': (Payment, [
+        ('id', 'id'),
+        ('user_telegram_id', 'user__telegram_id'),
+        ('user_name', 'user__first_name'),
+        ('amount', 'amount'),
+        ('payment_method', 'payment_method'),
+        ('service_type', 'service_type'),
+        ('status', 'status'),
+        ('transaction_id', 'transaction_id'),
+        ('external_id', 'external_id'),
+        ('property_id', 'property_id'),
+        ('property_title', 'property__title'),
+        ('description', 'description'),
+        ('created_at', 'created_at'),
+        ('completed_at', 'completed_at'),
+    ], ['created_at', 'completed_at']),
+}
+
+# Stored as dictionary-encoded (categorical) columns in Parquet, as are fields with choices
+CATEGORICAL_COLUMNS = {'region', 'district'}
+
+def resolve_field(model, lookup):
+    *path, name = lookup.split('__')
+    for part in path:
+        model = model._meta.get_field(part).related_model
+    field = model._meta.get_field(name)
+    return field.target_field if field.is_relation else field
+
+def arrow_type(pa, field, column):
+    if isinstance(field, models.DecimalField):
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    if isinstance(field, models.DateTimeField):
+        return pa.timestamp('us', tz='UTC')
+    if isinstance(field, models.BooleanField):
+        return pa.bool_()
+    if isinstance(field, (models.BigIntegerField, models.AutoField)):
+        return pa.int64()
+    if isinstance(field, models.IntegerField):
+        return pa.int32()
+    if field.choices or column in CATEGORICAL_COLUMNS:
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.string()
+
+def json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
 class Command(BaseCommand):
-    help = 'Export data to CSV or JSON format'
+    help = 'Export data to CSV, JSON, NDJSON or Parquet format'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -19,174 +119,215 @@ class Command(BaseCommand):
         parser.add_argument(
             '--format',
             type=str,
-            choices=['csv', 'json'],
+            choices=['csv', 'json', 'ndjson', 'parquet'],
             default='csv',
             help='Export format (default: csv)'
         )
         parser.add_argument(
             '--output',
             type=str,
-            help='Output file path'
+            help='Output file path (file name prefix with --model all)'
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Compress the output with gzip (Parquet: gzip instead of snappy pages)'
+        )
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='Only export rows changed since this date or datetime (ISO 8601)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Rows fetched per database round-trip (default: 2000)'
+        )
+        parser.add_argument(
+            '--columns',
+            type=str,
+            help='Comma-separated columns to export (default: all)'
+        )
+        parser.add_argument(
+            '--row-group-size',
+            type=int,
+            default=100000,
+            help='Rows per Parquet row group (default: 100000)'
         )
 
     def handle(self, *args, **options):
         model = options['model']
         format_type = options['format']
         output_path = options['output']
-        
-        if model == 'all':
-            self.export_all_data(format_type, output_path)
-        elif model == 'users':
-            self.export_users(format_type, output_path)
-        elif model == 'properties':
-            self.export_properties(format_type, output_path)
-        elif model == 'payments':
-            self.export_payments(format_type, output_path)
-
-    def export_all_data(self, format_type, output_path):
-        data = {
-            'users': self.get_users_data(),
-            'properties': self.get_properties_data(),
-            'payments': self.get_payments_data(),
-        }
-        
-        if format_type == 'json':
-            filename = output_path or 'real_estate_export.json'
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, default=str, ensure_ascii=False)
+        self.compress = options['gzip']
+        self.since = self.parse_since(options['since'])
+        self.chunk_size = options['chunk_size']
+        self.row_group_size = options['row_group_size']
+        self.columns = self.parse_columns(options['columns'], model)
+
+        # With --columns, models that have none of them are left out
+        names = [name for name in EXPORTS if self.get_columns(name)]
+        if model == 'all' and format_type == 'json':
+            self.export_all_json(output_path or 'real_estate_export.json', names)
+        elif model == 'all':
+            # One file per model
+            for name in names:
+                filename = f'{output_path}_{name}' if output_path else name
+                self.export(name, format_type, f'{filename}.{format_type}')
+        else:
+            self.export(model, format_type, output_path or f'{model}_export.{format_type}')
+
+    def parse_since(self, value):
+        if not value:
+            return None
+        since = parse_datetime(value)
+        if since is None:
+            day = parse_date(value)
+            if day is None:
+                raise CommandError(f'Invalid --since value: {value}')
+            since = datetime.combine(day, time.min)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since
+
+    def parse_columns(self, value, model):
+        if not value:
+            return None
+        requested = [column.strip() for column in value.split(',') if column.strip()]
+        names = list(EXPORTS) if model == 'all' else [model]
+        known = {column for name in names for column, lookup in EXPORTS[name][1]}
+        unknown = [column for column in requested if column not in known]
+        if unknown:
+            raise CommandError(f'Unknown columns: {", ".join(unknown)}')
+        return requested
+
+    def get_columns(self, name):
+        """(column, lookup) pairs to export, in --columns order when given"""
+        columns = EXPORTS[name][1]
+        if self.columns is None:
+            return columns
+        lookups = dict(columns)
+        return [(column, lookups[column]) for column in self.columns if column in lookups]
+
+    def get_rows(self, name):
+        model, _, since_fields = EXPORTS[name]
+        columns = self.get_columns(name)
+        queryset = model.objects.order_by('pk')
+
+        if self.since:
+            changed = Q()
+            for field in since_fields:
+                changed |= Q(**{f'{field}__gte': self.since})
+            queryset = queryset.filter(changed)
+
+        rows = queryset.values_list(*[lookup for column, lookup in columns])
+        return [column for column, lookup in columns], rows.iterator(chunk_size=self.chunk_size)
+
+    def open_output(self, filename):
+        if self.compress:
+            if not filename.endswith('.gz'):
+                filename += '.gz'
+            return filename, gzip.open(filename, 'wt', newline='', encoding='utf-8')
+        return filename, open(filename, 'w', newline='', encoding='utf-8')
+
+    def export(self, name, format_type, filename):
+        columns, rows = self.get_rows(name)
+        if format_type == 'parquet':
+            count = self.write_parquet(filename, name, rows)
             self.stdout.write(
-                self.style.SUCCESS(f'All data exported to {filename}')
+                self.style.SUCCESS(f'{name.capitalize()} exported to {filename} ({count} rows)')
             )
-        else:
-            # Export each model to separate CSV files
-            self.export_users('csv', f"{output_path or 'users'}.csv")
-            self.export_properties('csv', f"{output_path or 'properties'}.csv")
-            self.export_payments('csv', f"{output_path or 'payments'}.csv")
-
-    def export_users(self, format_type, output_path):
-        users_data = self.get_users_data()
-        filename = output_path or f'users_export.{format_type}'
-        
-        if format_type == 'json':
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(users_data, f, indent=2, default=str, ensure_ascii=False)
-        else:
-            with open(filename, 'w', newline='', encoding='utf-8') as f:
-                if users_data:
-                    writer = csv.DictWriter(f, fieldnames=users_data[0].keys())
-                    writer.writeheader()
-                    writer.writerows(users_data)
-        
-        self.stdout.write(
-            self.style.SUCCESS(f'Users exported to {filename}')
-        )
+            return
+
+        filename, f = self.open_output(filename)
+
+        with f:
+            if format_type == 'json':
+                count = self.write_json(f, columns, rows)
+            elif format_type == 'ndjson':
+                count = self.write_ndjson(f, columns, rows)
+            else:
+                count = self.write_csv(f, columns, rows)
 
-    def export_properties(self, format_type, output_path):
-        properties_data = self.get_properties_data()
-        filename = output_path or f'properties_export.{format_type}'
-        
-        if format_type == 'json':
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(properties_data, f, indent=2, default=str, ensure_ascii=False)
-        else:
-            with open(filename, 'w', newline='', encoding='utf-8') as f:
-                if properties_data:
-                    writer = csv.DictWriter(f, fieldnames=properties_data[0].keys())
-                    writer.writeheader()
-                    writer.writerows(properties_data)
-        
         self.stdout.write(
-            self.style.SUCCESS(f'Properties exported to {filename}')
+            self.style.SUCCESS(f'{name.capitalize()} exported to {filename} ({count} rows)')
         )
 
-    def export_payments(self, format_type, output_path):
-        payments_data = self.get_payments_data()
-        filename = output_path or f'payments_export.{format_type}'
-        
-        if format_type == 'json':
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(payments_data, f, indent=2, default=str, ensure_ascii=False)
-        else:
-            with open(filename, 'w', newline='', encoding='utf-8') as f:
-                if payments_data:
-                    writer = csv.DictWriter(f, fieldnames=payments_data[0].keys())
-                    writer.writeheader()
-                    writer.writerows(payments_data)
-        
+    def export_all_json(self, filename, names):
+        filename, f = self.open_output(filename)
+        counts = {}
+
+        with f:
+            f.write('{')
+            for index, name in enumerate(names):
+                f.write(f'{"," if index else ""}\n"{name}": ')
+                counts[name] = self.write_json(f, *self.get_rows(name))
+            f.write('\n}\n')
+
+        summary = ', '.join(f'{count} {name}' for name, count in counts.items())
         self.stdout.write(
-            self.style.SUCCESS(f'Payments exported to {filename}')
+            self.style.SUCCESS(f'All data exported to {filename} ({summary})')
         )
 
-    def get_users_data(self):
-        users = TelegramUser.objects.all()
-        return [
-            {
-                'id': user.id,
-                'telegram_id': user.telegram_id,
-                'username': user.username,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'language': user.language,
-                'is_blocked': user.is_blocked,
-                'balance': float(user.balance),
-                'properties_count': user.properties.count(),
-                'favorites_count': user.favorites.count(),
-                'created_at': user.created_at,
-                'updated_at': user.updated_at,
-            }
-            for user in users
-        ]
-
-    def get_properties_data(self):
-        properties = Property.objects.select_related('user')
-        return [
-            {
-                'id': prop.id,
-                'user_telegram_id': prop.user.telegram_id,
-                'user_name': prop.user.first_name,
-                'title': prop.title,
-                'description': prop.description,
-                'property_type': prop.property_type,
-                'region': prop.region,
-                'district': prop.district,
-                'address': prop.address,
-                'full_address': prop.full_address,
-                'price': float(prop.price),
-                'area': prop.area,
-                'rooms': prop.rooms,
-                'condition': prop.condition,
-                'status': prop.status,
-                'contact_info': prop.contact_info,
-                'is_premium': prop.is_premium,
-                'is_approved': prop.is_approved,
-                'is_active': prop.is_active,
-                'views_count': prop.views_count,
-                'favorites_count': prop.favorited_by.count(),
-                'created_at': prop.created_at,
-                'updated_at': prop.updated_at,
-                'expires_at': prop.expires_at,
-            }
-            for prop in properties
-        ]
-
-    def get_payments_data(self):
-        payments = Payment.objects.select_related('user', 'property')
-        return [
-            {
-                'id': payment.id,
-                'user_telegram_id': payment.user.telegram_id,
-                'user_name': payment.user.first_name,
-                'amount': float(payment.amount),
-                'payment_method': payment.payment_method,
-                'service_type': payment.service_type,
-                'status': payment.status,
-                'transaction_id': payment.transaction_id,
-                'external_id': payment.external_id,
-                'property_id': payment.property.id if payment.property else None,
-                'property_title': payment.property.title if payment.property else None,
-                'description': payment.description,
-                'created_at': payment.created_at,
-                'completed_at': payment.completed_at,
-            }
-            for payment in payments
-        ]
\ No newline at end of file
+    def write_csv(self, f, columns, rows):
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        count = 0
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+        return count
+
+    def write_ndjson(self, f, columns, rows):
+        count = 0
+        for row in rows:
+            f.write(json.dumps(dict(zip(columns, row)), default=json_default, ensure_ascii=False))
+            f.write('\n')
+            count += 1
+        return count
+
+    def write_json(self, f, columns, rows):
+        # A JSON array written one object per line, never held in memory as a whole
+        f.write('[')
+        count = 0
+        for row in rows:
+            f.write(',\n' if count else '\n')
+            f.write(json.dumps(dict(zip(columns, row)), default=json_default, ensure_ascii=False))
+            count += 1
+        f.write('\n]' if count else ']')
+        return count
+
+    def write_parquet(self, filename, name, rows):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise CommandError('Parquet export requires pyarrow: pip install pyarrow')
+
+        model = EXPORTS[name][0]
+        schema = pa.schema([
+            pa.field(column, arrow_type(pa, resolve_field(model, lookup), column))
+            for column, lookup in self.get_columns(name)
+        ])
+
+        count = 0
+        compression = 'gzip' if self.compress else 'snappy'
+        with pq.ParquetWriter(filename, schema, compression=compression) as writer:
+            # Only one row group of values is held in memory at a time
+            while True:
+                batch = list(islice(rows, self.row_group_size))
+                if not batch:
+                    break
+                writer.write_table(self.arrow_table(pa, schema, batch), row_group_size=self.row_group_size)
+                count += len(batch)
+        return count
+
+    def arrow_table(self, pa, schema, batch):
+        arrays = []
+        for field, values in zip(schema, zip(*batch)):
+            if pa.types.is_dictionary(field.type):
+                arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(values, type=field.type))
+        return pa.Table.from_arrays(arrays, schema=schema)
@@ -0,0 +1,53 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from real_estate.partitions import (
+    PARTITIONED_TABLES, add_months, ensure_partitions, month_start, purge_before
+)
+
+class Command(BaseCommand):
+    help = 'Create upcoming monthly partitions of the activity/search tables and drop expired ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=3,
+            help='Create partitions up to this many months ahead (default: 3)'
+        )
+        parser.add_argument(
+            '--retain-days',
+            type=int,
+            help='Drop activity/search data older than specified days'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show which partitions would be dropped without dropping them'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Table partitioning requires PostgreSQL')
+
+        now = timezone.now()
+        first, last = month_start(now), add_months(month_start(now), options['months_ahead'])
+
+        if not options['dry_run']:
+            with transaction.atomic(), connection.cursor() as cursor:
+                for table in PARTITIONED_TABLES:
+                    for name in ensure_partitions(cursor, table, first, last):
+                        self.stdout.write(self.style.SUCCESS(f'Created partition {name}'))
+
+        if options['retain_days'] is None:
+            return
+
+        cutoff = now - timedelta(days=options['retain_days'])
+        dropped = purge_before(cutoff, dry_run=options['dry_run'])
+        for table, names in dropped.items():
+            for name in names:
+                if options['dry_run']:
+                    self.stdout.write(self.style.WARNING(f'DRY RUN: would drop partition {name}'))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'Dropped partition {name}'))
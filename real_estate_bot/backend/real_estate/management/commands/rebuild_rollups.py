@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from real_estate.models import ListingCountRollup
+from real_estate.rollups import DIMENSIONS, EXPECTED_SQL, LOCK_SQL, REBUILD_SQL
+
+class Command(BaseCommand):
+    help = 'Recompute listing count rollups from the property table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report groups whose rollup count is wrong'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                # Property writes wait until we're done so no trigger update is lost
+                cursor.execute(LOCK_SQL)
+                cursor.execute(EXPECTED_SQL)
+                expected = {tuple(row[:-1]): row[-1] for row in cursor.fetchall()}
+
+            current = {
+                tuple(row[:-1]): row[-1]
+                for row in ListingCountRollup.objects.filter(count__gt=0).values_list(*DIMENSIONS, 'count')
+            }
+
+            drift = {
+                key: (current.get(key, 0), expected.get(key, 0))
+                for key in set(current) | set(expected)
+                if current.get(key, 0) != expected.get(key, 0)
+            }
+
+            for key, (stored, actual) in sorted(drift.items(), key=lambda item: str(item[0])):
+                self.stdout.write(f'{"/".join(str(value) for value in key)}: {stored} -> {actual}')
+
+            if dry_run:
+                self.stdout.write(
+                    self.style.WARNING(f'DRY RUN: {len(drift)} rollup groups out of date')
+                )
+                return
+
+            with connection.cursor() as cursor:
+                cursor.execute(REBUILD_SQL)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Rebuilt {len(expected)} rollup groups ({len(drift)} were out of date)'
+            )
+        )
@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+# name -> (table, counter column, query yielding (id, actual) for every row)
+COUNTERS = {
+    'property.favorites_count': (
+        'real_estate_property', 'favorites_count',
+        '''
+        SELECT p.id, COUNT(f.id)
+        FROM real_estate_property p
+        LEFT JOIN real_estate_favorite f ON f.property_id = p.id
+        GROUP BY p.id
+        ''',
+    ),
+    'user.properties_count': (
+        'real_estate_telegramuser', 'properties_count',
+        '''
+        SELECT u.id, COUNT(p.id)
+        FROM real_estate_telegramuser u
+        LEFT JOIN real_estate_property p ON p.user_id = u.id
+        GROUP BY u.id
+        ''',
+    ),
+    'user.favorites_count': (
+        'real_estate_telegramuser', 'favorites_count',
+        '''
+        SELECT u.id, COUNT(f.id)
+        FROM real_estate_telegramuser u
+        LEFT JOIN real_estate_favorite f ON f.user_id = u.id
+        GROUP BY u.id
+        ''',
+    ),
+}
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized counters that drifted from their source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many rows are wrong'
+        )
+        parser.add_argument(
+            '--counter',
+            choices=sorted(COUNTERS),
+            action='append',
+            help='Counter to reconcile (default: all)'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        names = options['counter'] or sorted(COUNTERS)
+
+        for name in names:
+            table, column, actual_sql = COUNTERS[name]
+            with transaction.atomic(), connection.cursor() as cursor:
+                if dry_run:
+                    cursor.execute(f'''
+                        SELECT COUNT(*)
+                        FROM {table} t JOIN ({actual_sql}) AS actual(id, value) ON actual.id = t.id
+                        WHERE t.{column} <> actual.value
+                    ''')
+                    drifted = cursor.fetchone()[0]
+                    self.stdout.write(self.style.WARNING(f'DRY RUN: {name}: {drifted} rows out of date'))
+                    continue
+
+                # Only rows that differ are written, so a clean table costs one read
+                cursor.execute(f'''
+                    UPDATE {table} t
+                    SET {column} = actual.value
+                    FROM ({actual_sql}) AS actual(id, value)
+                    WHERE actual.id = t.id AND t.{column} <> actual.value
+                ''')
+                self.stdout.write(self.style.SUCCESS(f'{name}: fixed {cursor.rowcount} rows'))
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('real_estate', '0002_propertyimage_searchquery_alter_district_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_approved', True)), fields=['is_premium', 'created_at', 'id'], name='property_browse_idx'),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 4.2.7 on 2026-10-17 10:05
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# Text is lowercased and stripped of the apostrophe variants used in Uzbek
+# Latin (o'g'li / oʻgʻli / o‘g‘li) before it is tokenized, both for the stored
+# document and for the query, so spelling variants produce the same lexemes.
+# Each field is indexed with the 'simple' config (exact words, Uzbek has no
+# stemmer) plus 'russian' and 'english' stemming.
+SEARCH_FUNCTIONS_SQL = """
+CREATE OR REPLACE FUNCTION real_estate_search_normalize(value text) RETURNS text AS $$
+    SELECT translate(lower(coalesce(value, '')), '''`´ʻʼ‘’', '')
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION real_estate_search_tsvector(value text) RETURNS tsvector AS $$
+    SELECT to_tsvector('simple'::regconfig, s.doc)
+        || to_tsvector('russian'::regconfig, s.doc)
+        || to_tsvector('english'::regconfig, s.doc)
+    FROM (SELECT real_estate_search_normalize(value) AS doc) s
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION real_estate_tsquery(value text) RETURNS tsquery AS $$
+    SELECT plainto_tsquery('simple'::regconfig, s.q)
+        || plainto_tsquery('russian'::regconfig, s.q)
+        || plainto_tsquery('english'::regconfig, s.q)
+    FROM (SELECT real_estate_search_normalize(value) AS q) s
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION real_estate_property_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(real_estate_search_tsvector(NEW.title), 'A')
+        || setweight(real_estate_search_tsvector(
+            coalesce(NEW.address, '') || ' ' || coalesce(NEW.full_address, '')), 'B')
+        || setweight(real_estate_search_tsvector(NEW.description), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS real_estate_property_search_vector_trigger ON real_estate_property;
+CREATE TRIGGER real_estate_property_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, description, address, full_address
+    ON real_estate_property
+    FOR EACH ROW EXECUTE PROCEDURE real_estate_property_search_vector_update();
+
+UPDATE real_estate_property SET
+    search_vector =
+        setweight(real_estate_search_tsvector(title), 'A')
+        || setweight(real_estate_search_tsvector(
+            coalesce(address, '') || ' ' || coalesce(full_address, '')), 'B')
+        || setweight(real_estate_search_tsvector(description), 'C');
+"""
+
+DROP_SEARCH_FUNCTIONS_SQL = """
+DROP TRIGGER IF EXISTS real_estate_property_search_vector_trigger ON real_estate_property;
+DROP FUNCTION IF EXISTS real_estate_property_search_vector_update();
+DROP FUNCTION IF EXISTS real_estate_tsquery(text);
+DROP FUNCTION IF EXISTS real_estate_search_tsvector(text);
+DROP FUNCTION IF EXISTS real_estate_search_normalize(text);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('real_estate', '0003_property_browse_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(SEARCH_FUNCTIONS_SQL, DROP_SEARCH_FUNCTIONS_SQL),
+        migrations.AddIndex(
+            model_name='property',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='property_search_vector_idx'),
+        ),
+    ]
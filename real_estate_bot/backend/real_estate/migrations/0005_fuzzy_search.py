@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 11:20
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+import real_estate.transliteration
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('real_estate', '0004_property_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunSQL(
+            real_estate.transliteration.create_functions_sql(),
+            real_estate.transliteration.DROP_FUNCTIONS_SQL,
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(real_estate.transliteration.FuzzyDocument(), name='gin_trgm_ops'), name='property_fuzzy_trgm_idx'),
+        ),
+        migrations.AlterField(
+            model_name='searchquery',
+            name='search_type',
+            field=models.CharField(choices=[('keyword', 'Keyword Search'), ('fuzzy', 'Fuzzy Search'), ('location', 'Location Search'), ('filters', 'Advanced Filters')], max_length=50),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-17 12:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('real_estate', '0005_fuzzy_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BotState',
+            fields=[
+                ('key', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('state', models.CharField(blank=True, max_length=255, null=True)),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Bot State',
+                'verbose_name_plural': 'Bot States',
+            },
+        ),
+    ]
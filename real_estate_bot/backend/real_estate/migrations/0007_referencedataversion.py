@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-17 14:05
+
+from django.db import migrations, models
+
+
+def create_gazetteer_version(apps, schema_editor):
+    ReferenceDataVersion = apps.get_model('real_estate', 'ReferenceDataVersion')
+    ReferenceDataVersion.objects.get_or_create(name='gazetteer')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('real_estate', '0006_botstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferenceDataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Reference Data Version',
+                'verbose_name_plural': 'Reference Data Versions',
+            },
+        ),
+        migrations.RunPython(create_gazetteer_version, migrations.RunPython.noop),
+    ]
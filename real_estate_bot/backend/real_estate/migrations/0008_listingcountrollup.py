@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-17 14:50
+
+from django.db import migrations, models
+import real_estate.rollups
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('real_estate', '0007_referencedataversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingCountRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('region', models.CharField(blank=True, max_length=50)),
+                ('district', models.CharField(blank=True, max_length=50)),
+                ('property_type', models.CharField(max_length=20)),
+                ('status', models.CharField(max_length=10)),
+                ('approval_status', models.CharField(max_length=20)),
+                ('is_approved', models.BooleanField()),
+                ('is_active', models.BooleanField()),
+                ('is_premium', models.BooleanField()),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Listing Count Rollup',
+                'verbose_name_plural': 'Listing Count Rollups',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='listingcountrollup',
+            constraint=models.UniqueConstraint(fields=('region', 'district', 'property_type', 'status', 'approval_status', 'is_approved', 'is_active', 'is_premium'), name='listing_rollup_dimensions_uniq'),
+        ),
+        migrations.RunSQL(
+            real_estate.rollups.CREATE_TRIGGER_SQL + real_estate.rollups.REBUILD_SQL,
+            real_estate.rollups.DROP_TRIGGER_SQL,
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:20
+
+from django.db import migrations, models
+import real_estate.partitions
+
+
+def partition_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table in real_estate.partitions.PARTITIONED_TABLES:
+            if not real_estate.partitions.is_partitioned(cursor, table):
+                real_estate.partitions.partition_table(cursor, table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('real_estate', '0008_listingcountrollup'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='searchquery',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.RunPython(partition_tables, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('real_estate', '0009_partition_activity_tables'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='telegramuser',
+            name='properties_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='telegramuser',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        # Database defaults for the bot's raw INSERTs, then the initial counts
+        migrations.RunSQL(
+            """
+            ALTER TABLE real_estate_telegramuser
+                ALTER COLUMN properties_count SET DEFAULT 0,
+                ALTER COLUMN favorites_count SET DEFAULT 0;
+
+            UPDATE real_estate_telegramuser u SET
+                properties_count = (SELECT COUNT(*) FROM real_estate_property p WHERE p.user_id = u.id),
+                favorites_count = (SELECT COUNT(*) FROM real_estate_favorite f WHERE f.user_id = u.id);
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
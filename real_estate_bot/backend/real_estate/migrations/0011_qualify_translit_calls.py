@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:10
+
+from django.db import migrations
+import real_estate.transliteration
+
+
+class Migration(migrations.Migration):
+    """Re-create the fuzzy search functions with schema-qualified calls on
+    databases that ran 0005 before they were qualified"""
+
+    dependencies = [
+        ('real_estate', '0010_telegramuser_counters'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            real_estate.transliteration.create_functions_sql(),
+            migrations.RunSQL.noop,
+        ),
+    ]
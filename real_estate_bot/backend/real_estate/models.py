@@ -1,9 +1,13 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.urls import reverse
 import json
 
+from .transliteration import FuzzyDocument
+
 class TelegramUser(models.Model):
     LANGUAGE_CHOICES = [
         ('uz', "O'zbekcha"),
@@ -20,6 +24,9 @@ class TelegramUser(models.Model):
     balance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     is_premium = models.BooleanField(default=False)
     premium_expires_at = models.DateTimeField(null=True, blank=True)
+    # Kept by Property/Favorite signals and the bot's SQL, see reconcile_counters
+    properties_count = models.PositiveIntegerField(default=0)
+    favorites_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -140,7 +147,7 @@ class Property(models.Model):
     
     # Statistics
     views_count = models.PositiveIntegerField(default=0)
-    favorites_count = models.PositiveIntegerField(default=0)
+    favorites_count = models.PositiveIntegerField(default=0)  # kept by Favorite signals, see reconcile_counters
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
@@ -152,6 +159,9 @@ class Property(models.Model):
     channel_message_id = models.BigIntegerField(null=True, blank=True)
     posted_to_channel = models.BooleanField(default=False)
     
+    # Full-text search document, maintained by a database trigger (see real_estate.search)
+    search_vector = SearchVectorField(null=True, editable=False)
+    
     def __str__(self):
         return f"{self.get_title()} - {self.price:,.0f} сум"
     
@@ -170,10 +180,6 @@ class Property(models.Model):
         if self.is_approved and not self.published_at:
             self.published_at = timezone.now()
         
-        # Update favorites count
-        if self.pk:
-            self.favorites_count = self.favorited_by.count()
-        
         super().save(*args, **kwargs)
     
     def is_expired(self):
@@ -189,20 +195,19 @@ class Property(models.Model):
     
     def get_location_display(self, language='uz'):
         """Get human-readable location"""
-        try:
-            if self.region and self.district:
-                region = Region.objects.get(key=self.region)
-                district = District.objects.get(region=region, key=self.district)
-                return f"{district.get_name(language)}, {region.get_name(language)}"
-        except (Region.DoesNotExist, District.DoesNotExist):
-            pass
+        from .gazetteer import get_gazetteer
+        
+        if self.region and self.district:
+            location = get_gazetteer().location_display(self.region, self.district, language)
+            if location:
+                return location
         
         return self.full_address or self.address
     
     def increment_views(self):
-        """Increment view count"""
-        self.views_count = models.F('views_count') + 1
-        self.save(update_fields=['views_count'])
+        """Count a view (written in batches by real_estate.view_counter)"""
+        from .view_counter import view_counter
+        view_counter.record(self.pk)
     
     def get_absolute_url(self):
         return reverse('property-detail', kwargs={'pk': self.pk})
@@ -233,6 +238,18 @@ class Property(models.Model):
             models.Index(fields=['region', 'district']),
             models.Index(fields=['-created_at']),
             models.Index(fields=['price']),
+            # Keyset pagination for bot listing browsing
+            models.Index(
+                fields=['is_premium', 'created_at', 'id'],
+                name='property_browse_idx',
+                condition=models.Q(is_approved=True, is_active=True),
+            ),
+            GinIndex(fields=['search_vector'], name='property_search_vector_idx'),
+            # Fuzzy search over transliterated title/address (pg_trgm)
+            GinIndex(
+                OpClass(FuzzyDocument(), name='gin_trgm_ops'),
+                name='property_fuzzy_trgm_idx',
+            ),
         ]
 
 class Favorite(models.Model):
@@ -307,12 +324,13 @@ class SearchQuery(models.Model):
     query = models.CharField(max_length=500)
     search_type = models.CharField(max_length=50, choices=[
         ('keyword', 'Keyword Search'),
+        ('fuzzy', 'Fuzzy Search'),
         ('location', 'Location Search'),
         ('filters', 'Advanced Filters'),
     ])
     filters_used = models.JSONField(default=dict, blank=True)
     results_count = models.PositiveIntegerField(default=0)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     
     def __str__(self):
         return f"Search: {self.query} ({self.results_count} results)"
@@ -322,20 +340,108 @@ class SearchQuery(models.Model):
         verbose_name = "Search Query"
         verbose_name_plural = "Search Queries"
 
+class BotState(models.Model):
+    """aiogram FSM state and data of one chat, written by the bot"""
+    key = models.CharField(max_length=255, primary_key=True)
+    state = models.CharField(max_length=255, null=True, blank=True)
+    data = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    def __str__(self):
+        return f"{self.key}: {self.state}"
+    
+    class Meta:
+        verbose_name = "Bot State"
+        verbose_name_plural = "Bot States"
+
+class ReferenceDataVersion(models.Model):
+    """Version counter of cached reference data (e.g. the region gazetteer)"""
+    name = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+    
+    class Meta:
+        verbose_name = "Reference Data Version"
+        verbose_name_plural = "Reference Data Versions"
+
+class ListingCountRollup(models.Model):
+    """Number of properties per combination of dimensions (see real_estate.rollups)
+
+    Maintained by a database trigger on real_estate_property, never written
+    from Python.
+    """
+    region = models.CharField(max_length=50, blank=True)
+    district = models.CharField(max_length=50, blank=True)
+    property_type = models.CharField(max_length=20)
+    status = models.CharField(max_length=10)
+    approval_status = models.CharField(max_length=20)
+    is_approved = models.BooleanField()
+    is_active = models.BooleanField()
+    is_premium = models.BooleanField()
+    count = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.region}/{self.district} {self.property_type} {self.status}: {self.count}"
+    
+    class Meta:
+        verbose_name = "Listing Count Rollup"
+        verbose_name_plural = "Listing Count Rollups"
+        constraints = [
+            models.UniqueConstraint(
+                fields=[
+                    'region', 'district', 'property_type', 'status',
+                    'approval_status', 'is_approved', 'is_active', 'is_premium'
+                ],
+                name='listing_rollup_dimensions_uniq'
+            ),
+        ]
+
 # Signal handlers to maintain data consistency
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
+# favorites_count is only ever changed by these atomic increments (and by the
+# bot's add_to_favorites); reconcile_counters repairs any drift
 @receiver(post_save, sender=Favorite)
 def update_favorites_count_add(sender, instance, created, **kwargs):
     if created:
-        instance.property.favorites_count = instance.property.favorited_by.count()
-        instance.property.save(update_fields=['favorites_count'])
+        Property.objects.filter(pk=instance.property_id).update(
+            favorites_count=models.F('favorites_count') + 1
+        )
 
 @receiver(post_delete, sender=Favorite)
 def update_favorites_count_remove(sender, instance, **kwargs):
-    try:
-        instance.property.favorites_count = instance.property.favorited_by.count()
-        instance.property.save(update_fields=['favorites_count'])
-    except Property.DoesNotExist:
-        pass
\ No newline at end of file
+    # No-op when the property itself is being deleted
+    Property.objects.filter(pk=instance.property_id, favorites_count__gt=0).update(
+        favorites_count=models.F('favorites_count') - 1
+    )
+
+# Same for the per-user counters of TelegramUser
+@receiver(post_save, sender=Favorite)
+def update_user_favorites_count_add(sender, instance, created, **kwargs):
+    if created:
+        TelegramUser.objects.filter(pk=instance.user_id).update(
+            favorites_count=models.F('favorites_count') + 1
+        )
+
+@receiver(post_delete, sender=Favorite)
+def update_user_favorites_count_remove(sender, instance, **kwargs):
+    TelegramUser.objects.filter(pk=instance.user_id, favorites_count__gt=0).update(
+        favorites_count=models.F('favorites_count') - 1
+    )
+
+@receiver(post_save, sender=Property)
+def update_user_properties_count_add(sender, instance, created, **kwargs):
+    if created:
+        TelegramUser.objects.filter(pk=instance.user_id).update(
+            properties_count=models.F('properties_count') + 1
+        )
+
+@receiver(post_delete, sender=Property)
+def update_user_properties_count_remove(sender, instance, **kwargs):
+    TelegramUser.objects.filter(pk=instance.user_id, properties_count__gt=0).update(
+        properties_count=models.F('properties_count') - 1
+    )
\ No newline at end of file
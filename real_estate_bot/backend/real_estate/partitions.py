@@ -0,0 +1,184 @@
+"""Monthly range partitions of the activity/search tables (PostgreSQL)
+
+real_estate_useractivity and real_estate_searchquery are partitioned by
+RANGE (created_at), one partition per calendar month named
+<table>_pYYYYMM, plus <table>_default for rows outside every month
+partition. Their primary key is (id, created_at) because PostgreSQL
+requires the partition key in unique constraints; Django still addresses
+rows by id.
+
+Retention drops whole partitions instead of deleting rows, and queries
+filtering on created_at only scan the months they need. Partitions are
+created ahead of time by `manage.py manage_partitions`; should a month be
+missing its rows land in the default partition and are moved out when the
+month's partition is created.
+"""
+import re
+from datetime import date, datetime, timezone
+
+from django.db import connection, transaction
+
+PARTITIONED_TABLES = ('real_estate_useractivity', 'real_estate_searchquery')
+
+_MONTH_SUFFIX = re.compile(r'_p(\d{4})(\d{2})$')
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f'{table}_p{month:%Y%m}'
+
+
+def default_partition_name(table):
+    return f'{table}_default'
+
+
+def _bound(month):
+    return f"'{month:%Y-%m-%d} 00:00:00+00'"
+
+
+def is_partitioned(cursor, table):
+    cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [table])
+    return cursor.fetchone() is not None
+
+
+def month_partitions(cursor, table):
+    """{first day of month: partition name} of the existing month partitions"""
+    cursor.execute('''
+        SELECT c.relname
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+    ''', [table])
+    partitions = {}
+    for (name,) in cursor.fetchall():
+        match = _MONTH_SUFFIX.search(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def create_month_partition(cursor, table, month):
+    """Create the partition of `month`, moving its rows out of the default partition"""
+    name = partition_name(table, month)
+    default = default_partition_name(table)
+    lower, upper = _bound(month), _bound(add_months(month, 1))
+
+    cursor.execute(
+        f'SELECT EXISTS (SELECT 1 FROM {default} WHERE created_at >= {lower} AND created_at < {upper})'
+    )
+    if not cursor.fetchone()[0]:
+        cursor.execute(f'CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM ({lower}) TO ({upper})')
+        return name
+
+    # The default partition must not hold rows of the new range when it is attached
+    cursor.execute(f'CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    cursor.execute(f'''
+        WITH moved AS (
+            DELETE FROM {default} WHERE created_at >= {lower} AND created_at < {upper}
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    ''')
+    cursor.execute(f'ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ({lower}) TO ({upper})')
+    return name
+
+
+def ensure_partitions(cursor, table, first_month, last_month):
+    """Create missing month partitions from first_month to last_month inclusive"""
+    existing = month_partitions(cursor, table)
+    created = []
+    month = month_start(first_month)
+    while month <= last_month:
+        if month not in existing:
+            created.append(create_month_partition(cursor, table, month))
+        month = add_months(month, 1)
+    return created
+
+
+def drop_partitions_before(cursor, table, cutoff, dry_run=False):
+    """Remove rows older than cutoff, return the dropped partition names
+
+    Months entirely before the cutoff are dropped as whole partitions; only
+    the month containing the cutoff and the default partition need a DELETE,
+    which partition pruning keeps away from every other month.
+    """
+    cutoff_month = month_start(cutoff)
+    dropped = [
+        name for month, name in sorted(month_partitions(cursor, table).items())
+        if add_months(month, 1) <= cutoff_month
+    ]
+    if dry_run:
+        return dropped
+
+    if dropped:
+        # Django's foreign keys are DEFERRABLE INITIALLY DEFERRED and a table
+        # with pending trigger events can't be dropped: check them now
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        for name in dropped:
+            cursor.execute(f'DROP TABLE {name}')
+        cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+    cursor.execute(f'DELETE FROM {table} WHERE created_at < %s', [cutoff])
+    return dropped
+
+
+def purge_before(cutoff, dry_run=False):
+    """Apply drop_partitions_before() to every partitioned table
+
+    Returns {table: dropped partition names}.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        return {
+            table: drop_partitions_before(cursor, table, cutoff, dry_run)
+            for table in PARTITIONED_TABLES
+        }
+
+
+def partition_table(cursor, table, months_ahead=3):
+    """Convert a regular table into a monthly partitioned one, keeping its data
+
+    Indexes and foreign keys are recreated under their original names so
+    later Django migrations can still find them.
+    """
+    old = f'{table}_unpartitioned'
+
+    cursor.execute('''
+        SELECT indexname, indexdef FROM pg_indexes
+        WHERE tablename = %s AND indexname <> %s
+    ''', [table, f'{table}_pkey'])
+    indexes = cursor.fetchall()
+    cursor.execute('''
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype = 'f'
+    ''', [table])
+    foreign_keys = cursor.fetchall()
+    cursor.execute(f'SELECT MIN(created_at), MAX(id) FROM {table}')
+    oldest, max_id = cursor.fetchone()
+
+    cursor.execute(f'ALTER TABLE {table} RENAME TO {old}')
+    cursor.execute(f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)')
+    cursor.execute(f'CREATE TABLE {default_partition_name(table)} PARTITION OF {table} DEFAULT')
+
+    now = datetime.now(timezone.utc)
+    ensure_partitions(cursor, table, month_start(oldest or now), add_months(month_start(now), months_ahead))
+
+    cursor.execute(f'INSERT INTO {table} SELECT * FROM {old}')
+    # Also drops the old identity/serial sequence and the old indexes
+    cursor.execute(f'DROP TABLE {old}')
+
+    cursor.execute(f'CREATE SEQUENCE {table}_id_seq OWNED BY {table}.id')
+    cursor.execute(f"SELECT setval('{table}_id_seq', %s, %s)", [max_id or 1, max_id is not None])
+    cursor.execute(f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{table}_id_seq')")
+    cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, created_at)')
+
+    # Definitions were read before the rename, so they target the new parent table
+    for name, definition in indexes:
+        cursor.execute(definition)
+    for name, definition in foreign_keys:
+        cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} {definition}')
@@ -0,0 +1,126 @@
+"""Cached responses for read-only public endpoints
+
+@cache_response('properties', ...) on a GET view stores its 200 responses
+under a key built from the namespaces' generation counters, the path and
+the sorted query parameters. Signals call invalidate(namespace) when the
+underlying data changes: the generation moves on, so older entries are
+never read again and simply expire. Rows the bot writes with raw SQL fire
+no signals, which is why entries also expire after RESPONSE_CACHE_TIMEOUT
+seconds.
+
+Every cached response carries an ETag and Last-Modified; a conditional
+request that still matches gets an empty 304.
+"""
+import hashlib
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpRequest
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+
+def get_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def _generation_key(namespace):
+    return f'resp-gen:{namespace}'
+
+
+def get_generations(namespaces):
+    """Current generation per namespace, starting new ones at the current time"""
+    cache = get_cache()
+    keys = [_generation_key(namespace) for namespace in namespaces]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            # A time-based start never reuses a generation of evicted counters
+            cache.add(key, time.time_ns(), timeout=None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def invalidate(*namespaces):
+    """Make every cached response of the namespaces stale"""
+    cache = get_cache()
+    for namespace in namespaces:
+        try:
+            cache.incr(_generation_key(namespace))
+        except ValueError:
+            cache.set(_generation_key(namespace), time.time_ns(), timeout=None)
+
+
+def response_key(request, namespaces):
+    generations = get_generations(namespaces)
+    params = urlencode(sorted(request.query_params.lists()), doseq=True)
+    viewer = getattr(request, 'user_id', '')
+    digest = hashlib.md5(f'{request.path}?{params}|{viewer}'.encode()).hexdigest()
+    version = '.'.join(f'{namespace}{generation}' for namespace, generation in zip(namespaces, generations))
+    return f'resp:{version}:{digest}'
+
+
+def is_not_modified(request, entry):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or entry['etag'] in tags
+
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since') or '')
+    return since is not None and int(entry['last_modified']) <= since
+
+
+def _find_request(args):
+    for arg in args:
+        if isinstance(arg, (Request, HttpRequest)):
+            return arg
+    raise TypeError('cache_response needs a view taking the request')
+
+
+def cache_response(*namespaces, timeout=None):
+    """Cache successful GET responses of a DRF view (function or viewset method)"""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            request = _find_request(args)
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+
+            cache = get_cache()
+            key = response_key(request, namespaces)
+            entry = cache.get(key)
+            hit = entry is not None
+
+            if not hit:
+                response = view(*args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                content = JSONRenderer().render(response.data)
+                entry = {
+                    'data': response.data,
+                    'etag': f'"{hashlib.md5(content).hexdigest()}"',
+                    'last_modified': time.time(),
+                }
+                cache.set(key, entry, timeout or settings.RESPONSE_CACHE_TIMEOUT)
+
+            headers = {
+                'ETag': entry['etag'],
+                'Last-Modified': http_date(entry['last_modified']),
+                # Clients may keep the body but must revalidate before using it
+                'Cache-Control': 'no-cache',
+                'X-Cache': 'HIT' if hit else 'MISS',
+            }
+            if is_not_modified(request, entry):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+            return Response(entry['data'], headers=headers)
+
+        return wrapper
+
+    return decorator
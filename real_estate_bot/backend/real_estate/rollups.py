@@ -0,0 +1,119 @@
+"""Listing counts from the ListingCountRollup table
+
+real_estate_listingcountrollup keeps one row per combination of the
+dimensions below with the number of properties in it. A trigger on
+real_estate_property adjusts the affected rows in the same transaction as
+every insert, delete and dimension change, whether it comes from Django or
+from the bot's raw SQL. Dashboards and count endpoints sum a few rollup
+rows instead of scanning properties. `manage.py rebuild_rollups`
+recomputes the table from scratch.
+
+region and district are stored as '' when the property has none.
+"""
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import ListingCountRollup
+
+DIMENSIONS = (
+    'region', 'district', 'property_type', 'status',
+    'approval_status', 'is_approved', 'is_active', 'is_premium',
+)
+
+_COLUMNS = ', '.join(DIMENSIONS)
+_SOURCE_COLUMNS = "COALESCE(region, ''), COALESCE(district, ''), " + ', '.join(DIMENSIONS[2:])
+
+CREATE_TRIGGER_SQL = f"""
+CREATE OR REPLACE FUNCTION real_estate_listing_rollup_apply(p real_estate_property, delta integer)
+RETURNS void AS $$
+BEGIN
+    INSERT INTO real_estate_listingcountrollup ({_COLUMNS}, count)
+    VALUES (
+        COALESCE(p.region, ''), COALESCE(p.district, ''), p.property_type, p.status,
+        p.approval_status, p.is_approved, p.is_active, p.is_premium, delta
+    )
+    ON CONFLICT ({_COLUMNS})
+    DO UPDATE SET count = real_estate_listingcountrollup.count + EXCLUDED.count;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION real_estate_listing_rollup_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND ({', '.join('OLD.' + c for c in DIMENSIONS)})
+            IS NOT DISTINCT FROM ({', '.join('NEW.' + c for c in DIMENSIONS)}) THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP <> 'INSERT' THEN
+        PERFORM real_estate_listing_rollup_apply(OLD, -1);
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        PERFORM real_estate_listing_rollup_apply(NEW, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS real_estate_listing_rollup ON real_estate_property;
+CREATE TRIGGER real_estate_listing_rollup
+    AFTER INSERT OR DELETE OR UPDATE OF {_COLUMNS} ON real_estate_property
+    FOR EACH ROW EXECUTE FUNCTION real_estate_listing_rollup_trigger();
+"""
+
+DROP_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS real_estate_listing_rollup ON real_estate_property;
+DROP FUNCTION IF EXISTS real_estate_listing_rollup_trigger();
+DROP FUNCTION IF EXISTS real_estate_listing_rollup_apply(real_estate_property, integer);
+"""
+
+# Blocks property writes (not reads) until the surrounding transaction ends
+LOCK_SQL = 'LOCK TABLE real_estate_property IN SHARE MODE'
+
+REBUILD_SQL = f"""
+DELETE FROM real_estate_listingcountrollup;
+INSERT INTO real_estate_listingcountrollup ({_COLUMNS}, count)
+SELECT {_SOURCE_COLUMNS}, COUNT(*)
+FROM real_estate_property
+GROUP BY {_SOURCE_COLUMNS};
+"""
+
+# (dimensions..., count) per group as it should be, for drift checks
+EXPECTED_SQL = f"""
+SELECT {_SOURCE_COLUMNS}, COUNT(*)
+FROM real_estate_property
+GROUP BY {_SOURCE_COLUMNS}
+"""
+
+
+def listing_counts(*fields, **filters):
+    """Number of properties matching filters
+
+    Without fields returns an int; with fields returns {value: count} for
+    one field or {(value, ...): count} for several. Filters are regular
+    lookups on the rollup dimensions, e.g. is_approved=True.
+    """
+    queryset = ListingCountRollup.objects.filter(**filters)
+    if not fields:
+        return queryset.aggregate(total=Coalesce(Sum('count'), 0))['total']
+
+    rows = queryset.values(*fields).annotate(total=Sum('count')).filter(total__gt=0).order_by()
+    if len(fields) == 1:
+        return {row[fields[0]]: row['total'] for row in rows}
+    return {tuple(row[field] for field in fields): row['total'] for row in rows}
+
+
+def _sum(condition=None):
+    return Coalesce(Sum('count', filter=condition), 0)
+
+
+def listing_summary():
+    """Totals shown on dashboards, in one query"""
+    return ListingCountRollup.objects.aggregate(
+        total=_sum(),
+        approved=_sum(Q(is_approved=True)),
+        active=_sum(Q(is_approved=True, is_active=True)),
+        pending=_sum(Q(is_approved=False)),
+        premium=_sum(Q(is_premium=True)),
+        approved_premium=_sum(Q(is_approved=True, is_premium=True)),
+        status_pending=_sum(Q(approval_status='pending')),
+        status_approved=_sum(Q(approval_status='approved')),
+    )
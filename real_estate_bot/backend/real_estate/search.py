@@ -0,0 +1,97 @@
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, TrigramWordSimilarity
+)
+from django.db.models import F, Q, Value, Case, When, FloatField
+from django.db.models.functions import Greatest
+
+from .models import Region, District
+from .transliteration import Translit, LocationAlias, FuzzyDocument, transliterate
+
+# Minimum word_similarity() for a region/district name to count as mentioned
+LOCATION_MATCH_THRESHOLD = 0.6
+
+NAME_LANGUAGES = ('uz', 'ru', 'en')
+
+
+class ListingSearchQuery(SearchQuery):
+    """tsquery built by the real_estate_tsquery() SQL function
+
+    The function applies the same normalization and simple/russian/english
+    configs as the trigger that fills Property.search_vector (migration 0004),
+    so queries and documents always agree on lexemes.
+    """
+
+    def __init__(self, value):
+        super().__init__(value)
+        # SearchQuery picks plainto_tsquery() etc. in __init__, override after
+        self.function = 'real_estate_tsquery'
+
+
+def search_properties(queryset, query):
+    """Filter queryset by full-text match and order by relevance"""
+    search_query = ListingSearchQuery(query)
+    return queryset.annotate(
+        search_rank=SearchRank(F('search_vector'), search_query)
+    ).filter(
+        search_vector=search_query
+    ).order_by('-search_rank', '-is_premium', '-created_at')
+
+
+def _name_similarity(query, prefix=''):
+    folded_query = Translit(Value(query))
+    return Greatest(*[
+        TrigramWordSimilarity(LocationAlias(f'{prefix}name_{lang}'), folded_query)
+        for lang in NAME_LANGUAGES
+    ])
+
+
+def resolve_locations(query, threshold=LOCATION_MATCH_THRESHOLD):
+    """Return (region_key, district_key) pairs whose name appears in query
+
+    district_key is None when the whole region was named.
+    """
+    regions = Region.objects.filter(is_active=True).annotate(
+        name_match=_name_similarity(query)
+    ).filter(name_match__gte=threshold).values_list('key', flat=True)
+
+    districts = District.objects.filter(is_active=True, region__is_active=True).annotate(
+        name_match=_name_similarity(query)
+    ).filter(name_match__gte=threshold).values_list('region__key', 'key')
+
+    return [(key, None) for key in regions] + list(districts)
+
+
+def fuzzy_search_properties(queryset, query):
+    """Typo and transliteration tolerant search ranked by trigram similarity
+
+    Matches listings whose title/address contains something close to the
+    query (GIN trigram index on FuzzyDocument) or that are located in a
+    region/district the query names in any spelling.
+    """
+    if not transliterate(query).strip():
+        return queryset.none()
+
+    folded_query = Translit(Value(query))
+    match = Q(fuzzy_document__trigram_word_similar=folded_query)
+    rank = TrigramWordSimilarity(folded_query, FuzzyDocument())
+
+    location_match = Q()
+    for region_key, district_key in resolve_locations(query):
+        if district_key is None:
+            location_match |= Q(region=region_key)
+        else:
+            location_match |= Q(region=region_key, district=district_key)
+
+    if location_match:
+        match |= location_match
+        rank = Greatest(rank, Case(
+            When(location_match, then=Value(1.0)),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ))
+
+    return queryset.alias(
+        fuzzy_document=FuzzyDocument()
+    ).filter(match).annotate(
+        search_rank=rank
+    ).order_by('-search_rank', '-is_premium', '-created_at')
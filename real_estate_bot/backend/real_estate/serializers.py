@@ -1,15 +1,19 @@
 from rest_framework import serializers
+from django.conf import settings
+from django.db import models
 from django.utils import timezone
 from .models import (
     TelegramUser, Property, Favorite, UserActivity, 
     Region, District, PropertyImage, SearchQuery
 )
+from .gazetteer import get_gazetteer
+from .rollups import listing_counts
+from .response_cache import get_cache as get_response_cache
+from .similar_listings import similar_listing_ids
 
 class TelegramUserSerializer(serializers.ModelSerializer):
     full_name = serializers.CharField(source='get_full_name', read_only=True)
-    properties_count = serializers.SerializerMethodField()
-    favorites_count = serializers.SerializerMethodField()
-    is_premium_active = serializers.BooleanField(source='is_premium_active', read_only=True)
+    is_premium_active = serializers.BooleanField(read_only=True)
     
     class Meta:
         model = TelegramUser
@@ -19,15 +23,53 @@ class TelegramUserSerializer(serializers.ModelSerializer):
             'premium_expires_at', 'properties_count', 'favorites_count',
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['created_at', 'updated_at', 'full_name', 'is_premium_active']
+        read_only_fields = [
+            'created_at', 'updated_at', 'full_name', 'is_premium_active',
+            'properties_count', 'favorites_count'
+        ]
+
+class TelegramUserUpsertSerializer(serializers.Serializer):
+    """Input of create_or_get_user / bulk upsert, only provided fields are written"""
+    telegram_id = serializers.IntegerField()
+    username = serializers.CharField(max_length=100, required=False, allow_blank=True, allow_null=True)
+    first_name = serializers.CharField(max_length=100, required=False, allow_blank=True, allow_null=True)
+    last_name = serializers.CharField(max_length=100, required=False, allow_blank=True, allow_null=True)
+    language = serializers.ChoiceField(choices=TelegramUser.LANGUAGE_CHOICES, required=False)
+
+def build_location_counts():
+    """Visible property counts per (region, district) and per (region, None)"""
+    counts = {}
+    rows = listing_counts('region', 'district', is_approved=True, is_active=True)
     
-    def get_properties_count(self, obj):
-        return obj.properties.count()
+    for (region, district), total in rows.items():
+        counts[(region, district)] = total
+        counts[(region, None)] = counts.get((region, None), 0) + total
+    return counts
+
+class LocationCountsListSerializer(serializers.ListSerializer):
+    """Counts properties for every serialized region/district with one GROUP BY"""
     
-    def get_favorites_count(self, obj):
-        return obj.favorites.count()
+    def to_representation(self, data):
+        self.location_counts = self.context.get('location_counts')
+        if self.location_counts is None:
+            self.location_counts = build_location_counts()
+        return super().to_representation(data)
+
+class LocationCountsMixin:
+    def get_location_count(self, region_key, district_key=None):
+        counts = getattr(self.parent, 'location_counts', None)
+        if counts is None:
+            counts = self.context.get('location_counts')
+        if counts is not None:
+            return counts.get((region_key, district_key), 0)
+        
+        # Single object outside a list
+        filters = {'region': region_key, 'is_approved': True, 'is_active': True}
+        if district_key is not None:
+            filters['district'] = district_key
+        return listing_counts(**filters)
 
-class RegionSerializer(serializers.ModelSerializer):
+class RegionSerializer(LocationCountsMixin, serializers.ModelSerializer):
     properties_count = serializers.SerializerMethodField()
     
     class Meta:
@@ -36,11 +78,12 @@ class RegionSerializer(serializers.ModelSerializer):
             'id', 'name_uz', 'name_ru', 'name_en', 'key', 
             'is_active', 'order', 'properties_count'
         ]
+        list_serializer_class = LocationCountsListSerializer
     
     def get_properties_count(self, obj):
-        return Property.objects.filter(region=obj.key, is_approved=True).count()
+        return self.get_location_count(obj.key)
 
-class DistrictSerializer(serializers.ModelSerializer):
+class DistrictSerializer(LocationCountsMixin, serializers.ModelSerializer):
     region_name = serializers.CharField(source='region.name_uz', read_only=True)
     region_key = serializers.CharField(source='region.key', read_only=True)
     properties_count = serializers.SerializerMethodField()
@@ -52,13 +95,10 @@ class DistrictSerializer(serializers.ModelSerializer):
             'region', 'region_name', 'region_key', 'is_active', 
             'order', 'properties_count'
         ]
+        list_serializer_class = LocationCountsListSerializer
     
     def get_properties_count(self, obj):
-        return Property.objects.filter(
-            region=obj.region.key, 
-            district=obj.key, 
-            is_approved=True
-        ).count()
+        return self.get_location_count(obj.region.key, obj.key)
 
 class PropertyImageSerializer(serializers.ModelSerializer):
     class Meta:
@@ -68,6 +108,35 @@ class PropertyImageSerializer(serializers.ModelSerializer):
             'order', 'is_main', 'uploaded_at'
         ]
 
+def get_viewer_telegram_id(context):
+    request = context.get('request')
+    if request and hasattr(request, 'user_id'):
+        return request.user_id
+    return None
+
+def build_page_lookups(properties, context):
+    """Favorite flags for a page of properties in one query"""
+    favorited_ids = set()
+    viewer = get_viewer_telegram_id(context)
+    if viewer is not None and properties:
+        favorited_ids = set(Favorite.objects.filter(
+            user__telegram_id=viewer,
+            property_id__in=[obj.pk for obj in properties]
+        ).values_list('property_id', flat=True))
+    
+    return {'favorited_ids': favorited_ids}
+
+class PropertyPageSerializer(serializers.ListSerializer):
+    """Resolves per-row lookups of PropertyListSerializer once for the page"""
+    
+    def get_properties(self, items):
+        return items
+    
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        self.page_lookups = build_page_lookups(self.get_properties(items), self.context)
+        return super().to_representation(items)
+
 class PropertyListSerializer(serializers.ModelSerializer):
     """Serializer for property list view (minimal data)"""
     user_name = serializers.SerializerMethodField()
@@ -90,6 +159,17 @@ class PropertyListSerializer(serializers.ModelSerializer):
             'user_username', 'first_photo_id', 'is_favorited', 'days_ago',
             'created_at', 'updated_at'
         ]
+        list_serializer_class = PropertyPageSerializer
+    
+    def get_page_lookups(self):
+        """Lookups primed by an enclosing PropertyPageSerializer, if any"""
+        node = self.parent
+        while node is not None:
+            lookups = getattr(node, 'page_lookups', None)
+            if lookups is not None:
+                return lookups
+            node = node.parent
+        return None
     
     def get_user_name(self, obj):
         return obj.user.get_full_name() or obj.user.username or f"User {obj.user.telegram_id}"
@@ -101,6 +181,10 @@ class PropertyListSerializer(serializers.ModelSerializer):
         return f"{obj.price:,.0f} сум"
     
     def get_is_favorited(self, obj):
+        lookups = self.get_page_lookups()
+        if lookups is not None:
+            return obj.pk in lookups['favorited_ids']
+        
         request = self.context.get('request')
         if request and hasattr(request, 'user_id'):
             try:
@@ -131,7 +215,12 @@ class PropertyListSerializer(serializers.ModelSerializer):
             return f"{months} мес назад"
 
 class PropertyDetailSerializer(serializers.ModelSerializer):
-    """Serializer for property detail view (full data)"""
+    """Serializer for property detail view (full data)
+    
+    The listing, its owner and its location are cached as separate fragments
+    keyed by their versions; only the counters, the viewer flags and the
+    similar listings are resolved on every request.
+    """
     user = TelegramUserSerializer(read_only=True)
     location_display = serializers.SerializerMethodField()
     price_formatted = serializers.SerializerMethodField()
@@ -145,6 +234,9 @@ class PropertyDetailSerializer(serializers.ModelSerializer):
     district_info = serializers.SerializerMethodField()
     similar_properties = serializers.SerializerMethodField()
     
+    LIVE_FIELDS = ('views_count', 'favorites_count', 'is_favorited', 'is_owner', 'similar_properties')
+    LOCATION_FIELDS = ('region_info', 'district_info')
+    
     class Meta:
         model = Property
         fields = [
@@ -157,6 +249,44 @@ class PropertyDetailSerializer(serializers.ModelSerializer):
             'similar_properties', 'created_at', 'updated_at', 'published_at'
         ]
     
+    def to_representation(self, instance):
+        cache = get_response_cache()
+        timeout = settings.DETAIL_CACHE_TIMEOUT
+        listing_fields = [
+            name for name in self.Meta.fields
+            if name not in self.LIVE_FIELDS + self.LOCATION_FIELDS + ('user',)
+        ]
+        
+        # updated_at moves on every write of the listing (admin, API and bot)
+        data = dict(cache.get_or_set(
+            f'detail:listing:{instance.pk}:{instance.updated_at.timestamp()}',
+            lambda: self.serialize_fields(instance, listing_fields),
+            timeout
+        ))
+        # The counters are incremented in place (models.py, bot) without touching updated_at
+        owner = instance.user
+        data.update(cache.get_or_set(
+            f'detail:owner:{owner.pk}:{owner.updated_at.timestamp()}:'
+            f'{owner.properties_count}:{owner.favorites_count}',
+            lambda: self.serialize_fields(instance, ['user']),
+            timeout
+        ))
+        data.update(cache.get_or_set(
+            f'detail:location:{instance.region}:{instance.district}:{get_gazetteer().version}',
+            lambda: self.serialize_fields(instance, self.LOCATION_FIELDS),
+            timeout
+        ))
+        data.update(self.serialize_fields(instance, self.LIVE_FIELDS))
+        return {name: data[name] for name in self.Meta.fields}
+    
+    def serialize_fields(self, instance, names):
+        data = {}
+        for field in self._readable_fields:
+            if field.field_name in names:
+                attribute = field.get_attribute(instance)
+                data[field.field_name] = None if attribute is None else field.to_representation(attribute)
+        return data
+    
     def get_location_display(self, obj):
         return obj.get_location_display()
     
@@ -164,59 +294,37 @@ class PropertyDetailSerializer(serializers.ModelSerializer):
         return f"{obj.price:,.0f} сум"
     
     def get_is_favorited(self, obj):
-        request = self.context.get('request')
-        if request and hasattr(request, 'user_id'):
-            try:
-                user = TelegramUser.objects.get(telegram_id=request.user_id)
-                return Favorite.objects.filter(user=user, property=obj).exists()
-            except TelegramUser.DoesNotExist:
-                pass
-        return False
+        viewer = get_viewer_telegram_id(self.context)
+        if viewer is None:
+            return False
+        return Favorite.objects.filter(user__telegram_id=viewer, property=obj).exists()
     
     def get_is_owner(self, obj):
-        request = self.context.get('request')
-        if request and hasattr(request, 'user_id'):
-            try:
-                user = TelegramUser.objects.get(telegram_id=request.user_id)
-                return obj.user == user
-            except TelegramUser.DoesNotExist:
-                pass
-        return False
+        viewer = get_viewer_telegram_id(self.context)
+        return viewer is not None and str(obj.user.telegram_id) == str(viewer)
     
     def get_region_info(self, obj):
-        if obj.region:
-            try:
-                region = Region.objects.get(key=obj.region)
-                return RegionSerializer(region).data
-            except Region.DoesNotExist:
-                pass
+        region = get_gazetteer().region(obj.region) if obj.region else None
+        if region:
+            return RegionSerializer(region).data
         return None
     
     def get_district_info(self, obj):
-        if obj.region and obj.district:
-            try:
-                region = Region.objects.get(key=obj.region)
-                district = District.objects.get(region=region, key=obj.district)
-                return DistrictSerializer(district).data
-            except (Region.DoesNotExist, District.DoesNotExist):
-                pass
+        district = get_gazetteer().district(obj.region, obj.district) if obj.region and obj.district else None
+        if district:
+            return DistrictSerializer(district).data
         return None
     
     def get_similar_properties(self, obj):
-        # Get similar properties based on type, region, and price range
-        price_min = obj.price * 0.8
-        price_max = obj.price * 1.2
-        
-        similar = Property.objects.filter(
-            property_type=obj.property_type,
-            region=obj.region,
-            price__gte=price_min,
-            price__lte=price_max,
-            is_approved=True,
-            is_active=True
-        ).exclude(id=obj.id).order_by('-is_premium', '-created_at')[:3]
+        # Candidates come from the precomputed (type, region, price band) index
+        ids = similar_listing_ids(obj)
+        if not ids:
+            return []
         
-        return PropertyListSerializer(similar, many=True, context=self.context).data
+        similar = Property.objects.select_related('user').in_bulk(ids)
+        return PropertyListSerializer(
+            [similar[pk] for pk in ids if pk in similar], many=True, context=self.context
+        ).data
 
 class PropertySerializer(serializers.ModelSerializer):
     """Serializer for property create/update operations"""
@@ -268,14 +376,15 @@ class PropertySerializer(serializers.ModelSerializer):
         district_key = data.get('district')
         
         if region_key and district_key:
-            try:
-                region = Region.objects.get(key=region_key, is_active=True)
-                District.objects.get(region=region, key=district_key, is_active=True)
-            except (Region.DoesNotExist, District.DoesNotExist):
+            if get_gazetteer().district(region_key, district_key, active_only=True) is None:
                 raise serializers.ValidationError("Invalid region/district combination")
         
         return data
 
+class FavoritePageSerializer(PropertyPageSerializer):
+    def get_properties(self, items):
+        return [favorite.property for favorite in items]
+
 class FavoriteSerializer(serializers.ModelSerializer):
     property = PropertyListSerializer(read_only=True)
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
@@ -283,6 +392,7 @@ class FavoriteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Favorite
         fields = ['id', 'property', 'user_name', 'created_at']
+        list_serializer_class = FavoritePageSerializer
 
 class UserActivitySerializer(serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
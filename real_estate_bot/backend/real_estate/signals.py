@@ -1,7 +1,11 @@
 # backend/real_estate/signals.py
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from .models import TelegramUser, Property
+from django.utils import timezone
+from .models import TelegramUser, Property, PropertyImage, Region, District
+from .gazetteer import invalidate_gazetteer
+from .response_cache import invalidate as invalidate_responses
+from .similar_listings import bucket_keys, drop_buckets
 from payments.models import Payment
 import logging
 
@@ -44,4 +48,38 @@ def log_property_deletion(sender, instance, **kwargs):
     try:
         logger.warning(f"Property deleted: {instance.title} (ID: {instance.id})")
     except Exception as e:
-        logger.error(f"Error logging property deletion: {e}")
\ No newline at end of file
+        logger.error(f"Error logging property deletion: {e}")
+
+@receiver([post_save, post_delete], sender=Region)
+@receiver([post_save, post_delete], sender=District)
+def reload_gazetteer(sender, **kwargs):
+    """Regions/districts changed: bump the gazetteer version everywhere"""
+    invalidate_gazetteer()
+    invalidate_responses('locations', 'properties')
+
+@receiver([post_save, post_delete], sender=Property)
+def invalidate_property_responses(sender, update_fields=None, **kwargs):
+    """Drop cached listing pages and location counts"""
+    # View counters may lag in cached pages
+    if update_fields and set(update_fields) <= {'views_count'}:
+        return
+    invalidate_responses('properties', 'locations')
+
+@receiver(pre_save, sender=Property)
+def remember_similar_bucket(sender, instance, update_fields=None, **kwargs):
+    """Note the stored listing's bucket, an edit of its price, region or type moves it out"""
+    if instance.pk is None or (update_fields and set(update_fields) <= {'views_count', 'favorites_count'}):
+        return
+    instance._stored_buckets = bucket_keys(Property.objects.filter(pk=instance.pk))
+
+@receiver([post_save, post_delete], sender=Property)
+def refresh_similar_listings(sender, instance, update_fields=None, **kwargs):
+    """Rebuild the similar-listings buckets of an approved/edited/removed listing"""
+    if update_fields and set(update_fields) <= {'views_count', 'favorites_count'}:
+        return
+    drop_buckets(bucket_keys([instance]) | instance.__dict__.pop('_stored_buckets', set()))
+
+@receiver([post_save, post_delete], sender=PropertyImage)
+def touch_property(sender, instance, **kwargs):
+    """Images are part of the cached listing detail, move its version on"""
+    Property.objects.filter(pk=instance.property_id).update(updated_at=timezone.now())
@@ -0,0 +1,125 @@
+"""Precomputed candidates for a listing's "similar listings"
+
+Visible listings are bucketed by (property_type, region, price band), each
+band spanning prices within a factor of BAND_RATIO. Everything within
+PRICE_TOLERANCE of a price lies in that price's band or one of its two
+neighbours, so similar_listing_ids() reads three cached buckets and filters
+them exactly instead of running a price-range query per detail view.
+
+Changed listings (approval, edits, deactivation) have their buckets
+dropped once the change is committed and they are rebuilt on the next
+read. Writers take bucket_keys() of the stored rows before writing, as the
+write may move them to another bucket or out of a queryset's filter, and
+pass them to drop_buckets() afterwards; for saves signals.py adds the keys
+of the new values. Buckets also expire after SIMILAR_INDEX_TIMEOUT seconds,
+which picks up changes the bot writes with raw SQL.
+"""
+import math
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, QuerySet
+
+from .models import Property
+from .response_cache import get_cache
+
+BAND_RATIO = 1.25
+PRICE_TOLERANCE = Decimal('0.2')
+
+
+def price_band(price):
+    if not price or price < 1:
+        return 0
+    return max(0, math.floor(math.log(float(price), BAND_RATIO)))
+
+
+def band_bounds(band):
+    """[lower, upper) prices of a band, band 0 also holding prices below 1"""
+    lower = Decimal(0) if band <= 0 else Decimal(BAND_RATIO ** band)
+    return lower, Decimal(BAND_RATIO ** (band + 1))
+
+
+def bucket_key(property_type, region, band):
+    return f'similar:{property_type}:{region or ""}:{band}'
+
+
+def build_buckets(property_type, region, bands):
+    """Candidates of several bands with one query, {band: [(id, price, is_premium, created_at)]}"""
+    ranges = {band: band_bounds(band) for band in bands}
+    price_filter = Q()
+    for lower, upper in ranges.values():
+        price_filter |= Q(price__gte=lower, price__lt=upper)
+
+    rows = Property.objects.filter(
+        price_filter,
+        property_type=property_type,
+        region=region,
+        is_approved=True,
+        is_active=True
+    ).order_by('-is_premium', '-created_at').values_list('id', 'price', 'is_premium', 'created_at')
+
+    buckets = {band: [] for band in bands}
+    for pk, price, is_premium, created_at in rows:
+        for band, (lower, upper) in ranges.items():
+            if lower <= price < upper:
+                buckets[band].append((pk, price, is_premium, created_at.timestamp()))
+                break
+    return buckets
+
+
+def get_buckets(property_type, region, bands):
+    cache = get_cache()
+    keys = {band: bucket_key(property_type, region, band) for band in bands}
+    cached = cache.get_many(keys.values())
+    buckets = {band: cached[key] for band, key in keys.items() if key in cached}
+
+    missing = [band for band in bands if band not in buckets]
+    if missing:
+        built = build_buckets(property_type, region, missing)
+        cache.set_many(
+            {keys[band]: candidates for band, candidates in built.items()},
+            settings.SIMILAR_INDEX_TIMEOUT
+        )
+        buckets.update(built)
+    return buckets
+
+
+def similar_listing_ids(listing, limit=3):
+    """Ids of visible listings of the same type and region priced within ±20%"""
+    band = price_band(listing.price)
+    bands = [neighbour for neighbour in (band - 1, band, band + 1) if neighbour >= 0]
+    buckets = get_buckets(listing.property_type, listing.region, bands)
+
+    low = listing.price * (1 - PRICE_TOLERANCE)
+    high = listing.price * (1 + PRICE_TOLERANCE)
+    candidates = [
+        candidate
+        for candidates in buckets.values()
+        for candidate in candidates
+        if candidate[0] != listing.pk and low <= candidate[1] <= high
+    ]
+    # Same order as the listing pages: premium first, then newest
+    candidates.sort(key=lambda candidate: (not candidate[2], -candidate[3]))
+    return [candidate[0] for candidate in candidates[:limit]]
+
+
+def bucket_keys(listings):
+    """Cache keys of the buckets holding these listings (instances or a queryset)"""
+    if isinstance(listings, QuerySet):
+        listings = listings.only('property_type', 'region', 'price')
+    return {
+        bucket_key(listing.property_type, listing.region, price_band(listing.price))
+        for listing in listings
+    }
+
+
+def drop_buckets(keys):
+    """Drop buckets after the current transaction commits so the next read rebuilds them
+
+    Dropping earlier would let a concurrent read rebuild a bucket from rows
+    the change has not touched yet and cache it until SIMILAR_INDEX_TIMEOUT.
+    """
+    if keys:
+        transaction.on_commit(lambda: get_cache().delete_many(keys))
+
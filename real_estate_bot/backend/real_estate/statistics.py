@@ -0,0 +1,166 @@
+"""Property statistics for dashboards
+
+compute_property_statistics() builds the whole payload with five queries:
+one GROUP BY over the listing rollup table (counts, types, statuses,
+regions), one conditional aggregate over approved properties (time windows
+and prices), one over users, plus recent properties and popular searches.
+
+get_property_statistics() caches the payload per time bucket of
+STATISTICS_CACHE_TTL seconds. Once a bucket ends, the previous payload is
+still served for up to STATISTICS_STALE_TTL seconds while a single
+background thread (across processes, via cache.add) recomputes it.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Avg, Count, Exists, Max, Min, OuterRef, Q
+from django.utils import timezone
+
+from .gazetteer import get_gazetteer
+from .models import Property, SearchQuery, TelegramUser, UserActivity
+from .rollups import listing_counts
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = 'property_statistics'
+REFRESH_LOCK_KEY = 'property_statistics:refresh'
+
+
+def _ranked(counts, field):
+    return [
+        {field: key, 'count': count}
+        for key, count in sorted(counts.items(), key=lambda item: item[1], reverse=True)
+    ]
+
+
+def compute_property_statistics():
+    from .serializers import PropertyListSerializer
+
+    # Counts and categories: one pass over the rollup rows of approved listings
+    total_properties = active_properties = premium_properties = 0
+    by_type, by_status, by_region = defaultdict(int), defaultdict(int), defaultdict(int)
+    rows = listing_counts('region', 'property_type', 'status', 'is_active', 'is_premium', is_approved=True)
+    for (region, property_type, listing_status, is_active, is_premium), count in rows.items():
+        total_properties += count
+        active_properties += count if is_active else 0
+        premium_properties += count if is_premium else 0
+        by_type[property_type] += count
+        by_status[listing_status] += count
+        by_region[region] += count
+
+    gazetteer = get_gazetteer()
+    properties_by_region = [
+        {'region_key': region.key, 'region_name': region.name_uz, 'count': by_region[region.key]}
+        for region in gazetteer.active_regions()
+        if by_region.get(region.key)
+    ]
+    properties_by_region.sort(key=lambda x: x['count'], reverse=True)
+
+    # Time windows and prices: one conditional aggregate
+    now = timezone.now()
+    today = now.date()
+    week_ago = today - timedelta(days=7)
+    month_ago = today - timedelta(days=30)
+
+    approved = Property.objects.filter(is_approved=True).aggregate(
+        today=Count('id', filter=Q(created_at__date=today)),
+        week=Count('id', filter=Q(created_at__gte=week_ago)),
+        month=Count('id', filter=Q(created_at__gte=month_ago)),
+        avg_price=Avg('price'),
+        min_price=Min('price'),
+        max_price=Max('price'),
+    )
+
+    users = TelegramUser.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(Exists(
+            UserActivity.objects.filter(user=OuterRef('pk'), created_at__gte=week_ago)
+        ))),
+    )
+
+    recent_properties = Property.objects.filter(
+        is_approved=True, is_active=True
+    ).select_related('user').order_by('-created_at')[:5]
+
+    popular_searches = list(
+        SearchQuery.objects.filter(created_at__gte=week_ago)
+        .values('query')
+        .annotate(count=Count('id'))
+        .order_by('-count')[:10]
+    )
+
+    return {
+        # Basic counts
+        'total_properties': total_properties,
+        'active_properties': active_properties,
+        'premium_properties': premium_properties,
+        'total_users': users['total'],
+        'active_users': users['active'],
+
+        # Time-based
+        'properties_today': approved['today'],
+        'properties_this_week': approved['week'],
+        'properties_this_month': approved['month'],
+
+        # Categories
+        'properties_by_type': _ranked(by_type, 'property_type'),
+        'properties_by_status': _ranked(by_status, 'status'),
+        'properties_by_region': properties_by_region[:10],  # Top 10 regions
+
+        # Price statistics
+        'price_statistics': {
+            'avg_price': approved['avg_price'],
+            'min_price': approved['min_price'],
+            'max_price': approved['max_price'],
+        },
+
+        # Recent data
+        'recent_properties': PropertyListSerializer(recent_properties, many=True).data,
+        'popular_searches': popular_searches,
+
+        # Ratios and percentages
+        'premium_percentage': round((premium_properties / total_properties * 100) if total_properties > 0 else 0, 2),
+        'active_percentage': round((active_properties / total_properties * 100) if total_properties > 0 else 0, 2),
+        'generated_at': now,
+    }
+
+
+def _store(bucket):
+    stats = compute_property_statistics()
+    cache.set(CACHE_KEY, (bucket, stats), settings.STATISTICS_CACHE_TTL + settings.STATISTICS_STALE_TTL)
+    return stats
+
+
+def _refresh(bucket):
+    try:
+        _store(bucket)
+    except Exception as e:
+        logger.error(f"Error refreshing property statistics: {e}")
+    finally:
+        cache.delete(REFRESH_LOCK_KEY)
+        # This thread's connections are not closed by the request cycle
+        connections.close_all()
+
+
+def get_property_statistics():
+    """Statistics for the current time bucket, stale ones while they refresh"""
+    ttl = settings.STATISTICS_CACHE_TTL
+    bucket = int(time.time() // ttl)
+
+    entry = cache.get(CACHE_KEY)
+    if entry is not None:
+        cached_bucket, stats = entry
+        if cached_bucket == bucket:
+            return stats
+        if (bucket - cached_bucket) * ttl <= settings.STATISTICS_STALE_TTL:
+            if cache.add(REFRESH_LOCK_KEY, True, ttl):
+                threading.Thread(target=_refresh, args=(bucket,), daemon=True).start()
+            return stats
+
+    return _store(bucket)
@@ -1,3 +1,702 @@
-from django.test import TestCase
+from datetime import date, datetime, timezone as dt_timezone
+import gzip
+import importlib.util
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from .models import TelegramUser, Region, District, Property, Favorite, UserActivity, SearchQuery
+from .activity import ActivityBuffer
+from .serializers import (
+    PropertyListSerializer, PropertyDetailSerializer, FavoriteSerializer, TelegramUserSerializer
+)
+from .gazetteer import get_gazetteer
+from .partitions import ensure_partitions, month_partitions, purge_before
+from .rollups import listing_counts, listing_summary
+from .statistics import compute_property_statistics
+from .users import upsert_users
+from .view_counter import ViewCounter
+
+
+@override_settings(GAZETTEER_CHECK_INTERVAL=3600)
+class PropertyListQueryCountTests(TestCase):
+    """List serialization must cost the same number of queries for any page size"""
+
+    @classmethod
+    def setUpTestData(cls):
+        region = Region.objects.create(
+            key='tashkent_city', name_uz='Toshkent shahri',
+            name_ru='Город Ташкент', name_en='Tashkent City'
+        )
+        District.objects.create(
+            region=region, key='chilonzor', name_uz='Chilonzor',
+            name_ru='Чиланзар', name_en='Chilanzar'
+        )
+        cls.owner = TelegramUser.objects.create(telegram_id=1001, first_name='Owner')
+        cls.viewer = TelegramUser.objects.create(telegram_id=1002, first_name='Viewer')
+
+        Property.objects.bulk_create([
+            Property(
+                user=cls.owner, title=f'Flat {i}', description='Test flat',
+                property_type='apartment', region='tashkent_city', district='chilonzor',
+                address='Chilonzor 1', price=1000 + i, area=50, status='sale',
+                contact_info='+998900000000', is_approved=True, is_active=True
+            )
+            for i in range(60)
+        ])
+        for obj in Property.objects.all()[:10]:
+            Favorite.objects.create(user=cls.viewer, property=obj)
+
+    def setUp(self):
+        # Load region/district names outside the measured blocks
+        get_gazetteer()
+        cache.clear()
+
+    def serializer_context(self):
+        request = APIRequestFactory().get('/api/properties/')
+        request.user_id = self.viewer.telegram_id
+        return {'request': request}
+
+    def count_list_queries(self, size):
+        page = list(Property.objects.select_related('user').order_by('id')[:size])
+        with CaptureQueriesContext(connection) as queries:
+            data = PropertyListSerializer(page, many=True, context=self.serializer_context()).data
+        self.assertEqual(len(data), size)
+        return len(queries)
+
+    def test_list_serializer_queries_are_flat(self):
+        # Location names come from the gazetteer, favorites take one query
+        self.assertEqual(self.count_list_queries(5), 1)
+        self.assertEqual(self.count_list_queries(50), 1)
+
+    def test_list_serializer_resolves_lookups(self):
+        page = list(Property.objects.select_related('user').order_by('id')[:20])
+        favorited = set(Favorite.objects.filter(user=self.viewer).values_list('property_id', flat=True))
+        data = PropertyListSerializer(page, many=True, context=self.serializer_context()).data
+
+        for item in data:
+            self.assertEqual(item['location_display'], 'Chilonzor, Toshkent shahri')
+            self.assertEqual(item['is_favorited'], item['id'] in favorited)
+
+    def test_favorite_serializer_queries_are_flat(self):
+        def count(size):
+            page = list(Favorite.objects.select_related('user', 'property__user').order_by('id')[:size])
+            with CaptureQueriesContext(connection) as queries:
+                FavoriteSerializer(page, many=True, context=self.serializer_context()).data
+            return len(queries)
+
+        self.assertEqual(count(2), count(10))
+
+    def test_list_endpoint_queries_are_flat(self):
+        def count(size):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/api/properties/', {'page_size': size})
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+
+        self.assertEqual(count(5), count(50))
+
+
+@override_settings(GAZETTEER_CHECK_INTERVAL=3600)
+class GazetteerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.region = Region.objects.create(
+            key='samarkand', name_uz='Samarqand viloyati',
+            name_ru='Самаркандская область', name_en='Samarkand Region'
+        )
+        cls.district = District.objects.create(
+            region=cls.region, key='urgut', name_uz='Urgut',
+            name_ru='Ургут', name_en='Urgut'
+        )
+
+    def test_lookups_need_no_queries(self):
+        get_gazetteer()
+        with self.assertNumQueries(0):
+            gazetteer = get_gazetteer()
+            self.assertEqual(gazetteer.name('samarkand', 'urgut', 'ru'), 'Ургут')
+            self.assertEqual(gazetteer.location_display('samarkand', 'urgut', 'en'), 'Urgut, Samarkand Region')
+            self.assertIsNone(gazetteer.district('samarkand', 'missing'))
+
+    def test_save_invalidates_snapshot(self):
+        get_gazetteer()
+        self.district.name_uz = 'Urgut tumani'
+        self.district.save()
+        self.assertEqual(get_gazetteer().name('samarkand', 'urgut', 'uz'), 'Urgut tumani')
+
+        self.district.is_active = False
+        self.district.save()
+        self.assertIsNone(get_gazetteer().district('samarkand', 'urgut', active_only=True))
+
+
+@override_settings(GAZETTEER_CHECK_INTERVAL=3600)
+class LocationCountsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = TelegramUser.objects.create(telegram_id=2001, first_name='Owner')
+        cls.region = Region.objects.create(
+            key='navoiy', name_uz='Navoiy viloyati',
+            name_ru='Навоийская область', name_en='Navoiy Region'
+        )
+        for i in range(3):
+            District.objects.create(
+                region=cls.region, key=f'district_{i}', name_uz=f'Tuman {i}',
+                name_ru=f'Район {i}', name_en=f'District {i}'
+            )
+
+        Property.objects.bulk_create([
+            Property(
+                user=cls.owner, title=f'House {i}', description='Test house',
+                property_type='house', region='navoiy', district=f'district_{i % 2}',
+                address='Navoiy 1', price=1000, area=80, status='sale',
+                contact_info='+998900000000', is_approved=True, is_active=True
+            )
+            for i in range(5)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def count_queries(self, url):
+        get_gazetteer()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()
+
+    def test_district_counts(self):
+        _, data = self.count_queries('/api/districts-list/')
+        counts = {item['key']: item['properties_count'] for item in data}
+        self.assertEqual(counts, {'district_0': 3, 'district_1': 2, 'district_2': 0})
+
+        _, data = self.count_queries('/api/regions-list/')
+        self.assertEqual(data[0]['properties_count'], 5)
+
+    def test_district_list_queries_are_flat(self):
+        before, _ = self.count_queries('/api/districts-list/')
+        for i in range(3, 30):
+            District.objects.create(
+                region=self.region, key=f'district_{i}', name_uz=f'Tuman {i}',
+                name_ru=f'Район {i}', name_en=f'District {i}'
+            )
+        after, data = self.count_queries('/api/districts-list/')
+
+        self.assertEqual(len(data), 30)
+        self.assertEqual(before, after)
+
+
+class ListingRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = TelegramUser.objects.create(telegram_id=3001, first_name='Owner')
+
+    def create_property(self, **kwargs):
+        fields = dict(
+            user=self.owner, title='Flat', description='Test flat',
+            property_type='apartment', region='andijon', district='asaka',
+            address='Asaka 1', price=1000, area=50, status='sale',
+            contact_info='+998900000000'
+        )
+        fields.update(kwargs)
+        return Property.objects.create(**fields)
+
+    def assertRollupMatches(self):
+        for filters in ({}, {'is_approved': True}, {'is_approved': True, 'is_active': True}, {'is_premium': True}):
+            self.assertEqual(listing_counts(**filters), Property.objects.filter(**filters).count(), filters)
+        actual = {
+            (row['region'] or '', row['district'] or ''): row['total']
+            for row in Property.objects.values('region', 'district').annotate(total=Count('id'))
+        }
+        self.assertEqual(listing_counts('region', 'district'), actual)
+
+    def test_trigger_tracks_changes(self):
+        pending = self.create_property()
+        approved = self.create_property(is_approved=True, approval_status='approved', district='baliqchi')
+        self.create_property(region=None, district=None)
+        self.assertRollupMatches()
+
+        pending.is_approved = True
+        pending.approval_status = 'approved'
+        pending.save()
+        Property.objects.filter(pk=approved.pk).update(is_active=False, is_premium=True)
+        self.assertRollupMatches()
+
+        approved.delete()
+        self.assertRollupMatches()
+
+        summary = listing_summary()
+        self.assertEqual(summary['total'], 2)
+        self.assertEqual(summary['active'], 1)
+        self.assertEqual(summary['pending'], 1)
+
+    @override_settings(GAZETTEER_CHECK_INTERVAL=3600)
+    def test_statistics_query_count(self):
+        for i in range(20):
+            self.create_property(is_approved=True, is_premium=i % 4 == 0, district=f'district_{i}')
+        get_gazetteer()
+
+        with self.assertNumQueries(5):
+            stats = compute_property_statistics()
+
+        self.assertEqual(stats['total_properties'], 20)
+        self.assertEqual(stats['premium_properties'], 5)
+        self.assertEqual(stats['properties_today'], 20)
+        self.assertEqual(stats['properties_by_type'], [{'property_type': 'apartment', 'count': 20}])
+
+    def test_unrelated_updates_leave_rollup_alone(self):
+        listing = self.create_property(is_approved=True)
+        Property.objects.filter(pk=listing.pk).update(views_count=10, price=2000)
+        self.assertEqual(listing_counts(is_approved=True), 1)
+
+
+@override_settings(GAZETTEER_CHECK_INTERVAL=3600)
+class ResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.region = Region.objects.create(
+            key='xorazm', name_uz='Xorazm viloyati',
+            name_ru='Хорезмская область', name_en='Khorezm Region'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_second_request_is_served_from_cache(self):
+        first = self.client.get('/api/regions-list/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/regions-list/')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.json(), first.json())
+
+    def test_query_params_are_part_of_the_key(self):
+        self.client.get('/api/properties/', {'page_size': 5})
+        self.assertEqual(self.client.get('/api/properties/', {'page_size': 10})['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/api/properties/', {'page_size': 5})['X-Cache'], 'HIT')
+
+    def test_conditional_requests(self):
+        response = self.client.get('/api/regions-list/')
+
+        not_modified = self.client.get('/api/regions-list/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+        not_modified = self.client.get('/api/regions-list/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+
+        modified = self.client.get('/api/regions-list/', HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(modified.status_code, 200)
+
+    def test_region_save_invalidates(self):
+        etag = self.client.get('/api/regions-list/')['ETag']
+
+        self.region.name_uz = 'Xorazm'
+        self.region.save()
+
+        response = self.client.get('/api/regions-list/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()[0]['name_uz'], 'Xorazm')
+
+
+class ViewCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = TelegramUser.objects.create(telegram_id=4001, first_name='Owner')
+        cls.listings = Property.objects.bulk_create([
+            Property(
+                user=owner, title=f'Shop {i}', description='Test shop',
+                property_type='commercial', region='jizzax', district='zomin',
+                address='Zomin 1', price=1000, area=30, status='rent',
+                contact_info='+998900000000', is_approved=True
+            )
+            for i in range(3)
+        ])
+
+    def test_flush_writes_increments_in_one_statement(self):
+        counter = ViewCounter(autostart=False)
+        for _ in range(3):
+            counter.record(self.listings[0].pk)
+        counter.record(self.listings[1].pk, views=2)
+        self.assertEqual(counter.pending(), 5)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(counter.flush(), 2)
+
+        views = dict(Property.objects.values_list('pk', 'views_count'))
+        self.assertEqual(views[self.listings[0].pk], 3)
+        self.assertEqual(views[self.listings[1].pk], 2)
+        self.assertEqual(views[self.listings[2].pk], 0)
+        self.assertEqual(counter.pending(), 0)
+        self.assertEqual(counter.flush(), 0)
+
+
+class FavoritesCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = TelegramUser.objects.create(telegram_id=5001, first_name='Owner')
+        cls.fans = [TelegramUser.objects.create(telegram_id=5100 + i, first_name=f'Fan {i}') for i in range(3)]
+        cls.listing = Property.objects.create(
+            user=cls.owner, title='Cottage', description='Test cottage',
+            property_type='house', region='namangan', district='chust',
+            address='Chust 1', price=1000, area=120, status='sale',
+            contact_info='+998900000000'
+        )
+
+    def favorites_count(self):
+        return Property.objects.values_list('favorites_count', flat=True).get(pk=self.listing.pk)
+
+    def test_save_is_a_single_statement(self):
+        self.listing.is_premium = True
+        with self.assertNumQueries(1):
+            self.listing.save(update_fields=['is_premium'])
+
+    def test_favorites_adjust_counter(self):
+        favorites = [Favorite.objects.create(user=fan, property=self.listing) for fan in self.fans]
+        self.assertEqual(self.favorites_count(), 3)
+
+        favorites[0].delete()
+        self.assertEqual(self.favorites_count(), 2)
+
+    def test_reconcile_counters(self):
+        Favorite.objects.create(user=self.fans[0], property=self.listing)
+        Property.objects.filter(pk=self.listing.pk).update(favorites_count=7)
+
+        call_command('reconcile_counters', '--dry-run', stdout=StringIO())
+        self.assertEqual(self.favorites_count(), 7)
+
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(self.favorites_count(), 1)
+
+
+class ActivityBufferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = TelegramUser.objects.create(telegram_id=6001, first_name='Visitor')
+
+    def test_flush_writes_one_batch_per_model(self):
+        buffer = ActivityBuffer(autostart=False)
+        for action in ('start', 'search', 'return'):
+            buffer.enqueue(UserActivity(user=self.user, action=action))
+        for query in ('flat', 'house'):
+            buffer.enqueue(SearchQuery(user=self.user, query=query, search_type='keyword'))
+
+        with self.assertNumQueries(2):
+            self.assertEqual(buffer.flush(), 5)
+
+        self.assertEqual(UserActivity.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(SearchQuery.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(buffer.stats()['queued'], 0)
+
+    def test_full_buffer_drops_events(self):
+        buffer = ActivityBuffer(max_size=2, autostart=False)
+        results = [buffer.enqueue(UserActivity(user=self.user, action='search')) for _ in range(3)]
+
+        self.assertEqual(results, [True, True, False])
+        self.assertEqual(buffer.stats()['dropped'], 1)
+        self.assertEqual(buffer.flush(), 2)
+
+
+class PartitionTests(TransactionTestCase):
+    """Runs outside a test transaction, as purge_before() does in manage_partitions"""
+    table = 'real_estate_useractivity'
+
+    def setUp(self):
+        self.user = TelegramUser.objects.create(telegram_id=7001, first_name='Visitor')
+
+    def test_retention_drops_old_month_partitions(self):
+        with connection.cursor() as cursor:
+            ensure_partitions(cursor, self.table, date(2020, 1, 1), date(2020, 1, 1))
+            self.assertIn(date(2020, 1, 1), month_partitions(cursor, self.table))
+
+        old = UserActivity.objects.create(user=self.user, action='search')
+        recent = UserActivity.objects.create(user=self.user, action='search')
+        # Moves the row into the January 2020 partition
+        UserActivity.objects.filter(pk=old.pk).update(created_at=datetime(2020, 1, 15, tzinfo=dt_timezone.utc))
+
+        dropped = purge_before(datetime(2020, 3, 1, tzinfo=dt_timezone.utc))
+
+        self.assertIn('real_estate_useractivity_p202001', dropped[self.table])
+        self.assertFalse(UserActivity.objects.filter(pk=old.pk).exists())
+        self.assertTrue(UserActivity.objects.filter(pk=recent.pk).exists())
+        with connection.cursor() as cursor:
+            self.assertNotIn(date(2020, 1, 1), month_partitions(cursor, self.table))
+
+
+@override_settings(GAZETTEER_CHECK_INTERVAL=3600)
+class PropertyDetailTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = TelegramUser.objects.create(telegram_id=8001, first_name='Owner')
+        cls.viewer = TelegramUser.objects.create(telegram_id=8002, first_name='Viewer')
+
+        def house(price, **kwargs):
+            return Property.objects.create(
+                user=cls.owner, description='Test house', property_type='house',
+                region='samarqand', district='urgut', address='Urgut 1', price=price,
+                area=120, status='sale', contact_info='+998900000000',
+                is_approved=kwargs.pop('is_approved', True), **kwargs
+            )
+
+        cls.listing = house(1000)
+        cls.cheaper = house(900)
+        cls.premium = house(1150, is_premium=True)
+        house(1300)
+        house(700)
+        house(1000, is_approved=False)
+        Favorite.objects.create(user=cls.viewer, property=cls.premium)
+
+    def setUp(self):
+        get_gazetteer()
+        cache.clear()
+
+    def serialize(self, listing):
+        request = APIRequestFactory().get(f'/api/properties/{listing.pk}/')
+        request.user_id = self.viewer.telegram_id
+        listing = Property.objects.select_related('user').get(pk=listing.pk)
+        return PropertyDetailSerializer(listing, context={'request': request}).data
+
+    def test_similar_listings_come_from_the_index(self):
+        similar = self.serialize(self.listing)['similar_properties']
+
+        self.assertEqual([item['id'] for item in similar], [self.premium.pk, self.cheaper.pk])
+        self.assertTrue(similar[0]['is_favorited'])
+
+    def test_warm_detail_only_resolves_viewer_data(self):
+        cold = self.serialize(self.listing)
+
+        # The listing, is_favorited, the similar listings and their favorite flags
+        with self.assertNumQueries(4):
+            warm = self.serialize(self.listing)
+        self.assertEqual(warm, cold)
+
+    def test_owner_counters_are_not_cached(self):
+        self.serialize(self.listing)
+        TelegramUser.objects.filter(pk=self.owner.pk).update(favorites_count=5)
+
+        self.assertEqual(self.serialize(self.listing)['user']['favorites_count'], 5)
+
+    def test_price_edit_drops_the_old_bucket(self):
+        self.serialize(self.listing)
+
+        self.cheaper.price = 5000
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cheaper.save()
+
+        ids = [item['id'] for item in self.serialize(self.listing)['similar_properties']]
+        self.assertNotIn(self.cheaper.pk, ids)
+
+    def test_approval_refreshes_similar_bucket(self):
+        self.serialize(self.listing)
+        pending = Property.objects.get(is_approved=False)
+
+        pending.is_approved = True
+        with self.captureOnCommitCallbacks(execute=True):
+            pending.save()
+
+        ids = [item['id'] for item in self.serialize(self.listing)['similar_properties']]
+        self.assertIn(pending.pk, ids)
+
+
+class UserUpsertTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = TelegramUser.objects.create(
+            telegram_id=9001, username='old', first_name='Ali', last_name='Valiyev', language='ru'
+        )
+
+    def test_upsert_is_a_single_statement(self):
+        with self.assertNumQueries(1), self.assertLogs('real_estate', 'INFO') as logs:
+            user, = upsert_users([{'telegram_id': 9002, 'first_name': 'Vali'}])
+
+        self.assertEqual(user.upsert_status, 'created')
+        self.assertEqual(user.first_name, 'Vali')
+        self.assertEqual(user.username, '')
+        self.assertEqual(user.language, 'uz')
+        self.assertIn('New user registered: 9002 (Vali)', logs.output[0])
+
+    def test_unchanged_user_is_not_written(self):
+        updated_at = self.user.updated_at
+
+        user, = upsert_users([{'telegram_id': 9001, 'username': 'old', 'first_name': 'Ali'}])
+
+        self.assertEqual(user.upsert_status, 'unchanged')
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.updated_at, updated_at)
+
+    def test_only_provided_fields_are_updated(self):
+        user, = upsert_users([{'telegram_id': 9001, 'language': 'en'}])
+
+        self.assertEqual(user.upsert_status, 'updated')
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.language, 'en')
+        self.assertEqual(self.user.username, 'old')
+        self.assertEqual(self.user.last_name, 'Valiyev')
+
+    def test_bulk_upsert_endpoint(self):
+        response = self.client.post('/api/users/bulk-upsert/', {'users': [
+            {'telegram_id': 9001, 'username': 'old'},
+            {'telegram_id': 9003, 'first_name': 'Olim'},
+            {'telegram_id': 9004, 'first_name': 'Nodir'},
+            {'telegram_id': 9004, 'first_name': 'Nodira'},
+        ]}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {key: response.json()[key] for key in ('created', 'updated', 'unchanged')},
+            {'created': 2, 'updated': 0, 'unchanged': 1}
+        )
+        self.assertEqual(TelegramUser.objects.get(telegram_id=9004).first_name, 'Nodira')
+
+    def test_bulk_upsert_validates_rows(self):
+        response = self.client.post('/api/users/bulk-upsert/', [
+            {'telegram_id': 9005, 'language': 'de'},
+        ], content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(TelegramUser.objects.filter(telegram_id=9005).exists())
+
+
+class UserCountersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = TelegramUser.objects.create(telegram_id=9101, first_name='Owner')
+        cls.fan = TelegramUser.objects.create(telegram_id=9102, first_name='Fan')
+
+    def create_listing(self):
+        return Property.objects.create(
+            user=self.owner, description='Test flat', property_type='apartment',
+            region='navoiy', district='karmana', address='Karmana 1', price=1000,
+            area=40, status='rent', contact_info='+998900000000'
+        )
+
+    def counters(self, user):
+        user.refresh_from_db()
+        return user.properties_count, user.favorites_count
+
+    def test_counters_follow_listings_and_favorites(self):
+        listing = self.create_listing()
+        self.create_listing()
+        Favorite.objects.create(user=self.fan, property=listing)
+        self.assertEqual(self.counters(self.owner), (2, 0))
+        self.assertEqual(self.counters(self.fan), (0, 1))
+
+        # Deleting the listing also removes its favorites
+        listing.delete()
+        self.assertEqual(self.counters(self.owner), (1, 0))
+        self.assertEqual(self.counters(self.fan), (0, 0))
+
+    def test_serializer_reads_counters(self):
+        Favorite.objects.create(user=self.fan, property=self.create_listing())
+        self.fan.refresh_from_db()
+
+        with self.assertNumQueries(0):
+            data = TelegramUserSerializer(self.fan).data
+        self.assertEqual(data['favorites_count'], 1)
+
+    def test_reconcile_user_counters(self):
+        self.create_listing()
+        TelegramUser.objects.filter(pk=self.owner.pk).update(properties_count=5, favorites_count=3)
+
+        call_command('reconcile_counters', '--counter', 'user.properties_count',
+                     '--counter', 'user.favorites_count', stdout=StringIO())
+        self.assertEqual(self.counters(self.owner), (1, 0))
+
+
+class ExportDataTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = TelegramUser.objects.create(telegram_id=9201, first_name='Owner')
+        cls.listings = [
+            Property.objects.create(
+                user=owner, description=f'Test flat {i}', property_type='apartment',
+                region='buxoro', district='gijduvon', address='Gijduvon 1', price=1000 + i,
+                area=40, status='sale', contact_info='+998900000000'
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def export(self, *args):
+        call_command('export_data', *args, stdout=StringIO())
+
+    def test_ndjson_gzip_export(self):
+        path = os.path.join(self.directory, 'properties.ndjson')
+        self.export('--model', 'properties', '--format', 'ndjson', '--gzip', '--output', path)
+
+        with gzip.open(f'{path}.gz', 'rt', encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual([row['id'] for row in rows], [listing.pk for listing in self.listings])
+        self.assertEqual(rows[0]['user_telegram_id'], 9201)
+        self.assertEqual(rows[0]['price'], 1000.0)
+
+    def test_since_only_exports_changed_rows(self):
+        Property.objects.filter(pk=self.listings[0].pk).update(updated_at=datetime(2020, 1, 1, tzinfo=dt_timezone.utc))
+        path = os.path.join(self.directory, 'properties.csv')
+        self.export('--model', 'properties', '--since', '2021-01-01', '--output', path)
+
+        with open(path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 3)  # header + two listings
+
+    def test_all_json_is_one_document(self):
+        path = os.path.join(self.directory, 'export.json')
+        self.export('--format', 'json', '--output', path)
+
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        self.assertEqual(len(data['properties']), 3)
+        self.assertEqual(data['users'][0]['properties_count'], 3)
+        self.assertEqual(data['payments'], [])
+
+    def test_column_selection(self):
+        path = os.path.join(self.directory, 'properties.csv')
+        self.export('--model', 'properties', '--columns', 'price,id', '--output', path)
+
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(f.readline().strip(), 'price,id')
+
+        with self.assertRaises(CommandError):
+            self.export('--model', 'properties', '--columns', 'id,balance', '--output', path)
+
+    def test_all_json_skips_models_without_selected_columns(self):
+        path = os.path.join(self.directory, 'export.json')
+        self.export('--format', 'json', '--columns', 'price', '--output', path)
+
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        self.assertEqual(list(data), ['properties'])
+        self.assertEqual(data['properties'][0], {'price': 1000.0})
+
+    @skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow is not installed')
+    def test_parquet_export_is_typed(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        path = os.path.join(self.directory, 'properties.parquet')
+        self.export('--model', 'properties', '--format', 'parquet', '--row-group-size', '2', '--output', path)
+
+        parquet = pq.ParquetFile(path)
+        self.assertEqual(parquet.metadata.num_rows, 3)
+        self.assertEqual(parquet.metadata.num_row_groups, 2)
+
+        table = parquet.read()
+        self.assertEqual(table.schema.field('price').type, pa.decimal128(15, 2))
+        self.assertTrue(pa.types.is_timestamp(table.schema.field('created_at').type))
+        self.assertTrue(pa.types.is_dictionary(table.schema.field('region').type))
+        self.assertEqual(table.column('region').to_pylist(), ['buxoro'] * 3)
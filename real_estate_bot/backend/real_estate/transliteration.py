@@ -0,0 +1,159 @@
+"""Latin/Cyrillic folding used by fuzzy (trigram) search
+
+Uzbek place names are written in Uzbek Latin (Chilonzor), Russian Cyrillic
+(Чиланзар) and ad-hoc Russian-style Latin (Chilanzar). Everything is folded
+to one Latin skeleton so pg_trgm compares like with like:
+
+    Chilonzor / Чиланзар / chilanzar  ->  chilanzar
+
+The same tables generate the real_estate_translit() SQL function (migration
+0005), so listing text, place names and queries are normalized identically.
+Changing them requires a migration that recreates the function and reindexes.
+"""
+from django.db.models import Func, TextField
+
+APOSTROPHES = "'`´ʻʼ‘’"
+
+# Cyrillic letters that map to more than one Latin letter, applied first
+CYRILLIC_DIGRAPHS = [
+    ('дж', 'j'),
+    ('ё', 'yo'),
+    ('ж', 'j'),
+    ('ц', 'ts'),
+    ('ч', 'ch'),
+    ('ш', 'sh'),
+    ('щ', 'sh'),
+    ('ю', 'yu'),
+    ('я', 'ya'),
+]
+
+# One-to-one Cyrillic letters (Russian + Uzbek Cyrillic)
+CYRILLIC_LETTERS = [
+    ('а', 'a'), ('б', 'b'), ('в', 'v'), ('г', 'g'), ('д', 'd'), ('е', 'e'),
+    ('з', 'z'), ('и', 'i'), ('й', 'y'), ('к', 'k'), ('л', 'l'), ('м', 'm'),
+    ('н', 'n'), ('о', 'o'), ('п', 'p'), ('р', 'r'), ('с', 's'), ('т', 't'),
+    ('у', 'u'), ('ф', 'f'), ('х', 'x'), ('ы', 'i'), ('э', 'e'), ('ў', 'o'),
+    ('қ', 'k'), ('ғ', 'g'), ('ҳ', 'h'),
+]
+
+# Dropped together with apostrophes
+SILENT_LETTERS = 'ъь'
+
+# Spelling variants between Uzbek Latin and Russian-style Latin
+LATIN_DIGRAPHS = [
+    ('dzh', 'j'),
+    ('kh', 'x'),
+]
+
+# Uzbek q/o are spelled k/a in Russian transliteration (Qibray/Kibray,
+# Olmazor/Almazar)
+LATIN_LETTERS = [
+    ('q', 'k'),
+    ('o', 'a'),
+]
+
+# Administrative words ignored when matching place names
+LOCATION_STOPWORDS = [
+    'viloyati', 'tumani', 'shahri', 'shahar',
+    'область', 'район', 'город', 'г',
+    'region', 'district', 'city',
+]
+
+
+def _translate_tables():
+    letters_from = ''.join(src for src, _ in CYRILLIC_LETTERS)
+    letters_to = ''.join(dst for _, dst in CYRILLIC_LETTERS)
+    return letters_from + APOSTROPHES + SILENT_LETTERS, letters_to
+
+
+def transliterate(value):
+    """Python twin of real_estate_translit()"""
+    value = (value or '').lower()
+    for src, dst in CYRILLIC_DIGRAPHS:
+        value = value.replace(src, dst)
+
+    letters_from, letters_to = _translate_tables()
+    table = {ord(ch): (letters_to[i] if i < len(letters_to) else None)
+             for i, ch in enumerate(letters_from)}
+    value = value.translate(table)
+
+    for src, dst in LATIN_DIGRAPHS:
+        value = value.replace(src, dst)
+    return value.translate({ord(src): dst for src, dst in LATIN_LETTERS})
+
+
+def _sql_literal(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def translit_sql(expression):
+    """SQL expression applying the folding to expression"""
+    sql = f"lower(coalesce({expression}, ''))"
+    for src, dst in CYRILLIC_DIGRAPHS:
+        sql = f"replace({sql}, {_sql_literal(src)}, {_sql_literal(dst)})"
+
+    # translate() drops characters that have no counterpart in the target
+    letters_from, letters_to = _translate_tables()
+    sql = f"translate({sql}, {_sql_literal(letters_from)}, {_sql_literal(letters_to)})"
+
+    for src, dst in LATIN_DIGRAPHS:
+        sql = f"replace({sql}, {_sql_literal(src)}, {_sql_literal(dst)})"
+    latin_from = ''.join(src for src, _ in LATIN_LETTERS)
+    latin_to = ''.join(dst for _, dst in LATIN_LETTERS)
+    return f"translate({sql}, {_sql_literal(latin_from)}, {_sql_literal(latin_to)})"
+
+
+def location_stopwords_pattern():
+    """Regex matching folded LOCATION_STOPWORDS as whole words"""
+    words = sorted({transliterate(word) for word in LOCATION_STOPWORDS}, key=len, reverse=True)
+    return r'\m(' + '|'.join(words) + r')\M'
+
+
+def create_functions_sql():
+    """CREATE FUNCTION statements for migrations 0005 and 0011
+
+    Calls between the functions are schema-qualified: expression indexes,
+    REINDEX, autovacuum and pg_restore evaluate them with a restricted
+    search_path (always so for CREATE INDEX on PostgreSQL 17+).
+    """
+    return f"""
+CREATE OR REPLACE FUNCTION real_estate_translit(value text) RETURNS text AS $$
+    SELECT {translit_sql('value')}
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION real_estate_location_alias(value text) RETURNS text AS $$
+    SELECT btrim(regexp_replace(public.real_estate_translit(value), {_sql_literal(location_stopwords_pattern())}, '', 'g'))
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION real_estate_property_fuzzy_doc(title text, address text, full_address text) RETURNS text AS $$
+    SELECT public.real_estate_translit(
+        coalesce(title, '') || ' ' || coalesce(address, '') || ' ' || coalesce(full_address, ''))
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+"""
+
+
+DROP_FUNCTIONS_SQL = """
+DROP FUNCTION IF EXISTS real_estate_property_fuzzy_doc(text, text, text);
+DROP FUNCTION IF EXISTS real_estate_location_alias(text);
+DROP FUNCTION IF EXISTS real_estate_translit(text);
+"""
+
+
+class Translit(Func):
+    function = 'real_estate_translit'
+    output_field = TextField()
+
+
+class LocationAlias(Func):
+    """Folded place name without administrative words (tumani, район, ...)"""
+    function = 'real_estate_location_alias'
+    output_field = TextField()
+
+
+class FuzzyDocument(Func):
+    """Folded title/address text of a listing, covered by a trigram index"""
+    function = 'real_estate_property_fuzzy_doc'
+    output_field = TextField()
+
+    def __init__(self, **extra):
+        super().__init__('title', 'address', 'full_address', **extra)
@@ -16,6 +16,7 @@ urlpatterns = [
     
     # User management endpoints
     path('users/create/', views.create_or_get_user, name='create-user'),
+    path('users/bulk-upsert/', views.bulk_upsert_users, name='bulk-upsert-users'),
     path('users/<int:telegram_id>/language/', views.update_user_language, name='update-language'),
     path('users/<int:telegram_id>/properties/', views.user_properties, name='user-properties'),
     path('users/<int:telegram_id>/favorites/', views.user_favorites, name='user-favorites'),
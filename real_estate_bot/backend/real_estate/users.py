@@ -0,0 +1,102 @@
+"""Single-statement TelegramUser upserts
+
+upsert_users() writes a batch of users with one INSERT ... ON CONFLICT DO
+UPDATE per set of provided fields (in practice one statement per call).
+Existing users only get their provided fields overwritten, and rows whose
+values would not change are not written at all, so they keep their
+updated_at. Every requested user is returned either way, with
+upsert_status set to 'created', 'updated' or 'unchanged'.
+
+A user inserted by a concurrent transaction that commits while the
+statement runs is skipped by the conflict clause and is not visible to
+the statement's snapshot either; such users are read back with a second
+query and reported as 'unchanged'.
+
+Raw SQL sends no post_save, so created and updated users are logged here
+the way signals.log_user_changes logs saved ones.
+"""
+import logging
+
+from .models import TelegramUser
+
+logger = logging.getLogger('real_estate')
+
+PROFILE_FIELDS = ('username', 'first_name', 'last_name', 'language')
+DEFAULTS = {'username': '', 'first_name': '', 'last_name': '', 'language': 'uz'}
+
+UPSERT_SQL = """
+WITH input (telegram_id, username, first_name, last_name, language) AS (VALUES {values}),
+upserted AS (
+    INSERT INTO real_estate_telegramuser AS u (
+        telegram_id, username, first_name, last_name, language,
+        is_blocked, balance, is_premium, created_at, updated_at
+    )
+    SELECT telegram_id, username, first_name, last_name, language, FALSE, 0, FALSE, NOW(), NOW()
+    FROM input
+    ON CONFLICT (telegram_id) DO {action}
+    RETURNING {columns}, CASE WHEN xmax = 0 THEN 'created' ELSE 'updated' END AS upsert_status
+)
+SELECT * FROM upserted
+UNION ALL
+-- Existing users the conflict clause left untouched
+SELECT {user_columns}, 'unchanged' FROM real_estate_telegramuser u
+JOIN input ON input.telegram_id = u.telegram_id
+WHERE NOT EXISTS (SELECT 1 FROM upserted WHERE upserted.telegram_id = u.telegram_id)
+"""
+
+
+def _conflict_action(fields):
+    if not fields:
+        return 'NOTHING'
+    assignments = ', '.join(f'{field} = EXCLUDED.{field}' for field in fields)
+    current = ', '.join(f'u.{field}' for field in fields)
+    incoming = ', '.join(f'EXCLUDED.{field}' for field in fields)
+    return f'UPDATE SET {assignments}, updated_at = NOW() WHERE ({current}) IS DISTINCT FROM ({incoming})'
+
+
+def _upsert(fields, rows):
+    columns = [field.column for field in TelegramUser._meta.concrete_fields]
+    sql = UPSERT_SQL.format(
+        values=', '.join(['(%s::bigint, %s, %s, %s, %s)'] * len(rows)),
+        action=_conflict_action(fields),
+        columns=', '.join(columns),
+        user_columns=', '.join(f'u.{column}' for column in columns),
+    )
+    params = []
+    for row in rows:
+        params.append(row['telegram_id'])
+        params.extend(row.get(field, DEFAULTS[field]) for field in PROFILE_FIELDS)
+    return list(TelegramUser.objects.raw(sql, params))
+
+
+def upsert_users(rows):
+    """Create or update users from dicts of telegram_id and any PROFILE_FIELDS
+
+    Returns TelegramUser instances annotated with upsert_status.
+    """
+    # One INSERT ... ON CONFLICT can't touch the same user twice, the last row wins
+    latest = {}
+    for row in rows:
+        latest[int(row['telegram_id'])] = row
+
+    groups = {}
+    for row in latest.values():
+        fields = tuple(field for field in PROFILE_FIELDS if field in row)
+        groups.setdefault(fields, []).append(row)
+
+    users = []
+    for fields, group in groups.items():
+        users.extend(_upsert(fields, group))
+
+    for user in users:
+        if user.upsert_status == 'created':
+            logger.info(f"New user registered: {user.telegram_id} ({user.first_name})")
+        elif user.upsert_status == 'updated':
+            logger.info(f"User updated: {user.telegram_id} ({user.first_name})")
+
+    missing = latest.keys() - {user.telegram_id for user in users}
+    if missing:
+        for user in TelegramUser.objects.filter(telegram_id__in=missing):
+            user.upsert_status = 'unchanged'
+            users.append(user)
+    return users
@@ -0,0 +1,111 @@
+"""Write-behind property view counter
+
+Property.increment_views() only bumps an in-process counter. A background
+thread writes the accumulated increments every VIEW_COUNTER_FLUSH_INTERVAL
+seconds (or as soon as VIEW_COUNTER_MAX_PENDING listings are pending) with
+one UPDATE ... FROM (VALUES ...) statement, so a detail view does no write
+and a popular listing gets one row update per interval instead of one per
+view. Increments still pending when a process dies are lost; views_count
+is a popularity hint, not an audit log.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('real_estate')
+
+FLUSH_SQL = """
+UPDATE real_estate_property AS p
+SET views_count = p.views_count + v.views
+FROM (VALUES {values}) AS v(id, views)
+WHERE p.id = v.id
+"""
+
+
+class ViewCounter:
+    def __init__(self, flush_interval=5.0, max_pending=1000, autostart=True):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.autostart = autostart
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.flushed = 0
+        self.failures = 0
+
+    def record(self, property_id, views=1):
+        with self._lock:
+            self._pending[property_id] += views
+            pending = len(self._pending)
+            if self._thread is None and self.autostart:
+                self._start()
+        if pending >= self.max_pending:
+            self._wakeup.set()
+
+    def pending(self, property_id=None):
+        with self._lock:
+            if property_id is None:
+                return sum(self._pending.values())
+            return self._pending.get(property_id, 0)
+
+    def flush(self):
+        """Write pending increments, return the number of listings updated"""
+        with self._lock:
+            batch, self._pending = self._pending, Counter()
+        if not batch:
+            return 0
+
+        # Fixed id order so concurrent flushes from several processes can't deadlock
+        rows = sorted(batch.items())
+        try:
+            with connection.cursor() as cursor:
+                values = ', '.join(['(%s, %s)'] * len(rows))
+                cursor.execute(
+                    FLUSH_SQL.format(values=values),
+                    [value for row in rows for value in row]
+                )
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Error flushing view counts: {e}")
+            with self._lock:
+                self._pending.update(batch)
+            return 0
+
+        self.flushed += len(rows)
+        return len(rows)
+
+    def stats(self):
+        with self._lock:
+            pending_listings = len(self._pending)
+        return {
+            'pending_listings': pending_listings,
+            'flushed': self.flushed,
+            'failures': self.failures,
+        }
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name='view-counter', daemon=True)
+        self._thread.start()
+        atexit.register(self._shutdown)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+            # Don't keep this thread's connection open between flushes
+            connection.close()
+
+    def _shutdown(self):
+        self.flush()
+
+
+view_counter = ViewCounter(
+    flush_interval=getattr(settings, 'VIEW_COUNTER_FLUSH_INTERVAL', 5.0),
+    max_pending=getattr(settings, 'VIEW_COUNTER_MAX_PENDING', 1000),
+)
@@ -6,25 +6,33 @@ from rest_framework.pagination import PageNumberPagination
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 from django_filters.rest_framework import DjangoFilterBackend
 from django_filters import rest_framework as filters_rf
-from django.db.models import Q, Count, Avg, Sum
+from django.db.models import Sum
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
-from django.http import JsonResponse
-from datetime import datetime, timedelta
+from django.http import JsonResponse, Http404
 import logging
-from django.db import models
 from .models import (
     TelegramUser, Property, Favorite, UserActivity, 
-    Region, District, SearchQuery
+    Region, District
 )
 from .serializers import (
     TelegramUserSerializer, PropertySerializer, PropertyListSerializer,
     FavoriteSerializer, UserActivitySerializer, RegionSerializer, 
-    DistrictSerializer, PropertyDetailSerializer
+    DistrictSerializer, PropertyDetailSerializer, TelegramUserUpsertSerializer
 )
+from .search import search_properties, fuzzy_search_properties
+from .gazetteer import get_gazetteer
+from .statistics import get_property_statistics
+from .response_cache import cache_response
+from .view_counter import view_counter
+from .activity import activity_buffer, record_activity, record_search
+from .users import upsert_users
+from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+BULK_UPSERT_LIMIT = 1000
+
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = 'page_size'
@@ -63,31 +71,16 @@ def create_or_get_user(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        user, created = TelegramUser.objects.get_or_create(
-            telegram_id=telegram_id,
-            defaults={
-                'username': request.data.get('username', ''),
-                'first_name': request.data.get('first_name', ''),
-                'last_name': request.data.get('last_name', ''),
-                'language': request.data.get('language', 'uz'),
-                'is_blocked': False,
-                'balance': 0.00
-            }
-        )
+        serializer = TelegramUserUpsertSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        if not created:
-            # Update user info if provided
-            update_fields = []
-            for field in ['username', 'first_name', 'last_name', 'language']:
-                if field in request.data:
-                    setattr(user, field, request.data[field])
-                    update_fields.append(field)
-            
-            if update_fields:
-                user.save(update_fields=update_fields + ['updated_at'])
+        # One statement: insert, update the provided fields, or leave an unchanged user alone
+        user = upsert_users([serializer.validated_data])[0]
+        created = user.upsert_status == 'created'
         
         # Log user activity
-        UserActivity.objects.create(
+        record_activity(
             user=user,
             action='start' if created else 'return',
             details={'new_user': created}
@@ -103,6 +96,47 @@ def create_or_get_user(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def bulk_upsert_users(request):
+    """Create or update many Telegram users in one round-trip"""
+    try:
+        rows = request.data.get('users') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list) or not rows:
+            return Response(
+                {'error': 'users must be a non-empty list'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(rows) > BULK_UPSERT_LIMIT:
+            return Response(
+                {'error': f'At most {BULK_UPSERT_LIMIT} users per request'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        serializer = TelegramUserUpsertSerializer(data=rows, many=True)
+        if not serializer.is_valid():
+            return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        
+        users = upsert_users(serializer.validated_data)
+        summary = {'created': 0, 'updated': 0, 'unchanged': 0}
+        for user in users:
+            summary[user.upsert_status] += 1
+        
+        return Response({
+            **summary,
+            'users': [
+                {'id': user.id, 'telegram_id': user.telegram_id, 'status': user.upsert_status}
+                for user in users
+            ]
+        })
+        
+    except Exception as e:
+        logger.error(f"Error bulk upserting users: {e}")
+        return Response(
+            {'error': 'Internal server error'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
 @api_view(['PUT'])
 @permission_classes([AllowAny])
 def update_user_language(request, telegram_id):
@@ -116,7 +150,7 @@ def update_user_language(request, telegram_id):
             user.save(update_fields=['language', 'updated_at'])
             
             # Log activity
-            UserActivity.objects.create(
+            record_activity(
                 user=user,
                 action='language_change',
                 details={'new_language': language}
@@ -149,8 +183,12 @@ class PropertyViewSet(ModelViewSet):
     ordering_fields = ['created_at', 'price', 'area', 'views_count', 'favorites_count']
     ordering = ['-is_premium', '-created_at']
     
+    @cache_response('properties')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
     def get_queryset(self):
-        queryset = Property.objects.select_related('user').prefetch_related('favorited_by')
+        queryset = Property.objects.select_related('user')
         
         # Filter by approval status
         if self.action == 'list':
@@ -177,7 +215,7 @@ class PropertyViewSet(ModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
         
-        # Increment view count
+        # Buffered, written in bulk by the view counter thread
         instance.increment_views()
         
         # Log activity if user is provided
@@ -185,7 +223,7 @@ class PropertyViewSet(ModelViewSet):
         if user_id:
             try:
                 user = TelegramUser.objects.get(telegram_id=user_id)
-                UserActivity.objects.create(
+                record_activity(
                     user=user,
                     action='view_listing',
                     property=instance
@@ -213,7 +251,7 @@ class PropertyViewSet(ModelViewSet):
             property_instance = serializer.save(user=user)
             
             # Log activity
-            UserActivity.objects.create(
+            record_activity(
                 user=user,
                 action='post_listing',
                 property=property_instance
@@ -229,6 +267,7 @@ class PropertyViewSet(ModelViewSet):
             )
     
     @action(detail=False, methods=['get'])
+    @cache_response('properties')
     def by_location(self, request):
         """Get properties filtered by region and/or district"""
         region_key = request.query_params.get('region')
@@ -244,10 +283,10 @@ class PropertyViewSet(ModelViewSet):
         
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = PropertyListSerializer(page, many=True)
+            serializer = PropertyListSerializer(page, many=True, context=self.get_serializer_context())
             return self.get_paginated_response(serializer.data)
         
-        serializer = PropertyListSerializer(queryset, many=True)
+        serializer = PropertyListSerializer(queryset, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
@@ -263,16 +302,19 @@ class PropertyViewSet(ModelViewSet):
         queryset = self.get_queryset()
         
         if search_type == 'keyword':
-            queryset = queryset.filter(
-                Q(title__icontains=query) |
-                Q(description__icontains=query) |
-                Q(address__icontains=query) |
-                Q(full_address__icontains=query)
-            )
+            keyword_results = search_properties(queryset, query)
+            if keyword_results.exists():
+                queryset = keyword_results
+            else:
+                # No exact word matches, retry tolerating typos and spelling
+                search_type = 'fuzzy'
+        
+        if search_type == 'fuzzy':
+            queryset = fuzzy_search_properties(queryset, query)
         
         results_count = queryset.count()
         
-        # Log search query
+        # Log search query (written in the background)
         user = None
         if user_id:
             try:
@@ -280,7 +322,7 @@ class PropertyViewSet(ModelViewSet):
             except TelegramUser.DoesNotExist:
                 pass
         
-        SearchQuery.objects.create(
+        record_search(
             user=user,
             query=query,
             search_type=search_type,
@@ -289,7 +331,7 @@ class PropertyViewSet(ModelViewSet):
         
         # Log user activity
         if user:
-            UserActivity.objects.create(
+            record_activity(
                 user=user,
                 action='search',
                 details={'query': query, 'results_count': results_count}
@@ -297,10 +339,10 @@ class PropertyViewSet(ModelViewSet):
         
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = PropertyListSerializer(page, many=True)
+            serializer = PropertyListSerializer(page, many=True, context=self.get_serializer_context())
             return self.get_paginated_response(serializer.data)
         
-        serializer = PropertyListSerializer(queryset, many=True)
+        serializer = PropertyListSerializer(queryset, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
 
 # Favorites Views
@@ -328,7 +370,7 @@ def add_to_favorites(request):
         
         if created:
             # Log activity
-            UserActivity.objects.create(
+            record_activity(
                 user=user,
                 action='favorite_add',
                 property=property_obj
@@ -360,7 +402,7 @@ def remove_from_favorites(request, telegram_id, property_id):
         favorite = get_object_or_404(Favorite, user=user, property_id=property_id)
         
         # Log activity before deletion
-        UserActivity.objects.create(
+        record_activity(
             user=user,
             action='favorite_remove',
             property=favorite.property
@@ -386,7 +428,7 @@ def user_favorites(request, telegram_id):
     """Get user's favorites"""
     try:
         user = get_object_or_404(TelegramUser, telegram_id=telegram_id)
-        favorites = Favorite.objects.filter(user=user).select_related('property__user').order_by('-created_at')
+        favorites = Favorite.objects.filter(user=user).select_related('user', 'property__user').order_by('-created_at')
         
         # Paginate results
         paginator = StandardResultsSetPagination()
@@ -411,7 +453,7 @@ def user_properties(request, telegram_id):
     """Get user's properties"""
     try:
         user = get_object_or_404(TelegramUser, telegram_id=telegram_id)
-        properties = Property.objects.filter(user=user).order_by('-created_at')
+        properties = Property.objects.filter(user=user).select_related('user').order_by('-created_at')
         
         # Paginate results
         paginator = StandardResultsSetPagination()
@@ -433,80 +475,115 @@ def user_properties(request, telegram_id):
 
 # Location Views
 class RegionViewSet(ReadOnlyModelViewSet):
-    """Read-only operations for regions"""
+    """Read-only operations for regions (served from the gazetteer)"""
     queryset = Region.objects.filter(is_active=True).order_by('order', 'name_uz')
     serializer_class = RegionSerializer
     permission_classes = [AllowAny]
+    filter_backends = []
+    
+    @cache_response('locations')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @cache_response('locations')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
+    def get_queryset(self):
+        return get_gazetteer().active_regions()
+    
+    def get_object(self):
+        try:
+            region = get_gazetteer().regions_by_id.get(int(self.kwargs['pk']))
+        except ValueError:
+            region = None
+        if region is None or not region.is_active:
+            raise Http404
+        return region
     
     @action(detail=True, methods=['get'])
+    @cache_response('locations')
     def districts(self, request, pk=None):
         """Get districts for a specific region"""
         region = self.get_object()
-        districts = District.objects.filter(region=region, is_active=True).order_by('order', 'name_uz')
+        districts = get_gazetteer().active_districts(region.key)
         serializer = DistrictSerializer(districts, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @cache_response('locations')
     def with_counts(self, request):
         """Get regions with property counts"""
-        regions = Region.objects.filter(is_active=True).annotate(
-            properties_count=Count('districts__key', filter=Q(
-                districts__key__in=Property.objects.filter(
-                    is_approved=True, is_active=True
-                ).values_list('region', flat=True)
-            ))
-        ).order_by('order', 'name_uz')
-        
-        serializer = RegionSerializer(regions, many=True)
+        serializer = RegionSerializer(get_gazetteer().active_regions(), many=True)
         return Response(serializer.data)
 
 class DistrictViewSet(ReadOnlyModelViewSet):
-    """Read-only operations for districts"""
+    """Read-only operations for districts (served from the gazetteer)"""
     queryset = District.objects.filter(is_active=True).select_related('region').order_by('region__order', 'order', 'name_uz')
     serializer_class = DistrictSerializer
     permission_classes = [AllowAny]
+    filter_backends = []
+    
+    @cache_response('locations')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @cache_response('locations')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
     
     def get_queryset(self):
-        queryset = super().get_queryset()
+        districts = get_gazetteer().active_districts()
         region_id = self.request.query_params.get('region_id')
         region_key = self.request.query_params.get('region_key')
         
         if region_id:
-            queryset = queryset.filter(region_id=region_id)
+            districts = [district for district in districts if str(district.region_id) == region_id]
         elif region_key:
-            queryset = queryset.filter(region__key=region_key)
+            districts = [district for district in districts if district.region.key == region_key]
         
-        return queryset
+        return districts
+    
+    def get_object(self):
+        try:
+            district = get_gazetteer().districts_by_id.get(int(self.kwargs['pk']))
+        except ValueError:
+            district = None
+        if district is None or not district.is_active:
+            raise Http404
+        return district
 
 # Legacy API endpoints for backward compatibility
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@cache_response('locations')
 def regions_list(request):
     """Get list of regions"""
-    regions = Region.objects.filter(is_active=True).order_by('order', 'name_uz')
+    regions = get_gazetteer().active_regions()
     serializer = RegionSerializer(regions, many=True)
     return Response(serializer.data)
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@cache_response('locations')
 def districts_list(request, region_id=None):
     """Get list of districts, optionally filtered by region"""
+    districts = get_gazetteer().active_districts()
     if region_id:
-        districts = District.objects.filter(region_id=region_id, is_active=True)
-    else:
-        districts = District.objects.filter(is_active=True)
+        districts = [district for district in districts if district.region_id == region_id]
     
-    districts = districts.select_related('region').order_by('region__order', 'order', 'name_uz')
     serializer = DistrictSerializer(districts, many=True)
     return Response(serializer.data)
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@cache_response('locations')
 def districts_by_region_key(request, region_key):
     """Get districts by region key"""
     try:
-        region = get_object_or_404(Region, key=region_key, is_active=True)
-        districts = District.objects.filter(region=region, is_active=True).order_by('order', 'name_uz')
+        if get_gazetteer().region(region_key, active_only=True) is None:
+            raise Http404
+        districts = get_gazetteer().active_districts(region_key)
         serializer = DistrictSerializer(districts, many=True)
         return Response(serializer.data)
     except Exception as e:
@@ -518,6 +595,7 @@ def districts_by_region_key(request, region_key):
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@cache_response('properties')
 def properties_by_location(request):
     """Get properties filtered by region and/or district"""
     try:
@@ -555,120 +633,11 @@ def properties_by_location(request):
 # Statistics and Analytics Views
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@cache_response('statistics', timeout=settings.STATISTICS_CACHE_TTL)
 def property_statistics(request):
-    """Get comprehensive property statistics"""
+    """Get comprehensive property statistics (cached, see real_estate.statistics)"""
     try:
-        # Basic counts
-        total_properties = Property.objects.filter(is_approved=True).count()
-        active_properties = Property.objects.filter(is_approved=True, is_active=True).count()
-        premium_properties = Property.objects.filter(is_approved=True, is_premium=True).count()
-        
-        # Time-based statistics
-        now = timezone.now()
-        today = now.date()
-        week_ago = today - timedelta(days=7)
-        month_ago = today - timedelta(days=30)
-        
-        properties_today = Property.objects.filter(
-            is_approved=True, created_at__date=today
-        ).count()
-        
-        properties_this_week = Property.objects.filter(
-            is_approved=True, created_at__gte=week_ago
-        ).count()
-        
-        properties_this_month = Property.objects.filter(
-            is_approved=True, created_at__gte=month_ago
-        ).count()
-        
-        # Category statistics
-        properties_by_type = list(
-            Property.objects.filter(is_approved=True)
-            .values('property_type')
-            .annotate(count=Count('id'))
-            .order_by('-count')
-        )
-        
-        properties_by_status = list(
-            Property.objects.filter(is_approved=True)
-            .values('status')
-            .annotate(count=Count('id'))
-            .order_by('-count')
-        )
-        
-        # Regional statistics
-        properties_by_region = []
-        for region in Region.objects.filter(is_active=True):
-            count = Property.objects.filter(
-                is_approved=True, region=region.key
-            ).count()
-            if count > 0:
-                properties_by_region.append({
-                    'region_key': region.key,
-                    'region_name': region.name_uz,
-                    'count': count
-                })
-        
-        properties_by_region = sorted(properties_by_region, key=lambda x: x['count'], reverse=True)
-        
-        # Price statistics
-        price_stats = Property.objects.filter(is_approved=True).aggregate(
-            avg_price=Avg('price'),
-            min_price=models.Min('price'),
-            max_price=models.Max('price')
-        )
-        
-        # User statistics
-        total_users = TelegramUser.objects.count()
-        active_users = TelegramUser.objects.filter(
-            activities__created_at__gte=week_ago
-        ).distinct().count()
-        
-        # Recent properties
-        recent_properties = Property.objects.filter(
-            is_approved=True, is_active=True
-        ).select_related('user').order_by('-created_at')[:5]
-        
-        recent_properties_data = PropertyListSerializer(recent_properties, many=True).data
-        
-        # Popular searches
-        popular_searches = list(
-            SearchQuery.objects.filter(created_at__gte=week_ago)
-            .values('query')
-            .annotate(count=Count('id'))
-            .order_by('-count')[:10]
-        )
-        
-        stats = {
-            # Basic counts
-            'total_properties': total_properties,
-            'active_properties': active_properties,
-            'premium_properties': premium_properties,
-            'total_users': total_users,
-            'active_users': active_users,
-            
-            # Time-based
-            'properties_today': properties_today,
-            'properties_this_week': properties_this_week,
-            'properties_this_month': properties_this_month,
-            
-            # Categories
-            'properties_by_type': properties_by_type,
-            'properties_by_status': properties_by_status,
-            'properties_by_region': properties_by_region[:10],  # Top 10 regions
-            
-            # Price statistics
-            'price_statistics': price_stats,
-            
-            # Recent data
-            'recent_properties': recent_properties_data,
-            'popular_searches': popular_searches,
-            
-            # Ratios and percentages
-            'premium_percentage': round((premium_properties / total_properties * 100) if total_properties > 0 else 0, 2),
-            'active_percentage': round((active_properties / total_properties * 100) if total_properties > 0 else 0, 2),
-        }
-        
+        stats = get_property_statistics()
         return Response(stats)
         
     except Exception as e:
@@ -741,7 +710,9 @@ def health_check(request):
             'timestamp': timezone.now(),
             'database': 'connected',
             'users': user_count,
-            'properties': property_count
+            'properties': property_count,
+            'view_counter': view_counter.stats(),
+            'activity_buffer': activity_buffer.stats()
         })
     except Exception as e:
         logger.error(f"Health check failed: {e}")
@@ -47,6 +47,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # Third party apps
     'rest_framework',
     'corsheaders',
@@ -200,6 +201,44 @@ LOGGING = {
     },
 }
 
+# Cache backend: local memory per process by default, shared Redis when CACHE_REDIS_URL is set
+if os.getenv('CACHE_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_REDIS_URL'),
+            'KEY_PREFIX': 'real_estate',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'real-estate',
+        }
+    }
+
+# Public API response cache (real_estate.response_cache)
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', '60'))
+
+# Property views are buffered per process and written in bulk
+VIEW_COUNTER_FLUSH_INTERVAL = float(os.getenv('VIEW_COUNTER_FLUSH_INTERVAL', '5'))
+VIEW_COUNTER_MAX_PENDING = int(os.getenv('VIEW_COUNTER_MAX_PENDING', '1000'))
+
+# UserActivity/SearchQuery rows are queued per process and written in batches
+ACTIVITY_FLUSH_INTERVAL = float(os.getenv('ACTIVITY_FLUSH_INTERVAL', '2'))
+ACTIVITY_BATCH_SIZE = int(os.getenv('ACTIVITY_BATCH_SIZE', '500'))
+ACTIVITY_BUFFER_SIZE = int(os.getenv('ACTIVITY_BUFFER_SIZE', '10000'))
+
+# Property detail fragments and the similar-listings index
+DETAIL_CACHE_TIMEOUT = int(os.getenv('DETAIL_CACHE_TIMEOUT', '300'))
+SIMILAR_INDEX_TIMEOUT = int(os.getenv('SIMILAR_INDEX_TIMEOUT', '300'))
+
+# Dashboard statistics: recomputed once per bucket, stale data served while refreshing
+STATISTICS_CACHE_TTL = int(os.getenv('STATISTICS_CACHE_TTL', '60'))
+STATISTICS_STALE_TTL = int(os.getenv('STATISTICS_STALE_TTL', '600'))
+
 # Create logs directory
 os.makedirs(BASE_DIR / 'logs', exist_ok=True)
 
@@ -14,10 +14,9 @@ from aiogram.types import (
 from aiogram.utils.keyboard import ReplyKeyboardBuilder, InlineKeyboardBuilder
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.utils.media_group import MediaGroupBuilder
 import os
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any
 from dotenv import load_dotenv
 import asyncpg
@@ -25,6 +24,10 @@ from collections import defaultdict
 from asyncio import create_task, sleep
 from utils.translations import REGIONS_DATA, TRANSLATIONS, regions_config
 from utils.templates import get_listing_template
+from utils.user_cache import UserProfileCache
+from utils.gazetteer import BotGazetteer
+from utils.delivery import DeliveryPipeline, listing_unit, compact_results_unit
+from utils.fsm_storage import create_fsm_storage, PostgresStorage
 
 # Load environment variables
 load_dotenv()
@@ -84,12 +87,37 @@ if BOT_TOKEN == 'YOUR_BOT_TOKEN_HERE':
 
 # Initialize bot and dispatcher
 bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-storage = MemoryStorage()
+# FSM drafts survive restarts and are shared between processes (FSM_STORAGE)
+storage = create_fsm_storage(os.getenv('FSM_STORAGE', 'postgres'))
 dp = Dispatcher(storage=storage)
 
+# Number of listings shown per "👀 Listings" page
+LISTINGS_PAGE_SIZE = 5
+
+# Concurrent, rate-limited sending of listing results
+delivery = DeliveryPipeline(
+    bot,
+    concurrency=int(os.getenv('DELIVERY_CONCURRENCY', '4'))
+)
+
+# Show results as one album + one numbered keyboard instead of a message per listing
+COMPACT_RESULTS = os.getenv('COMPACT_RESULTS', 'false').lower() in ('1', 'true', 'yes')
+
+# Region/district names, kept in sync with the backend Region/District tables
+gazetteer = BotGazetteer(REGIONS_DATA, regions_config)
+gazetteer_task = None
+GAZETTEER_CHECK_INTERVAL = float(os.getenv('GAZETTEER_CHECK_INTERVAL', '30'))
+LOCATION_MATCH_THRESHOLD = 0.6
+
 # Database connection pool
 db_pool = None
 
+# In-process cache of user profiles (language, internal id, flags)
+user_cache = UserProfileCache(
+    max_size=int(os.getenv('USER_CACHE_SIZE', '10000')),
+    ttl=float(os.getenv('USER_CACHE_TTL', '300'))
+)
+
 async def init_db_pool():
     """Initialize database connection pool"""
     global db_pool
@@ -117,33 +145,69 @@ async def close_db_pool():
         await db_pool.close()
         logger.info("Database pool closed")
 
-# Database operations with PostgreSQL
 # Database operations with PostgreSQL
 async def save_user(user_id: int, username: str, first_name: str, last_name: str, language: str = 'uz'):
     """Save or update user in database"""
     async with db_pool.acquire() as conn:
-        await conn.execute('''
-            INSERT INTO real_estate_telegramuser (
-                telegram_id, username, first_name, last_name, language, 
-                is_blocked, balance, created_at, updated_at, is_premium
+        # Returning users whose names didn't change are read, not rewritten
+        profile = await conn.fetchrow('''
+            WITH upserted AS (
+                INSERT INTO real_estate_telegramuser AS u (
+                    telegram_id, username, first_name, last_name, language, 
+                    is_blocked, balance, created_at, updated_at, is_premium
+                )
+                VALUES ($1, $2, $3, $4, $5, $6, $7, NOW(), NOW(), $8)
+                ON CONFLICT (telegram_id) 
+                DO UPDATE SET
+                    username = EXCLUDED.username,
+                    first_name = EXCLUDED.first_name,
+                    last_name = EXCLUDED.last_name,
+                    updated_at = NOW()
+                WHERE (u.username, u.first_name, u.last_name)
+                    IS DISTINCT FROM (EXCLUDED.username, EXCLUDED.first_name, EXCLUDED.last_name)
+                RETURNING id, language, is_blocked, is_premium
             )
-            VALUES ($1, $2, $3, $4, $5, $6, $7, NOW(), NOW(), $8)
-            ON CONFLICT (telegram_id) 
-            DO UPDATE SET
-                username = EXCLUDED.username,
-                first_name = EXCLUDED.first_name,
-                last_name = EXCLUDED.last_name,
-                updated_at = NOW()
+            SELECT id, language, is_blocked, is_premium FROM upserted
+            UNION ALL
+            SELECT id, language, is_blocked, is_premium FROM real_estate_telegramuser
+            WHERE telegram_id = $1 AND NOT EXISTS (SELECT 1 FROM upserted)
         ''', user_id, username or '', first_name or '', last_name or '', language, False, 0.00, False)
+        if profile is None:
+            # A concurrent insert won the conflict after our snapshot was taken, read it now
+            profile = await conn.fetchrow(
+                'SELECT id, language, is_blocked, is_premium FROM real_estate_telegramuser WHERE telegram_id = $1', 
+                user_id
+            )
+    
+    user_cache.set(user_id, profile)
 
-async def get_user_language(user_id: int) -> str:
-    """Get user language preference"""
+async def get_user_profile(user_id: int) -> Optional[Dict[str, Any]]:
+    """Get cached user profile (id, language, is_blocked, is_premium)"""
+    profile = user_cache.get(user_id)
+    if profile is not None:
+        return profile
+    
     async with db_pool.acquire() as conn:
-        result = await conn.fetchval(
-            'SELECT language FROM real_estate_telegramuser WHERE telegram_id = $1', 
+        row = await conn.fetchrow(
+            'SELECT id, language, is_blocked, is_premium FROM real_estate_telegramuser WHERE telegram_id = $1', 
             user_id
         )
-        return result if result else 'uz'
+    
+    if not row:
+        return None
+    return user_cache.set(user_id, row)
+
+async def get_user_language(user_id: int) -> str:
+    """Get user language preference"""
+    profile = await get_user_profile(user_id)
+    if profile and profile['language']:
+        return profile['language']
+    return 'uz'
+
+async def get_user_db_id(user_id: int) -> Optional[int]:
+    """Resolve telegram_id to internal user id (cached)"""
+    profile = await get_user_profile(user_id)
+    return profile['id'] if profile else None
 
 async def update_user_language(user_id: int, language: str):
     """Update user language"""
@@ -152,19 +216,18 @@ async def update_user_language(user_id: int, language: str):
             'UPDATE real_estate_telegramuser SET language = $1, updated_at = NOW() WHERE telegram_id = $2',
             language, user_id
         )
+    
+    user_cache.invalidate(user_id)
 
 async def save_listing(user_id: int, data: dict) -> int:
     """Save listing to database with proper handling of all required fields"""
+    # Get user database ID
+    user_db_id = await get_user_db_id(user_id)
+    
+    if not user_db_id:
+        raise Exception("User not found in database")
+    
     async with db_pool.acquire() as conn:
-        # Get user database ID
-        user_db_id = await conn.fetchval(
-            'SELECT id FROM real_estate_telegramuser WHERE telegram_id = $1',
-            user_id
-        )
-        
-        if not user_db_id:
-            raise Exception("User not found in database")
-        
         # Prepare all required fields with proper defaults
         photo_file_ids = json.dumps(data.get('photo_file_ids', []))
         
@@ -191,18 +254,26 @@ async def save_listing(user_id: int, data: dict) -> int:
         
         try:
             # Insert with all required fields properly set
+            # The owner's properties_count moves in the same statement
             listing_id = await conn.fetchval('''
-                INSERT INTO real_estate_property (
-                    user_id, title, description, property_type, region, district,
-                    address, full_address, price, area, rooms, condition, status, 
-                    contact_info, photo_file_ids, is_premium, is_approved, is_active,
-                    views_count, admin_notes, approval_status, favorites_count,
-                    posted_to_channel, created_at, updated_at
-                ) VALUES (
-                    $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15,
-                    $16, $17, $18, $19, $20, $21, $22, $23, NOW(), NOW()
+                WITH added AS (
+                    INSERT INTO real_estate_property (
+                        user_id, title, description, property_type, region, district,
+                        address, full_address, price, area, rooms, condition, status, 
+                        contact_info, photo_file_ids, is_premium, is_approved, is_active,
+                        views_count, admin_notes, approval_status, favorites_count,
+                        posted_to_channel, created_at, updated_at
+                    ) VALUES (
+                        $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15,
+                        $16, $17, $18, $19, $20, $21, $22, $23, NOW(), NOW()
+                    )
+                    RETURNING id, user_id
+                ), owner AS (
+                    UPDATE real_estate_telegramuser
+                    SET properties_count = properties_count + 1
+                    WHERE id IN (SELECT user_id FROM added)
                 )
-                RETURNING id
+                SELECT id FROM added
             ''', 
                 user_db_id,                           # user_id
                 title,                                # title (now guaranteed not null)
@@ -266,51 +337,103 @@ async def save_listing(user_id: int, data: dict) -> int:
 # Also add this to your error handler to get better debugging info
 async def save_listing_with_debug(user_id: int, data: dict) -> int:
     """Save listing with detailed error information"""
-    async with db_pool.acquire() as conn:
-        user_db_id = await conn.fetchval(
-            'SELECT id FROM real_estate_telegramuser WHERE telegram_id = $1',
-            user_id
-        )
+    user_db_id = await get_user_db_id(user_id)
+    
+    if not user_db_id:
+        raise Exception("User not found in database")
+    
+    # Let's see what fields exist and what's required
+    try:
+        # First check what the table looks like
+        await debug_table_schema()
         
-        if not user_db_id:
-            raise Exception("User not found in database")
+        # Try the save
+        return await save_listing(user_id, data)
         
-        # Let's see what fields exist and what's required
-        try:
-            # First check what the table looks like
-            await debug_table_schema()
-            
-            # Try the save
-            return await save_listing(user_id, data)
-            
-        except Exception as e:
-            logger.error(f"Save listing error: {e}")
-            logger.error(f"Data being saved: {data}")
-            raise
-async def get_listings(limit=10, offset=0):
-    """Get approved listings"""
+    except Exception as e:
+        logger.error(f"Save listing error: {e}")
+        logger.error(f"Data being saved: {data}")
+        raise
+CURSOR_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def encode_listing_cursor(listing) -> str:
+    """Encode listing sort key (is_premium, created_at, id) for callback data"""
+    created_us = (listing['created_at'] - CURSOR_EPOCH) // timedelta(microseconds=1)
+    return f"{int(listing['is_premium'])}_{created_us}_{listing['id']}"
+
+def decode_listing_cursor(cursor: str):
+    """Decode cursor produced by encode_listing_cursor"""
+    is_premium, created_us, listing_id = cursor.split('_')
+    created_at = CURSOR_EPOCH + timedelta(microseconds=int(created_us))
+    return is_premium == '1', created_at, int(listing_id)
+
+async def get_listings(limit=10, cursor: Optional[str] = None):
+    """Get approved listings page (keyset pagination on is_premium, created_at, id)"""
     async with db_pool.acquire() as conn:
+        if not cursor:
+            return await conn.fetch('''
+                SELECT p.*, u.first_name, u.username 
+                FROM real_estate_property p 
+                JOIN real_estate_telegramuser u ON p.user_id = u.id 
+                WHERE p.is_approved = true AND p.is_active = true
+                ORDER BY p.is_premium DESC, p.created_at DESC, p.id DESC 
+                LIMIT $1
+            ''', limit)
+        
+        is_premium, created_at, listing_id = decode_listing_cursor(cursor)
         return await conn.fetch('''
             SELECT p.*, u.first_name, u.username 
             FROM real_estate_property p 
             JOIN real_estate_telegramuser u ON p.user_id = u.id 
             WHERE p.is_approved = true AND p.is_active = true
-            ORDER BY p.is_premium DESC, p.created_at DESC 
-            LIMIT $1 OFFSET $2
-        ''', limit, offset)
+            AND (p.is_premium, p.created_at, p.id) < ($2, $3, $4)
+            ORDER BY p.is_premium DESC, p.created_at DESC, p.id DESC 
+            LIMIT $1
+        ''', limit, is_premium, created_at, listing_id)
 
 async def search_listings(query: str):
-    """Search listings by keyword"""
+    """Search listings by keyword (full-text, ranked by relevance)"""
+    # real_estate_tsquery() and search_vector are maintained by backend migration 0004
     async with db_pool.acquire() as conn:
+        listings = await conn.fetch('''
+            SELECT p.*, u.first_name, u.username,
+                   ts_rank(p.search_vector, q.query) AS search_rank
+            FROM real_estate_property p 
+            JOIN real_estate_telegramuser u ON p.user_id = u.id 
+            CROSS JOIN real_estate_tsquery($1) AS q(query)
+            WHERE p.search_vector @@ q.query
+            AND p.is_approved = true AND p.is_active = true
+            ORDER BY search_rank DESC, p.is_premium DESC, p.created_at DESC 
+            LIMIT 10
+        ''', query)
+        if listings:
+            return listings
+        
+        # Nothing matched word for word: retry with typo/transliteration
+        # tolerant trigram matching (backend migration 0005)
         return await conn.fetch('''
-            SELECT p.*, u.first_name, u.username 
+            WITH locations AS (
+                SELECT DISTINCT a.region_key, a.district_key
+                FROM unnest($2::text[], $3::text[], $4::text[]) AS a(region_key, district_key, name)
+                WHERE word_similarity(real_estate_location_alias(a.name), real_estate_translit($1)) >= $5
+            )
+            SELECT p.*, u.first_name, u.username,
+                   CASE WHEN EXISTS (
+                       SELECT 1 FROM locations l
+                       WHERE l.region_key = p.region AND l.district_key IN ('', p.district)
+                   ) THEN 1.0
+                   ELSE word_similarity(real_estate_translit($1),
+                                        real_estate_property_fuzzy_doc(p.title, p.address, p.full_address))
+                   END AS search_rank
             FROM real_estate_property p 
             JOIN real_estate_telegramuser u ON p.user_id = u.id 
-            WHERE (p.title ILIKE $1 OR p.description ILIKE $1 OR p.full_address ILIKE $1) 
+            WHERE (real_estate_translit($1) <% real_estate_property_fuzzy_doc(p.title, p.address, p.full_address)
+                   OR p.region IN (SELECT region_key FROM locations WHERE district_key = '')
+                   OR (p.region, p.district) IN (SELECT region_key, district_key FROM locations))
             AND p.is_approved = true AND p.is_active = true
-            ORDER BY p.is_premium DESC, p.created_at DESC 
+            ORDER BY search_rank DESC, p.is_premium DESC, p.created_at DESC 
             LIMIT 10
-        ''', f'%{query}%')
+        ''', query, *gazetteer.location_aliases, LOCATION_MATCH_THRESHOLD)
 
 async def search_listings_by_location(region_key=None, district_key=None):
     """Search listings by region and/or district"""
@@ -342,7 +465,7 @@ async def get_listing_by_id(listing_id: int):
     """Get listing by ID with user info"""
     async with db_pool.acquire() as conn:
         return await conn.fetchrow('''
-            SELECT p.*, u.first_name, u.username 
+            SELECT p.*, u.first_name, u.username, u.properties_count AS user_properties_count
             FROM real_estate_property p 
             JOIN real_estate_telegramuser u ON p.user_id = u.id 
             WHERE p.id = $1
@@ -351,59 +474,48 @@ async def get_listing_by_id(listing_id: int):
 async def add_to_favorites(user_id: int, listing_id: int):
     """Add listing to user's favorites"""
     async with db_pool.acquire() as conn:
-        # Get user database ID
-        user_db_id = await conn.fetchval(
-            'SELECT id FROM real_estate_telegramuser WHERE telegram_id = $1',
-            user_id
-        )
-        
-        if user_db_id:
-            await conn.execute('''
+        # Bump the listing's and the user's favorites_count only when a row was actually inserted
+        await conn.execute('''
+            WITH added AS (
                 INSERT INTO real_estate_favorite (user_id, property_id, created_at) 
-                VALUES ($1, $2, NOW())
+                SELECT u.id, $2, NOW()
+                FROM real_estate_telegramuser u
+                WHERE u.telegram_id = $1
                 ON CONFLICT (user_id, property_id) DO NOTHING
-            ''', user_db_id, listing_id)
+                RETURNING user_id, property_id
+            ), listing AS (
+                UPDATE real_estate_property
+                SET favorites_count = favorites_count + 1
+                WHERE id IN (SELECT property_id FROM added)
+            )
+            UPDATE real_estate_telegramuser
+            SET favorites_count = favorites_count + 1
+            WHERE id IN (SELECT user_id FROM added)
+        ''', user_id, listing_id)
 
 async def get_user_favorites(user_id: int):
     """Get user's favorite listings"""
     async with db_pool.acquire() as conn:
-        # Get user database ID
-        user_db_id = await conn.fetchval(
-            'SELECT id FROM real_estate_telegramuser WHERE telegram_id = $1',
-            user_id
-        )
-        
-        if not user_db_id:
-            return []
-        
         return await conn.fetch('''
             SELECT p.*, u.first_name, u.username 
             FROM real_estate_favorite f
+            JOIN real_estate_telegramuser fu ON f.user_id = fu.id
             JOIN real_estate_property p ON f.property_id = p.id
             JOIN real_estate_telegramuser u ON p.user_id = u.id
-            WHERE f.user_id = $1 AND p.is_approved = true AND p.is_active = true
+            WHERE fu.telegram_id = $1 AND p.is_approved = true AND p.is_active = true
             ORDER BY f.created_at DESC
-        ''', user_db_id)
+        ''', user_id)
 
 async def get_user_postings(user_id: int):
     """Get all postings by user"""
     async with db_pool.acquire() as conn:
-        # Get user database ID
-        user_db_id = await conn.fetchval(
-            'SELECT id FROM real_estate_telegramuser WHERE telegram_id = $1',
-            user_id
-        )
-        
-        if not user_db_id:
-            return []
-        
         return await conn.fetch('''
-            SELECT p.*, 
-                   (SELECT COUNT(*) FROM real_estate_favorite f WHERE f.property_id = p.id) as favorite_count
+            SELECT p.*, p.favorites_count as favorite_count
             FROM real_estate_property p 
-            WHERE p.user_id = $1
+            JOIN real_estate_telegramuser u ON p.user_id = u.id
+            WHERE u.telegram_id = $1
             ORDER BY p.created_at DESC
-        ''', user_db_id)
+        ''', user_id)
 
 async def update_listing_status(listing_id: int, is_active: bool):
     """Update listing active status"""
@@ -415,20 +527,29 @@ async def update_listing_status(listing_id: int, is_active: bool):
 
 async def delete_listing(listing_id: int):
     """Delete listing and return users who had it favorited"""
-    async with db_pool.acquire() as conn:
-        # Get users who favorited this listing
+    async with db_pool.acquire() as conn, conn.transaction():
+        # Delete from favorites first, returning the users who had it favorited
         favorite_users = await conn.fetch('''
-            SELECT tu.telegram_id 
-            FROM real_estate_favorite f
-            JOIN real_estate_telegramuser tu ON f.user_id = tu.id
-            WHERE f.property_id = $1
+            WITH removed AS (
+                DELETE FROM real_estate_favorite WHERE property_id = $1
+                RETURNING user_id
+            )
+            UPDATE real_estate_telegramuser
+            SET favorites_count = GREATEST(favorites_count - 1, 0)
+            WHERE id IN (SELECT user_id FROM removed)
+            RETURNING telegram_id
         ''', listing_id)
         
-        # Delete from favorites first
-        await conn.execute('DELETE FROM real_estate_favorite WHERE property_id = $1', listing_id)
-        
         # Delete the listing
-        await conn.execute('DELETE FROM real_estate_property WHERE id = $1', listing_id)
+        await conn.execute('''
+            WITH deleted AS (
+                DELETE FROM real_estate_property WHERE id = $1
+                RETURNING user_id
+            )
+            UPDATE real_estate_telegramuser
+            SET properties_count = GREATEST(properties_count - 1, 0)
+            WHERE id IN (SELECT user_id FROM deleted)
+        ''', listing_id)
         
         return [user['telegram_id'] for user in favorite_users]
 
@@ -436,6 +557,12 @@ async def delete_listing(listing_id: int):
 def is_admin(user_id: int) -> bool:
     return user_id in ADMIN_IDS
 
+async def can_manage_listing(listing, user_id: int) -> bool:
+    """Check that user owns the listing or is an admin"""
+    if is_admin(user_id):
+        return True
+    return listing['user_id'] == await get_user_db_id(user_id)
+
 async def get_pending_listings():
     """Get listings pending approval"""
     async with db_pool.acquire() as conn:
@@ -481,61 +608,108 @@ class AdminStates(StatesGroup):
 
 # Media group collector for handling multiple photos
 class MediaGroupCollector:
-    def __init__(self):
-        self.groups = defaultdict(list)
-        self.timers = {}
+    """Adds incoming photos to the listing draft and acknowledges albums
+
+    Every photo is appended to the draft's photo_file_ids as soon as it
+    arrives (atomically, through the FSM storage), so nothing depends on a
+    timer firing. Telegram delivers an album as separate messages; one task
+    per album waits until no part has arrived for an adaptive window
+    (3x the recently observed gap between parts) and sends a single
+    "N photos received" reply. Album counters and the reply claim go
+    through the storage when it is shared (Redis), groups nobody finished
+    are dropped after orphan_ttl seconds.
+    """
+    
+    def __init__(self, min_window: float = 0.3, max_window: float = 1.5, orphan_ttl: int = 60):
+        self.min_window = min_window
+        self.max_window = max_window
+        self.orphan_ttl = orphan_ttl
+        self.gap_estimate = 0.2
+        # media_group_id -> {'message', 'count', 'last_seen', 'task'}
+        self.groups = {}
+        # Fallback serialization for storages without append_to_list
+        self.locks = defaultdict(asyncio.Lock)
+    
+    @property
+    def window(self) -> float:
+        return min(self.max_window, max(self.min_window, self.gap_estimate * 3))
+    
+    async def append_photos(self, state: FSMContext, file_ids: list) -> int:
+        """Append file ids to the draft, return total photos in it"""
+        if hasattr(state.storage, 'append_to_list'):
+            return await state.storage.append_to_list(state.key, 'photo_file_ids', file_ids)
+        
+        async with self.locks[state.key]:
+            data = await state.get_data()
+            photo_file_ids = data.get('photo_file_ids', []) + file_ids
+            await state.update_data(photo_file_ids=photo_file_ids)
+        return len(photo_file_ids)
     
     async def add_message(self, message: Message, state: FSMContext):
+        self.sweep()
+        total = await self.append_photos(state, [message.photo[-1].file_id])
+        
         if not message.media_group_id:
-            return await self.process_single_photo(message, state)
+            user_lang = await get_user_language(message.from_user.id)
+            await message.answer(get_text(user_lang, 'photo_added_count', count=total))
+            return
         
-        self.groups[message.media_group_id].append(message)
+        now = asyncio.get_running_loop().time()
+        group = self.groups.get(message.media_group_id)
+        if group is None:
+            group = self.groups[message.media_group_id] = {
+                'message': message, 'count': 0, 'last_seen': now, 'task': None
+            }
+        else:
+            # Learn how far apart Telegram delivers album parts
+            self.gap_estimate = 0.8 * self.gap_estimate + 0.2 * (now - group['last_seen'])
         
-        if message.media_group_id in self.timers:
-            self.timers[message.media_group_id].cancel()
+        group['last_seen'] = now
+        if hasattr(state.storage, 'increment'):
+            group['count'] = await state.storage.increment(f"album:{message.media_group_id}", self.orphan_ttl)
+        else:
+            group['count'] += 1
         
-        self.timers[message.media_group_id] = create_task(
-            self.process_group_after_delay(message.media_group_id, state)
-        )
+        if group['task'] is None:
+            group['task'] = create_task(self.acknowledge_when_complete(message.media_group_id, state))
     
-    async def process_group_after_delay(self, group_id: str, state: FSMContext):
-        await sleep(1.0)
-        
-        if group_id in self.groups:
-            messages = self.groups[group_id]
-            await self.process_media_group(messages, state)
+    async def acknowledge_when_complete(self, group_id: str, state: FSMContext):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                group = self.groups.get(group_id)
+                if group is None:
+                    return
+                wait = group['last_seen'] + self.window - loop.time()
+                if wait <= 0:
+                    break
+                await sleep(wait)
             
-            del self.groups[group_id]
-            if group_id in self.timers:
-                del self.timers[group_id]
-    
-    async def process_single_photo(self, message: Message, state: FSMContext):
-        user_lang = await get_user_language(message.from_user.id)
-        
-        data = await state.get_data()
-        photo_file_ids = data.get('photo_file_ids', [])
-        photo_file_ids.append(message.photo[-1].file_id)
-        await state.update_data(photo_file_ids=photo_file_ids)
-        
-        await message.answer(
-            get_text(user_lang, 'photo_added_count', count=len(photo_file_ids))
-        )
-    
-    async def process_media_group(self, messages: list, state: FSMContext):
-        user_lang = await get_user_language(messages[0].from_user.id)
-        
-        data = await state.get_data()
-        photo_file_ids = data.get('photo_file_ids', [])
-        
-        for msg in messages:
-            if msg.photo:
-                photo_file_ids.append(msg.photo[-1].file_id)
-        
-        await state.update_data(photo_file_ids=photo_file_ids)
-        
-        await messages[0].answer(
-            get_text(user_lang, 'media_group_received', count=len(messages))
-        )
+            if hasattr(state.storage, 'claim'):
+                # Parts may have reached several workers, only one replies
+                if not await state.storage.claim(f"album:{group_id}", self.orphan_ttl):
+                    return
+            
+            message = group['message']
+            user_lang = await get_user_language(message.from_user.id)
+            await message.answer(get_text(user_lang, 'media_group_received', count=group['count']))
+        except Exception as e:
+            logger.error(f"❌ Media group {group_id} acknowledgement failed: {e}")
+        finally:
+            self.groups.pop(group_id, None)
+    
+    def sweep(self):
+        """Forget groups that stopped receiving parts long ago"""
+        now = asyncio.get_running_loop().time()
+        for group_id, group in list(self.groups.items()):
+            if now - group['last_seen'] > self.orphan_ttl:
+                if group['task'] is not None:
+                    group['task'].cancel()
+                self.groups.pop(group_id, None)
+        
+        for key, lock in list(self.locks.items()):
+            if not lock.locked():
+                del self.locks[key]
 
 # Initialize media collector
 media_collector = MediaGroupCollector()
@@ -919,7 +1093,7 @@ def get_language_keyboard() -> InlineKeyboardMarkup:
 
 def get_regions_keyboard(user_lang: str) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    regions = regions_config.get(user_lang, regions_config['uz'])
+    regions = gazetteer.regions_config.get(user_lang, gazetteer.regions_config['uz'])
     
     for region_key, region_name in regions:
         builder.add(InlineKeyboardButton(
@@ -933,7 +1107,7 @@ def get_regions_keyboard(user_lang: str) -> InlineKeyboardMarkup:
 def get_search_regions_keyboard(user_lang: str) -> InlineKeyboardMarkup:
     """SEPARATE keyboard for search regions to avoid conflicts"""
     builder = InlineKeyboardBuilder()
-    regions = regions_config.get(user_lang, regions_config['uz'])
+    regions = gazetteer.regions_config.get(user_lang, gazetteer.regions_config['uz'])
     
     for region_key, region_name in regions:
         builder.add(InlineKeyboardButton(
@@ -948,7 +1122,7 @@ def get_districts_keyboard(region_key: str, user_lang: str) -> InlineKeyboardMar
     builder = InlineKeyboardBuilder()
     
     try:
-        districts = REGIONS_DATA[user_lang][region_key]['districts']
+        districts = gazetteer.regions_data[user_lang][region_key]['districts']
         
         for district_key, district_name in districts.items():
             builder.add(InlineKeyboardButton(
@@ -978,7 +1152,7 @@ def get_search_districts_keyboard(region_key: str, user_lang: str) -> InlineKeyb
     ))
     
     try:
-        districts = REGIONS_DATA[user_lang][region_key]['districts']
+        districts = gazetteer.regions_data[user_lang][region_key]['districts']
         
         for district_key, district_name in districts.items():
             builder.add(InlineKeyboardButton(
@@ -1020,6 +1194,29 @@ def get_listing_keyboard(listing_id: int, user_lang: str) -> InlineKeyboardMarku
     builder.adjust(2)
     return builder.as_markup()
 
+def get_open_listings_keyboard(listings, user_lang: str, next_cursor: Optional[str] = None) -> InlineKeyboardMarkup:
+    """Numbered buttons opening each listing of a compact result"""
+    builder = InlineKeyboardBuilder()
+    for number, listing in enumerate(listings, 1):
+        builder.button(text=str(number), callback_data=f"open_listing_{listing['id']}")
+    builder.adjust(5)
+    if next_cursor:
+        builder.row(InlineKeyboardButton(text=get_text(user_lang, 'next_page'), callback_data=f"listings_page_{next_cursor}"))
+    return builder.as_markup()
+
+def get_next_page_keyboard(cursor: str, user_lang: str) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.add(InlineKeyboardButton(text=get_text(user_lang, 'next_page'), callback_data=f"listings_page_{cursor}"))
+    return builder.as_markup()
+
+def format_listing_compact_line(number: int, listing) -> str:
+    """One-line listing summary used by compact results"""
+    title = listing['title'] or listing['description'][:50]
+    line = f"<b>{number}.</b> {title}"
+    if listing['price']:
+        line += f" — {listing['price']:,} so'm"
+    return line
+
 def format_my_posting_display(listing, user_lang):
     """Format posting for owner view"""
     location_display = listing['full_address'] if listing['full_address'] else listing['address']
@@ -1523,12 +1720,8 @@ async def admin_channel_show_details(callback_query):
         return
     
     # Get additional stats
+    user_listing_count = listing['user_properties_count']
     async with db_pool.acquire() as conn:
-        user_listing_count = await conn.fetchval(
-            'SELECT COUNT(*) FROM real_estate_property WHERE user_id = $1',
-            listing['user_id']
-        )
-        
         user_approved_count = await conn.fetchval(
             'SELECT COUNT(*) FROM real_estate_property WHERE user_id = $1 AND is_approved = true',
             listing['user_id']
@@ -1574,6 +1767,15 @@ async def admin_channel_show_details(callback_query):
     except Exception as e:
         logger.error(f"Could not send full details: {e}")
 
+async def fetch_listing_totals(conn):
+    """Total/approved/pending listing counts from the rollup table"""
+    return await conn.fetchrow('''
+        SELECT COALESCE(SUM(count), 0) AS total,
+               COALESCE(SUM(count) FILTER (WHERE is_approved), 0) AS approved,
+               COALESCE(SUM(count) FILTER (WHERE NOT is_approved), 0) AS pending
+        FROM real_estate_listingcountrollup
+    ''')
+
 # Also fix the admin stats function:
 @dp.callback_query(F.data == 'admin_stats')
 async def admin_channel_show_stats(callback_query):
@@ -1583,9 +1785,10 @@ async def admin_channel_show_stats(callback_query):
         return
     
     async with db_pool.acquire() as conn:
-        total_listings = await conn.fetchval('SELECT COUNT(*) FROM real_estate_property')
-        pending_listings = await conn.fetchval('SELECT COUNT(*) FROM real_estate_property WHERE is_approved = false')
-        approved_listings = await conn.fetchval('SELECT COUNT(*) FROM real_estate_property WHERE is_approved = true')
+        totals = await fetch_listing_totals(conn)
+        total_listings = totals['total']
+        pending_listings = totals['pending']
+        approved_listings = totals['approved']
         total_users = await conn.fetchval('SELECT COUNT(*) FROM real_estate_telegramuser')
         
         # Today's stats
@@ -1662,6 +1865,21 @@ async def notify_user_approval(user_id: int, approved: bool, feedback: str = Non
     except Exception as e:
         logger.error(f"Error notifying user {user_id}: {e}")
 
+def first_photo(listing) -> Optional[str]:
+    photo_file_ids = json.loads(listing['photo_file_ids']) if listing['photo_file_ids'] else []
+    return photo_file_ids[0] if photo_file_ids else None
+
+async def send_compact_results(chat_id: int, listings, user_lang: str, next_cursor: Optional[str] = None):
+    """Send listings as one album of first photos plus one numbered keyboard"""
+    lines = [format_listing_compact_line(number, listing) for number, listing in enumerate(listings, 1)]
+    text = get_text(user_lang, 'open_listing_prompt') + "\n\n" + "\n".join(lines)
+    entries = [(line, first_photo(listing)) for line, listing in zip(lines, listings)]
+    
+    await delivery.deliver([compact_results_unit(
+        chat_id, entries, text,
+        keyboard=get_open_listings_keyboard(listings, user_lang, next_cursor)
+    )])
+
 async def display_search_results(message_or_callback, listings, user_lang, search_term=""):
     """Display search results to user"""
     
@@ -1683,49 +1901,23 @@ async def display_search_results(message_or_callback, listings, user_lang, searc
     else:
         await message_or_callback.answer(results_text)
     
-    # Display each listing
-    for listing in listings[:5]:
-        listing_text = format_listing_raw_display(listing, user_lang)
-        keyboard = get_listing_keyboard(listing['id'], user_lang)
-        
-        photo_file_ids = json.loads(listing['photo_file_ids']) if listing['photo_file_ids'] else []
-        
-        try:
-            if photo_file_ids:
-                if len(photo_file_ids) == 1:
-                    # Send single photo
-                    if is_callback:
-                        await message_or_callback.message.answer_photo(
-                            photo=photo_file_ids[0],
-                            caption=listing_text,
-                            reply_markup=keyboard
-                        )
-                    else:
-                        await message_or_callback.answer_photo(
-                            photo=photo_file_ids[0],
-                            caption=listing_text,
-                            reply_markup=keyboard
-                        )
-                else:
-                    # Send media group
-                    media_group = MediaGroupBuilder(caption=listing_text)
-                    for photo_id in photo_file_ids[:5]:
-                        media_group.add_photo(media=photo_id)
-                    
-                    if is_callback:
-                        await message_or_callback.message.answer_media_group(media=media_group.build())
-                        await message_or_callback.message.answer("👆 E'lon", reply_markup=keyboard)
-                    else:
-                        await message_or_callback.answer_media_group(media=media_group.build())
-                        await message_or_callback.answer("👆 E'lon", reply_markup=keyboard)
-            else:
-                # No photos, send text only
-                if is_callback:
-                    await message_or_callback.message.answer(listing_text, reply_markup=keyboard)
-                else:
-                    await message_or_callback.answer(listing_text, reply_markup=keyboard)
-        except Exception as e2:
-            logger.error(f"Error in fallback display: {e2}")
+    chat_id = message_or_callback.message.chat.id if is_callback else message_or_callback.chat.id
+    if COMPACT_RESULTS:
+        await send_compact_results(chat_id, listings[:10], user_lang)
+        return
+    
+    # Listings are sent in rank order, each one built while the previous one is being sent
+    units = (
+        listing_unit(
+            chat_id,
+            format_listing_raw_display(listing, user_lang),
+            json.loads(listing['photo_file_ids']) if listing['photo_file_ids'] else [],
+            keyboard=get_listing_keyboard(listing['id'], user_lang),
+            max_photos=5
+        )
+        for listing in listings[:5]
+    )
+    await delivery.deliver(units)
 
 # Handlers
 @dp.message(CommandStart())
@@ -1809,7 +2001,7 @@ async def process_search_region_selection(callback_query, state: FSMContext):
     
     region_key = callback_query.data[14:]  # Remove 'search_region_' prefix
     
-    if region_key not in REGIONS_DATA.get(user_lang, {}):
+    if region_key not in gazetteer.regions_data.get(user_lang, {}):
         await callback_query.answer("Region not found!")
         return
     
@@ -1833,7 +2025,7 @@ async def process_search_all_region(callback_query, state: FSMContext):
     
     # Get region name for display
     try:
-        region_name = REGIONS_DATA[user_lang][region_key]['name']
+        region_name = gazetteer.regions_data[user_lang][region_key]['name']
     except KeyError:
         region_name = "Selected region"
     
@@ -1854,8 +2046,8 @@ async def process_search_district_selection(callback_query, state: FSMContext):
     
     # Get location name for display
     try:
-        region_name = REGIONS_DATA[user_lang][region_key]['name']
-        district_name = REGIONS_DATA[user_lang][region_key]['districts'][district_key]
+        region_name = gazetteer.regions_data[user_lang][region_key]['name']
+        district_name = gazetteer.regions_data[user_lang][region_key]['districts'][district_key]
         location_name = f"{district_name}, {region_name}"
     except KeyError:
         location_name = "Selected location"
@@ -1922,7 +2114,7 @@ async def process_region_selection(callback_query, state: FSMContext):
     
     region_key = callback_query.data[7:]  # Remove 'region_' prefix
     
-    if region_key not in REGIONS_DATA.get(user_lang, {}):
+    if region_key not in gazetteer.regions_data.get(user_lang, {}):
         await callback_query.answer("Region not found!")
         return
     
@@ -1997,8 +2189,8 @@ async def process_area(message: Message, state: FSMContext):
         district_key = data.get('district')
         
         # Get location names
-        region_name = REGIONS_DATA[user_lang][region_key]['name']
-        district_name = REGIONS_DATA[user_lang][region_key]['districts'][district_key]
+        region_name = gazetteer.regions_data[user_lang][region_key]['name']
+        district_name = gazetteer.regions_data[user_lang][region_key]['districts'][district_key]
         location = f"{district_name}, {region_name}"
         
         # Get personalized template
@@ -2095,8 +2287,8 @@ async def finish_listing(callback_query, state: FSMContext):
     
     if region_key and district_key:
         try:
-            region_name = REGIONS_DATA[user_lang][region_key]['name']
-            district_name = REGIONS_DATA[user_lang][region_key]['districts'][district_key]
+            region_name = gazetteer.regions_data[user_lang][region_key]['name']
+            district_name = gazetteer.regions_data[user_lang][region_key]['districts'][district_key]
             full_address = f"{district_name}, {region_name}"
             data['full_address'] = full_address
             data['address'] = full_address
@@ -2172,45 +2364,72 @@ async def finish_listing(callback_query, state: FSMContext):
 @dp.message(F.text.in_(['👀 E\'lonlar', '👀 Объявления', '👀 Listings']))
 async def view_listings_handler(message: Message):
     user_lang = await get_user_language(message.from_user.id)
-    listings = await get_listings(limit=5)
+    await send_listings_page(message, user_lang)
+
+@dp.callback_query(F.data.startswith('listings_page_'))
+async def listings_page_callback(callback_query):
+    user_lang = await get_user_language(callback_query.from_user.id)
+    cursor = callback_query.data[len('listings_page_'):]
+    
+    # Drop the button so the same page can't be requested twice
+    try:
+        await callback_query.message.edit_reply_markup(reply_markup=None)
+    except Exception:
+        pass
+    
+    await send_listings_page(callback_query.message, user_lang, cursor)
+    await callback_query.answer()
+
+async def send_listings_page(message: Message, user_lang: str, cursor: Optional[str] = None):
+    """Send one page of approved listings followed by a next page button"""
+    rows = await get_listings(limit=LISTINGS_PAGE_SIZE + 1, cursor=cursor)
+    listings = rows[:LISTINGS_PAGE_SIZE]
     
     if not listings:
-        await message.answer(get_text(user_lang, 'no_listings'))
+        await message.answer(get_text(user_lang, 'no_more_listings' if cursor else 'no_listings'))
         return
     
-    for listing in listings:
-        # Use raw display instead of template
-        listing_text = format_listing_raw_display(listing, user_lang)
-        keyboard = get_listing_keyboard(listing['id'], user_lang)
-        
-        photo_file_ids = json.loads(listing['photo_file_ids']) if listing['photo_file_ids'] else []
-        
-        if photo_file_ids:
-            try:
-                if len(photo_file_ids) == 1:
-                    await message.answer_photo(
-                        photo=photo_file_ids[0],
-                        caption=listing_text,
-                        reply_markup=keyboard
-                    )
-                else:
-                    # For multiple photos, show user content as caption on first photo
-                    media_group = MediaGroupBuilder(caption=listing_text)
-                    for i, photo_id in enumerate(photo_file_ids[:10]):
-                        if i == 0:
-                            media_group.add_photo(media=photo_id)
-                        else:
-                            media_group.add_photo(media=photo_id)
-                    
-                    await message.answer_media_group(media=media_group.build())
-                    # Send keyboard separately for media groups
-                    await message.answer("👆 E'lon", reply_markup=keyboard)
-                    
-            except Exception as e:
-                # Fallback to text if photo fails
-                await message.answer(listing_text, reply_markup=keyboard)
-        else:
-            await message.answer(listing_text, reply_markup=keyboard)
+    next_cursor = encode_listing_cursor(listings[-1]) if len(rows) > LISTINGS_PAGE_SIZE else None
+    if COMPACT_RESULTS:
+        # The next page button rides on the compact keyboard message
+        await send_compact_results(message.chat.id, listings, user_lang, next_cursor)
+        return
+    
+    units = (
+        listing_unit(
+            message.chat.id,
+            format_listing_raw_display(listing, user_lang),
+            json.loads(listing['photo_file_ids']) if listing['photo_file_ids'] else [],
+            keyboard=get_listing_keyboard(listing['id'], user_lang)
+        )
+        for listing in listings
+    )
+    await delivery.deliver(units)
+    
+    if next_cursor:
+        await message.answer(
+            get_text(user_lang, 'more_listings'),
+            reply_markup=get_next_page_keyboard(next_cursor, user_lang)
+        )
+
+@dp.callback_query(F.data.startswith('open_listing_'))
+async def open_listing_callback(callback_query):
+    """Send the full gallery of a listing picked from compact results"""
+    listing_id = int(callback_query.data[len('open_listing_'):])
+    user_lang = await get_user_language(callback_query.from_user.id)
+    
+    listing = await get_listing_by_id(listing_id)
+    if not listing or not listing['is_approved'] or not listing['is_active']:
+        await callback_query.answer(get_text(user_lang, 'posting_no_longer_available'), show_alert=True)
+        return
+    
+    await callback_query.answer()
+    await delivery.deliver([listing_unit(
+        callback_query.message.chat.id,
+        format_listing_raw_display(listing, user_lang),
+        json.loads(listing['photo_file_ids']) if listing['photo_file_ids'] else [],
+        keyboard=get_listing_keyboard(listing['id'], user_lang)
+    )])
 
 @dp.callback_query(F.data.startswith('fav_add_'))
 async def add_favorite_callback(callback_query):
@@ -2249,28 +2468,20 @@ async def favorites_handler(message: Message):
     
     await message.answer(f"❤️ Sevimli e'lonlar: {len(favorites)} ta")
     
-    for favorite in favorites[:5]:
-        # Use raw display instead of template
-        listing_text = format_listing_raw_display(favorite, user_lang)
-        
-        photo_file_ids = json.loads(favorite['photo_file_ids']) if favorite['photo_file_ids'] else []
-        if photo_file_ids:
-            try:
-                if len(photo_file_ids) == 1:
-                    await message.answer_photo(
-                        photo=photo_file_ids[0],
-                        caption=listing_text
-                    )
-                else:
-                    media_group = MediaGroupBuilder(caption=listing_text)
-                    for photo_id in photo_file_ids[:5]:
-                        media_group.add_photo(media=photo_id)
-                    
-                    await message.answer_media_group(media=media_group.build())
-            except:
-                await message.answer(listing_text)
-        else:
-            await message.answer(listing_text)
+    if COMPACT_RESULTS:
+        await send_compact_results(message.chat.id, favorites[:10], user_lang)
+        return
+    
+    units = (
+        listing_unit(
+            message.chat.id,
+            format_listing_raw_display(favorite, user_lang),
+            json.loads(favorite['photo_file_ids']) if favorite['photo_file_ids'] else [],
+            max_photos=5
+        )
+        for favorite in favorites[:5]
+    )
+    await delivery.deliver(units)
 
 @dp.message(F.text.in_(['ℹ️ Ma\'lumot', 'ℹ️ Информация', 'ℹ️ Info']))
 async def info_handler(message: Message):
@@ -2322,14 +2533,7 @@ async def activate_posting(callback_query):
         await callback_query.answer("⛔ E'lon topilmadi!")
         return
     
-    # Get user database ID for ownership check
-    async with db_pool.acquire() as conn:
-        user_db_id = await conn.fetchval(
-            'SELECT id FROM real_estate_telegramuser WHERE telegram_id = $1',
-            callback_query.from_user.id
-        )
-    
-    if listing['user_id'] != user_db_id and not is_admin(callback_query.from_user.id):
+    if not await can_manage_listing(listing, callback_query.from_user.id):
         await callback_query.answer("⛔ Ruxsat yo'q!")
         return
     
@@ -2354,14 +2558,7 @@ async def deactivate_posting(callback_query):
         await callback_query.answer("⛔ E'lon topilmadi!")
         return
     
-    # Get user database ID for ownership check
-    async with db_pool.acquire() as conn:
-        user_db_id = await conn.fetchval(
-            'SELECT id FROM real_estate_telegramuser WHERE telegram_id = $1',
-            callback_query.from_user.id
-        )
-    
-    if listing['user_id'] != user_db_id and not is_admin(callback_query.from_user.id):
+    if not await can_manage_listing(listing, callback_query.from_user.id):
         await callback_query.answer("⛔ Ruxsat yo'q!")
         return
     
@@ -2386,14 +2583,7 @@ async def confirm_delete_posting(callback_query):
         await callback_query.answer("⛔ E'lon topilmadi!")
         return
     
-    # Get user database ID for ownership check
-    async with db_pool.acquire() as conn:
-        user_db_id = await conn.fetchval(
-            'SELECT id FROM real_estate_telegramuser WHERE telegram_id = $1',
-            callback_query.from_user.id
-        )
-    
-    if listing['user_id'] != user_db_id and not is_admin(callback_query.from_user.id):
+    if not await can_manage_listing(listing, callback_query.from_user.id):
         await callback_query.answer("⛔ Ruxsat yo'q!")
         return
     
@@ -2426,14 +2616,7 @@ async def delete_posting_confirmed(callback_query):
         await callback_query.answer("⛔ E'lon topilmadi!")
         return
     
-    # Get user database ID for ownership check
-    async with db_pool.acquire() as conn:
-        user_db_id = await conn.fetchval(
-            'SELECT id FROM real_estate_telegramuser WHERE telegram_id = $1',
-            callback_query.from_user.id
-        )
-    
-    if listing['user_id'] != user_db_id and not is_admin(callback_query.from_user.id):
+    if not await can_manage_listing(listing, callback_query.from_user.id):
         await callback_query.answer("⛔ Ruxsat yo'q!")
         return
     
@@ -2603,11 +2786,10 @@ async def debug_handler(message: Message):
     try:
         async with db_pool.acquire() as conn:
             # Check total listings
-            total_count = await conn.fetchval('SELECT COUNT(*) FROM real_estate_property')
-            approved_count = await conn.fetchval('SELECT COUNT(*) FROM real_estate_property WHERE is_approved = true')
-            pending_count = await conn.fetchval('SELECT COUNT(*) FROM real_estate_property WHERE is_approved = false')
-            
-            status_counts = await conn.fetch('SELECT is_approved, COUNT(*) FROM real_estate_property GROUP BY is_approved')
+            totals = await fetch_listing_totals(conn)
+            total_count = totals['total']
+            approved_count = totals['approved']
+            pending_count = totals['pending']
         
         debug_text = f"""📊 Database Debug:
         
@@ -2615,8 +2797,8 @@ Total listings: {total_count}
 Approved: {approved_count}
 Pending: {pending_count}
 
-Status breakdown:
-{chr(10).join([f"- {'Approved' if status[0] else 'Pending'}: {status[1]}" for status in status_counts])}
+User cache: {user_cache.stats()}
+Delivery: {delivery.stats()}
 
 Search test:"""
         
@@ -2682,11 +2864,9 @@ async def error_handler(event):
     
     return True
 
-async def main():
-    """Main bot function with proper initialization"""
-    global db_pool
-    
-    logger.info("🤖 Starting Real Estate Bot...")
+async def startup() -> bool:
+    """Check configuration, connect to the database and start FSM storage"""
+    global db_pool, gazetteer_task
     
     # Check environment variables
     required_vars = ['BOT_TOKEN', 'DB_NAME', 'DB_USER', 'DB_PASSWORD']
@@ -2695,7 +2875,7 @@ async def main():
     if missing_vars:
         logger.error(f"❌ Missing environment variables: {missing_vars}")
         logger.error("Please check your .env file")
-        return
+        return False
     
     # Initialize database pool
     logger.info("🔌 Connecting to database...")
@@ -2703,7 +2883,7 @@ async def main():
         logger.error("❌ Failed to initialize database pool")
         logger.error("Please ensure PostgreSQL is running and Django migrations are applied")
         logger.error("Run: cd backend && python manage.py migrate")
-        return
+        return False
     
     # Test database connection
     try:
@@ -2724,13 +2904,40 @@ async def main():
                 logger.error("   python manage.py migrate")
                 logger.error("   python manage.py populate_regions")
                 await close_db_pool()
-                return
+                return False
             
             logger.info("✅ Database connection successful")
             
     except Exception as e:
         logger.error(f"❌ Database test failed: {e}")
         await close_db_pool()
+        return False
+    
+    if isinstance(storage, PostgresStorage):
+        await storage.start(db_pool)
+    logger.info(f"💾 FSM storage: {type(storage).__name__}")
+
+    try:
+        await gazetteer.refresh(db_pool)
+    except Exception as e:
+        logger.error(f"❌ Gazetteer load failed, using bundled regions: {e}")
+    gazetteer_task = create_task(gazetteer.refresh_loop(db_pool, GAZETTEER_CHECK_INTERVAL))
+    return True
+
+async def shutdown():
+    """Flush FSM storage and close connections"""
+    logger.info("🔌 Closing connections...")
+    if gazetteer_task is not None:
+        gazetteer_task.cancel()
+    await storage.close()
+    await bot.session.close()
+    await close_db_pool()
+
+async def main():
+    """Main bot function with proper initialization (long polling)"""
+    logger.info("🤖 Starting Real Estate Bot...")
+    
+    if not await startup():
         return
     
     logger.info("🚀 Starting bot polling...")
@@ -2741,9 +2948,7 @@ async def main():
     except Exception as e:
         logger.error(f"❌ Bot error: {e}")
     finally:
-        logger.info("🔌 Closing connections...")
-        await bot.session.close()
-        await close_db_pool()
+        await shutdown()
         logger.info("👋 Bot stopped")
 
 if __name__ == "__main__":
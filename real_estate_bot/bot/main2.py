@@ -14,7 +14,6 @@ from aiogram.types import (
 from aiogram.utils.keyboard import ReplyKeyboardBuilder, InlineKeyboardBuilder
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.utils.media_group import MediaGroupBuilder
 import os
 from datetime import datetime
@@ -25,6 +24,7 @@ from collections import defaultdict
 from asyncio import create_task, sleep
 from utils.translations import REGIONS_DATA, TRANSLATIONS, regions_config
 from utils.templates import get_listing_template
+from utils.fsm_storage import create_fsm_storage, PostgresStorage
 
 # Load environment variables
 load_dotenv()
@@ -53,7 +53,7 @@ if ADMIN_CHANNEL_ID == '@your_admin_channel':
 
 # Initialize bot and dispatcher
 bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-storage = MemoryStorage()
+storage = create_fsm_storage()
 dp = Dispatcher(storage=storage)
 
 # Database migration function
@@ -2269,6 +2269,10 @@ async def error_handler(event, exception):
     return True
 
 async def main():
+    if isinstance(storage, PostgresStorage):
+        logger.error("❌ FSM_STORAGE=postgres needs the PostgreSQL bot (main.py), use memory or redis")
+        return
+    
     # Run database migration first
     migrate_database()
     
@@ -2290,6 +2294,7 @@ async def main():
     except Exception as e:
         logger.error(f"Bot error: {e}")
     finally:
+        await storage.close()
         await bot.session.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+from aiogram.methods import SendMediaGroup, SendMessage, SendPhoto
+from aiogram.methods.base import TelegramMethod
+from aiogram.utils.media_group import MediaGroupBuilder
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    @property
+    def is_full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+    async def acquire(self, cost: float = 1):
+        cost = min(cost, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return
+                await asyncio.sleep((cost - self.tokens) / self.rate)
+
+
+class DeliveryUnit:
+    """Telegram calls that show one item, sent strictly in order
+
+    Calls after the first reply to the first sent message, so a keyboard
+    sent after a media group stays visibly attached to it. `fallback` is
+    sent if the first call fails
+    (e.g. an expired photo file_id).
+    """
+
+    def __init__(self, steps: List[TelegramMethod], fallback: Optional[TelegramMethod] = None):
+        self.steps = steps
+        self.fallback = fallback
+
+
+def listing_unit(chat_id: int, text: str, photo_file_ids: List[str],
+                 keyboard=None, max_photos: int = 10,
+                 keyboard_text: str = "👆 E'lon") -> DeliveryUnit:
+    """Prepare the calls that display one listing"""
+    text_only = SendMessage(chat_id=chat_id, text=text, reply_markup=keyboard)
+
+    if not photo_file_ids:
+        return DeliveryUnit([text_only])
+
+    if len(photo_file_ids) == 1:
+        return DeliveryUnit(
+            [SendPhoto(chat_id=chat_id, photo=photo_file_ids[0], caption=text, reply_markup=keyboard)],
+            fallback=text_only
+        )
+
+    # Media groups can't carry a keyboard, it goes in a follow-up message
+    media_group = MediaGroupBuilder(caption=text)
+    for photo_id in photo_file_ids[:max_photos]:
+        media_group.add_photo(media=photo_id)
+
+    steps = [SendMediaGroup(chat_id=chat_id, media=media_group.build())]
+    if keyboard:
+        steps.append(SendMessage(chat_id=chat_id, text=keyboard_text, reply_markup=keyboard))
+    return DeliveryUnit(steps, fallback=text_only)
+
+
+class DeliveryPipeline:
+    """Sends prepared DeliveryUnits within Telegram flood limits
+
+    Units for the same chat are sent one after another in the given (rank)
+    order; up to `concurrency` chats are served in parallel per deliver()
+    call. Units are taken from the iterable as they are needed, so building
+    the next one overlaps the calls of the previous one in flight.
+
+    Every call, a media group included, takes one token from a global bucket
+    (Telegram allows ~30 requests/s per bot) and one from a per-chat bucket.
+    The per-chat bucket only smooths sustained sending to ~1 message/s; its
+    burst covers a few pages of results so a search is never held back by
+    it. TelegramRetryAfter is honoured and the call retried.
+    """
+
+    def __init__(self, bot: Bot, concurrency: int = 4, global_rate: float = 25.0,
+                 chat_rate: float = 1.0, chat_burst: float = 30.0, max_retries: int = 3):
+        self.bot = bot
+        self.concurrency = concurrency
+        self.global_rate = global_rate
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self.retries = 0
+        self.failures = 0
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) > 10000:
+                # Full buckets carry no state worth keeping
+                self._chat_buckets = {
+                    key: value for key, value in self._chat_buckets.items() if not value.is_full
+                }
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def call(self, method: TelegramMethod):
+        """Send one prepared method respecting rate limits and RetryAfter"""
+        for attempt in range(self.max_retries + 1):
+            await self.global_bucket.acquire()
+            await self._chat_bucket(method.chat_id).acquire()
+            try:
+                return await self.bot(method)
+            except TelegramRetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                logger.warning(f"⏳ Flood control for chat {method.chat_id}, retrying in {e.retry_after}s")
+                await asyncio.sleep(e.retry_after)
+
+    async def _send_unit(self, unit: DeliveryUnit) -> bool:
+        first_message = None
+        for index, method in enumerate(unit.steps):
+            if first_message is not None:
+                method.reply_to_message_id = first_message.message_id
+            try:
+                result = await self.call(method)
+            except TelegramAPIError as e:
+                self.failures += 1
+                logger.error(f"❌ Delivery failed: {e}")
+                if index == 0 and unit.fallback is not None:
+                    try:
+                        await self.call(unit.fallback)
+                        return True
+                    except TelegramAPIError as e2:
+                        logger.error(f"❌ Delivery fallback failed: {e2}")
+                return False
+
+            if index == 0:
+                first_message = result[0] if isinstance(result, list) else result
+        return True
+
+    async def _send_chat(self, queue: asyncio.Queue, semaphore: asyncio.Semaphore) -> int:
+        # Telegram shows messages in arrival order, so one chat is never sent to concurrently
+        async with semaphore:
+            delivered = 0
+            while True:
+                unit = await queue.get()
+                if unit is None:
+                    return delivered
+                delivered += await self._send_unit(unit)
+
+    async def deliver(self, units: Iterable[DeliveryUnit]) -> int:
+        """Send units in order per chat, chats concurrently; return how many were delivered"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        queues: Dict[int, asyncio.Queue] = {}
+        senders = []
+        try:
+            for unit in units:
+                chat_id = unit.steps[0].chat_id
+                queue = queues.get(chat_id)
+                if queue is None:
+                    queue = queues[chat_id] = asyncio.Queue()
+                    senders.append(asyncio.create_task(self._send_chat(queue, semaphore)))
+                queue.put_nowait(unit)
+                # Let the sender start on this unit before the next one is built
+                await asyncio.sleep(0)
+        finally:
+            for queue in queues.values():
+                queue.put_nowait(None)
+        results = await asyncio.gather(*senders)
+        return sum(results)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'chats_tracked': len(self._chat_buckets),
+            'retries': self.retries,
+            'failures': self.failures,
+        }
+
+
+def compact_results_unit(chat_id: int, entries: List[tuple], text: str, keyboard=None) -> DeliveryUnit:
+    """Prepare the calls that show several listings at once
+
+    entries are (caption, first_photo_file_id or None) per listing. The first
+    photos go out as one album with numbered captions, followed by a single
+    message with `text` and `keyboard`: two calls however many listings.
+    """
+    text_only = SendMessage(chat_id=chat_id, text=text, reply_markup=keyboard)
+    photos = [(caption, photo) for caption, photo in entries if photo][:10]
+
+    # An album needs at least two items
+    if len(photos) < 2:
+        return DeliveryUnit([text_only])
+
+    media_group = MediaGroupBuilder()
+    for caption, photo in photos:
+        media_group.add_photo(media=photo, caption=caption)
+
+    return DeliveryUnit(
+        [SendMediaGroup(chat_id=chat_id, media=media_group.build()), text_only],
+        fallback=text_only
+    )
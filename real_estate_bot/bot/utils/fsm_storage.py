@@ -0,0 +1,207 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+logger = logging.getLogger(__name__)
+
+
+def storage_key_to_str(key: StorageKey) -> str:
+    parts = [
+        key.bot_id, key.chat_id, key.user_id,
+        key.thread_id or '', getattr(key, 'business_connection_id', None) or '', key.destiny
+    ]
+    return ':'.join(str(part) for part in parts)
+
+
+class PostgresStorage(BaseStorage):
+    """FSM storage in real_estate_botstate (backend model BotState)
+
+    Reads are served from a per-process cache (`cache_ttl` seconds) and
+    writes are buffered and flushed in one statement every `flush_interval`
+    seconds, so a multi-step form costs a handful of queries instead of one
+    per update. Rows untouched for `state_ttl` seconds (abandoned drafts)
+    are deleted by the same background task.
+
+    Each chat must be served by one process at a time (polling, or webhook
+    workers routed by chat id), otherwise cached entries can go stale
+    within `cache_ttl`.
+    """
+
+    def __init__(self, flush_interval: float = 1.0, cache_ttl: float = 60.0,
+                 state_ttl: float = 7 * 24 * 3600, cleanup_interval: float = 3600):
+        self.flush_interval = flush_interval
+        self.cache_ttl = cache_ttl
+        self.state_ttl = state_ttl
+        self.cleanup_interval = cleanup_interval
+        self.pool = None
+        # key -> (expires_at, state, data)
+        self._cache: Dict[str, tuple] = {}
+        self._dirty: set = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._last_cleanup = 0.0
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def start(self, pool):
+        """Attach the asyncpg pool and start the background flush task"""
+        self.pool = pool
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _load(self, key: str) -> tuple:
+        entry = self._cache.get(key)
+        if entry is not None and (key in self._dirty or entry[0] > time.monotonic()):
+            return entry[1], entry[2]
+
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(
+                'SELECT state, data FROM real_estate_botstate WHERE key = $1', key
+            )
+
+        state, data = (row['state'], json.loads(row['data'])) if row else (None, {})
+        self._cache[key] = (time.monotonic() + self.cache_ttl, state, data)
+        return state, data
+
+    def _store(self, key: str, state: Optional[str], data: Dict[str, Any]):
+        self._cache[key] = (time.monotonic() + self.cache_ttl, state, data)
+        self._dirty.add(key)
+
+    def _lock(self, key: str) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        key = storage_key_to_str(key)
+        async with self._lock(key):
+            _, data = await self._load(key)
+            self._store(key, state.state if isinstance(state, State) else state, data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._load(storage_key_to_str(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        key = storage_key_to_str(key)
+        async with self._lock(key):
+            state, _ = await self._load(key)
+            self._store(key, state, data.copy())
+
+    async def append_to_list(self, key: StorageKey, field: str, values: list) -> int:
+        """Append values to data[field] without a lost update, return new length"""
+        key = storage_key_to_str(key)
+        async with self._lock(key):
+            state, data = await self._load(key)
+            items = list(data.get(field, [])) + list(values)
+            self._store(key, state, {**data, field: items})
+        return len(items)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._load(storage_key_to_str(key))
+        return data.copy()
+
+    async def flush(self):
+        """Write buffered changes in one round trip"""
+        if not self._dirty or self.pool is None:
+            return
+
+        keys, self._dirty = self._dirty, set()
+        upserts, deletes = [], []
+        for key in keys:
+            _, state, data = self._cache[key]
+            if state is None and not data:
+                deletes.append(key)
+            else:
+                upserts.append((key, state, json.dumps(data)))
+
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    if deletes:
+                        await conn.execute(
+                            'DELETE FROM real_estate_botstate WHERE key = ANY($1::text[])', deletes
+                        )
+                    if upserts:
+                        await conn.execute('''
+                            INSERT INTO real_estate_botstate (key, state, data, updated_at)
+                            SELECT k, s, d::jsonb, NOW()
+                            FROM unnest($1::text[], $2::text[], $3::text[]) AS t(k, s, d)
+                            ON CONFLICT (key) DO UPDATE SET
+                                state = EXCLUDED.state,
+                                data = EXCLUDED.data,
+                                updated_at = EXCLUDED.updated_at
+                        ''', *map(list, zip(*upserts)))
+        except Exception as e:
+            # Keep the changes for the next attempt unless overwritten meanwhile
+            self._dirty |= keys
+            logger.error(f"❌ FSM storage flush failed: {e}")
+
+    async def cleanup(self):
+        """Delete drafts nobody touched for state_ttl seconds"""
+        async with self.pool.acquire() as conn:
+            result = await conn.execute(
+                "DELETE FROM real_estate_botstate WHERE updated_at < NOW() - make_interval(secs => $1)",
+                float(self.state_ttl)
+            )
+        self._last_cleanup = time.monotonic()
+        logger.info(f"🧹 FSM storage cleanup: {result}")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+            now = time.monotonic()
+            if now - self._last_cleanup > self.cleanup_interval:
+                try:
+                    await self.cleanup()
+                except Exception as e:
+                    logger.error(f"❌ FSM storage cleanup failed: {e}")
+
+            # Drop expired clean entries so the cache doesn't grow forever
+            self._cache = {
+                key: entry for key, entry in self._cache.items()
+                if key in self._dirty or entry[0] > now
+            }
+            self._locks = {key: lock for key, lock in self._locks.items() if lock.locked()}
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+
+def create_fsm_storage(backend: Optional[str] = None) -> BaseStorage:
+    """Build FSM storage selected by FSM_STORAGE (memory, postgres, redis)
+
+    PostgresStorage needs `await storage.start(db_pool)` once the pool exists.
+    """
+    backend = (backend or os.getenv('FSM_STORAGE', 'memory')).lower()
+    state_ttl = int(os.getenv('FSM_STATE_TTL', str(7 * 24 * 3600)))
+
+    if backend == 'postgres':
+        return PostgresStorage(
+            flush_interval=float(os.getenv('FSM_FLUSH_INTERVAL', '1')),
+            state_ttl=state_ttl
+        )
+
+    if backend == 'redis':
+        # Optional dependency: pip install redis
+        from utils.redis_storage import RedisDraftStorage
+        return RedisDraftStorage.from_url(
+            os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
+            state_ttl=state_ttl,
+            data_ttl=state_ttl
+        )
+
+    if backend != 'memory':
+        logger.warning(f"⚠️ Unknown FSM_STORAGE '{backend}', using memory")
+    return MemoryStorage()
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from utils.helpers import build_location_aliases
+
+logger = logging.getLogger(__name__)
+
+LANGUAGES = ('uz', 'ru', 'en')
+
+
+def region_emojis(regions_config) -> Dict[str, str]:
+    """Button emoji per region key taken from the bundled regions_config"""
+    emojis = {}
+    for region_key, label in regions_config.get('uz', []):
+        prefix, _, _ = label.partition(' ')
+        if prefix and not prefix[0].isalnum():
+            emojis[region_key] = prefix
+    return emojis
+
+
+class BotGazetteer:
+    """Region/district names shared with the backend
+
+    Mirrors the Region/District tables the Django gazetteer serves
+    (backend real_estate/gazetteer.py) in the shapes the handlers already use:
+    `regions_data[lang][region_key]` and `regions_config[lang]`. Lookups are
+    plain dict reads; refresh() reloads the tables only when the version in
+    real_estate_referencedataversion ('gazetteer') changed, which Region and
+    District saves bump. Until the tables are loaded (or if they are empty)
+    the bundled REGIONS_DATA/regions_config are served.
+    """
+
+    VERSION_NAME = 'gazetteer'
+
+    def __init__(self, regions_data, regions_config):
+        self.version: Optional[int] = None
+        self.emojis = region_emojis(regions_config)
+        self._set(regions_data, regions_config)
+
+    def _set(self, regions_data, regions_config):
+        self.regions_data = regions_data
+        self.regions_config = regions_config
+        self.location_aliases = build_location_aliases(regions_data)
+
+    def name(self, region_key: str, district_key: Optional[str] = None, lang: str = 'uz') -> Optional[str]:
+        region = self.regions_data.get(lang, {}).get(region_key)
+        if region is None:
+            return None
+        if district_key is None:
+            return region['name']
+        return region['districts'].get(district_key)
+
+    def location_display(self, region_key: str, district_key: str, lang: str = 'uz') -> Optional[str]:
+        """'District, Region' or None when the pair is unknown"""
+        district_name = self.name(region_key, district_key, lang)
+        if not district_name:
+            return None
+        return f"{district_name}, {self.name(region_key, None, lang)}"
+
+    async def refresh(self, pool) -> bool:
+        """Reload from the database if the version changed, return True if reloaded"""
+        async with pool.acquire() as conn:
+            version = await conn.fetchval(
+                'SELECT version FROM real_estate_referencedataversion WHERE name = $1',
+                self.VERSION_NAME
+            ) or 0
+            if version == self.version:
+                return False
+
+            regions = await conn.fetch('''
+                SELECT id, key, name_uz, name_ru, name_en
+                FROM real_estate_region
+                WHERE is_active = true
+                ORDER BY "order", name_uz
+            ''')
+            districts = await conn.fetch('''
+                SELECT region_id, key, name_uz, name_ru, name_en
+                FROM real_estate_district
+                WHERE is_active = true
+                ORDER BY "order", name_uz
+            ''')
+
+        self.version = version
+        if not regions:
+            logger.warning("⚠️ No regions in database, using bundled region list")
+            return False
+
+        regions_data = {lang: {} for lang in LANGUAGES}
+        regions_config = {lang: [] for lang in LANGUAGES}
+        keys_by_id = {}
+        for region in regions:
+            keys_by_id[region['id']] = region['key']
+            emoji = self.emojis.get(region['key'], '📍')
+            for lang in LANGUAGES:
+                name = region[f'name_{lang}'] or region['name_uz']
+                regions_data[lang][region['key']] = {'name': name, 'districts': {}}
+                regions_config[lang].append((region['key'], f"{emoji} {name}"))
+
+        for district in districts:
+            region_key = keys_by_id.get(district['region_id'])
+            if region_key is None:
+                continue  # district of an inactive region
+            for lang in LANGUAGES:
+                name = district[f'name_{lang}'] or district['name_uz']
+                regions_data[lang][region_key]['districts'][district['key']] = name
+
+        # Swap whole dicts so handlers never see a half-built snapshot
+        self._set(regions_data, regions_config)
+        logger.info(f"🗺 Gazetteer loaded: {len(regions)} regions, {len(districts)} districts (v{version})")
+        return True
+
+    async def refresh_loop(self, pool, interval: float = 30.0):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh(pool)
+            except Exception as e:
+                logger.error(f"❌ Gazetteer refresh failed: {e}")
@@ -0,0 +1,18 @@
+def build_location_aliases(regions_data):
+    """Flatten REGIONS_DATA into parallel arrays for fuzzy location matching
+
+    Returns (region_keys, district_keys, names) with one entry per name in
+    every language; district_key is '' for region names. The arrays are
+    passed to PostgreSQL as text[] and folded there by real_estate_location_alias().
+    """
+    region_keys, district_keys, names = [], [], []
+    for regions in regions_data.values():
+        for region_key, region in regions.items():
+            region_keys.append(region_key)
+            district_keys.append('')
+            names.append(region['name'])
+            for district_key, district_name in region['districts'].items():
+                region_keys.append(region_key)
+                district_keys.append(district_key)
+                names.append(district_name)
+    return region_keys, district_keys, names
@@ -0,0 +1,43 @@
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.redis import RedisStorage
+from redis.exceptions import WatchError
+
+
+class RedisDraftStorage(RedisStorage):
+    """RedisStorage with the atomic helpers used for photo albums
+
+    Safe with any number of bot processes: appends use an optimistic
+    WATCH/MULTI transaction, album counters and claims live in Redis.
+    """
+
+    async def append_to_list(self, key: StorageKey, field: str, values: list) -> int:
+        """Append values to data[field] without a lost update, return new length"""
+        redis_key = self.key_builder.build(key, 'data')
+        async with self.redis.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(redis_key)
+                    raw = await pipe.get(redis_key)
+                    data = self.json_loads(raw) if raw else {}
+                    items = list(data.get(field, [])) + list(values)
+                    data[field] = items
+
+                    pipe.multi()
+                    pipe.set(redis_key, self.json_dumps(data), ex=self.data_ttl)
+                    await pipe.execute()
+                    return len(items)
+                except WatchError:
+                    # Someone else wrote the draft in between, retry on fresh data
+                    continue
+
+    async def increment(self, name: str, ttl: int) -> int:
+        """Shared counter that expires ttl seconds after its last increment"""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.incr(f'fsm_aux:{name}')
+            pipe.expire(f'fsm_aux:{name}', ttl)
+            value, _ = await pipe.execute()
+        return value
+
+    async def claim(self, name: str, ttl: int) -> bool:
+        """True for the first caller only (per ttl window)"""
+        return bool(await self.redis.set(f'fsm_aux:{name}:claim', 1, nx=True, ex=ttl))
@@ -887,6 +887,10 @@ TRANSLATIONS = {
         'photos_done': "✅ Tayyor",
         'listing_created': "🎉 E'lon muvaffaqiyatli yaratildi!",
         'no_listings': "😔 Hozircha e'lonlar yo'q",
+        'more_listings': "👇 Yana e'lonlarni ko'rish uchun bosing",
+        'open_listing_prompt': "👇 Batafsil ko'rish uchun e'lon raqamini tanlang:",
+        'next_page': "➡️ Keyingi sahifa",
+        'no_more_listings': "✅ Boshqa e'lonlar yo'q",
         'added_to_favorites': "❤️ Sevimlilar ro'yxatiga qo'shildi!",
         'removed_from_favorites': "💔 Sevimlilardan o'chirildi!",
         'no_favorites': "😔 Sevimlilar ro'yxati bo'sh",
@@ -983,6 +987,10 @@ TRANSLATIONS = {
         'photos_done': "✅ Готово",
         'listing_created': "🎉 Объявление успешно создано!",
         'no_listings': "😔 Объявлений пока нет",
+        'more_listings': "👇 Нажмите, чтобы посмотреть ещё объявления",
+        'open_listing_prompt': "👇 Выберите номер объявления, чтобы открыть его:",
+        'next_page': "➡️ Следующая страница",
+        'no_more_listings': "✅ Больше объявлений нет",
         'added_to_favorites': "❤️ Добавлено в избранное!",
         'removed_from_favorites': "💔 Удалено из избранного!",
         'no_favorites': "😔 Список избранного пуст",
@@ -1079,6 +1087,10 @@ TRANSLATIONS = {
         'photos_done': "✅ Done",
         'listing_created': "🎉 Listing created successfully!",
         'no_listings': "😔 No listings yet",
+        'more_listings': "👇 Tap to see more listings",
+        'open_listing_prompt': "👇 Choose a listing number to open it:",
+        'next_page': "➡️ Next page",
+        'no_more_listings': "✅ No more listings",
         'added_to_favorites': "❤️ Added to favorites!",
         'removed_from_favorites': "💔 Removed from favorites!",
         'no_favorites': "😔 Favorites list is empty",
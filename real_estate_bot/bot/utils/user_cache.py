@@ -0,0 +1,69 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+
+class UserProfileCache:
+    """Bounded LRU cache of user profiles with per-entry TTL
+
+    Holds the fields the bot needs on almost every update (language,
+    internal database id, blocked/premium flags) so handlers don't have to
+    acquire a pool connection just to pick a translation.
+    """
+
+    FIELDS = ('id', 'language', 'is_blocked', 'is_premium')
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, telegram_id: int) -> Optional[Dict[str, Any]]:
+        """Return cached profile or None if missing/expired"""
+        entry = self._entries.get(telegram_id)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, profile = entry
+        if expires_at < time.monotonic():
+            del self._entries[telegram_id]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(telegram_id)
+        self.hits += 1
+        return profile
+
+    def set(self, telegram_id: int, profile) -> Dict[str, Any]:
+        """Store profile (dict or asyncpg Record) for telegram_id"""
+        profile = {field: profile[field] for field in self.FIELDS}
+        self._entries[telegram_id] = (time.monotonic() + self.ttl, profile)
+        self._entries.move_to_end(telegram_id)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+        return profile
+
+    def invalidate(self, telegram_id: int):
+        """Drop cached profile for telegram_id"""
+        self._entries.pop(telegram_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups * 100, 2) if lookups else 0.0,
+        }
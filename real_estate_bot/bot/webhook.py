@@ -0,0 +1,202 @@
+"""Webhook entry point: python webhook.py (instead of python main.py)
+
+An aiohttp server receives updates from Telegram, acknowledges them at once
+and routes each one to one of WEBHOOK_WORKERS processes by chat id. Every
+worker runs the regular dispatcher from main.py; inside a worker updates of
+the same chat are handled one at a time in arrival order, different chats
+concurrently. Because a chat always lands on the same worker, per-process
+state (media group collector, FSM cache) stays consistent.
+
+The webhook is registered with drop_pending_updates=False, so updates sent
+while the bot is restarting are delivered once it is back. Worker queues
+are bounded; an update whose worker is down or whose queue is full gets a
+503, so Telegram delivers it again later instead of it being lost. Dead
+workers are restarted by the server process.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+from queue import Full
+
+from aiohttp import web
+from aiogram.types import Update
+
+import main as bot_app
+from utils.delivery import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # public base URL, e.g. https://bot.example.com
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', str(os.cpu_count() or 1)))
+# Updates a single worker handles concurrently
+WORKER_CONCURRENCY = int(os.getenv('WEBHOOK_WORKER_CONCURRENCY', '100'))
+# Updates waiting for a worker before new ones are refused with 503
+WORKER_QUEUE_SIZE = int(os.getenv('WEBHOOK_WORKER_QUEUE_SIZE', '1000'))
+# Seconds between checks for dead workers
+WORKER_CHECK_INTERVAL = float(os.getenv('WEBHOOK_WORKER_CHECK_INTERVAL', '5'))
+
+
+def update_routing_key(payload: dict) -> int:
+    """Chat id of an update (user id when it has no chat)"""
+    for value in payload.values():
+        if not isinstance(value, dict):
+            continue
+        chat = value.get('chat') or (value.get('message') or {}).get('chat')
+        if chat:
+            return chat['id']
+        user = value.get('from') or value.get('user')
+        if user:
+            return user['id']
+    return payload.get('update_id', 0)
+
+
+# Worker process
+
+async def worker_main(index: int, queue) -> bool:
+    # Telegram's global limit is per bot, so the workers share it
+    rate = bot_app.delivery.global_rate / WEBHOOK_WORKERS
+    bot_app.delivery.global_bucket = TokenBucket(rate, rate)
+
+    if not await bot_app.startup():
+        logger.error(f"❌ Worker {index} failed to start")
+        return False
+
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(WORKER_CONCURRENCY)
+    chat_locks = {}
+    pending = {}
+    tasks = set()
+
+    async def process(key: int, payload: dict):
+        lock = chat_locks.setdefault(key, asyncio.Lock())
+        pending[key] = pending.get(key, 0) + 1
+        try:
+            # asyncio.Lock wakes waiters in FIFO order: per-chat arrival order
+            async with lock:
+                update = Update.model_validate(payload, context={'bot': bot_app.bot})
+                await bot_app.dp.feed_update(bot_app.bot, update)
+        except Exception as e:
+            logger.error(f"❌ Worker {index} failed on update {payload.get('update_id')}: {e}")
+        finally:
+            pending[key] -= 1
+            if not pending[key]:
+                del pending[key]
+                del chat_locks[key]
+            slots.release()
+
+    logger.info(f"👷 Worker {index} ready")
+    try:
+        while True:
+            await slots.acquire()
+            item = await loop.run_in_executor(None, queue.get)
+            if item is None:
+                break
+            task = asyncio.create_task(process(*item))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    finally:
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        await bot_app.shutdown()
+        logger.info(f"👋 Worker {index} stopped")
+    return True
+
+
+def run_worker(index: int, queue):
+    if not asyncio.run(worker_main(index, queue)):
+        sys.exit(1)
+
+
+# Web server process
+
+def start_worker(context, index: int, queue):
+    process = context.Process(target=run_worker, args=(index, queue), name=f'bot-worker-{index}')
+    process.start()
+    return process
+
+
+async def monitor_workers(app: web.Application):
+    """Restart workers that failed to start or crashed"""
+    while True:
+        await asyncio.sleep(WORKER_CHECK_INTERVAL)
+        for index, process in enumerate(app['workers']):
+            if not process.is_alive():
+                logger.error(f"❌ Worker {index} exited with code {process.exitcode}, restarting")
+                app['workers'][index] = start_worker(app['context'], index, app['queues'][index])
+
+
+async def handle_update(request: web.Request) -> web.Response:
+    if WEBHOOK_SECRET and request.headers.get('X-Telegram-Bot-Api-Secret-Token') != WEBHOOK_SECRET:
+        return web.Response(status=401)
+
+    try:
+        payload = await request.json()
+    except ValueError:
+        return web.Response(status=400)
+
+    key = update_routing_key(payload)
+    index = key % len(request.app['queues'])
+    # Telegram redelivers updates not answered with 2xx
+    if not request.app['workers'][index].is_alive():
+        return web.Response(status=503)
+    try:
+        request.app['queues'][index].put_nowait((key, payload))
+    except Full:
+        logger.warning(f"⚠️ Worker {index} queue is full, update {payload.get('update_id')} refused")
+        return web.Response(status=503)
+    return web.Response()
+
+
+async def on_startup(app: web.Application):
+    await bot_app.bot.set_webhook(
+        url=WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET or None,
+        allowed_updates=bot_app.dp.resolve_used_update_types(),
+        drop_pending_updates=False
+    )
+    logger.info(f"🌐 Webhook set to {WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH}")
+    app['monitor'] = asyncio.create_task(monitor_workers(app))
+
+
+async def on_shutdown(app: web.Application):
+    # The webhook stays registered: Telegram keeps updates until we are back
+    app['monitor'].cancel()
+    loop = asyncio.get_running_loop()
+    for queue, process in zip(app['queues'], app['workers']):
+        if process.is_alive():
+            # A full queue has room again once the worker takes the next update
+            await loop.run_in_executor(None, queue.put, None)
+    for process in app['workers']:
+        await loop.run_in_executor(None, process.join, 30)
+    await bot_app.bot.session.close()
+
+
+def main():
+    if not WEBHOOK_URL:
+        logger.error("❌ WEBHOOK_URL is not set")
+        return
+
+    context = multiprocessing.get_context('spawn')
+    queues = [context.Queue(WORKER_QUEUE_SIZE) for _ in range(WEBHOOK_WORKERS)]
+    workers = [start_worker(context, index, queue) for index, queue in enumerate(queues)]
+
+    app = web.Application()
+    app['context'] = context
+    app['queues'] = queues
+    app['workers'] = workers
+    app.router.add_post(WEBHOOK_PATH, handle_update)
+    app.on_startup.append(on_startup)
+    app.on_shutdown.append(on_shutdown)
+
+    logger.info(f"🤖 Starting webhook server with {WEBHOOK_WORKERS} workers on {WEBHOOK_HOST}:{WEBHOOK_PORT}")
+    web.run_app(app, host=WEBHOOK_HOST, port=WEBHOOK_PORT)
+
+
+if __name__ == "__main__":
+    main()